@@ -1,17 +1,41 @@
-import time, datetime as dt
+import time, datetime as dt, secrets
 import streamlit as st
 
-from db import init_db
+from db import init_db, bind_session, read_only, set_read_only, ReadOnlyError
 import auth
 from db import fetchall
+from app.db import app_db_import_pending
 
-from ui import dashboard, clients, generator, videos, history, team, admin
+from ui import dashboard, clients, generator, videos, search, history, team, admin
 
 APP_TITLE = "Content OS — Modular"
 st.set_page_config(page_title=APP_TITLE, layout="wide")
 
-init_db()
-auth.bootstrap_admin()
+@st.cache_resource
+def _bootstrap_db():
+    # schema + migrações de dados uma vez por processo, não a cada rerun
+    init_db()
+    from services.blobstore import migrate_prompts
+    from services.transcripts import migrate_transcriptions
+    from services import audit, near_dup, segment_search
+    migrate_prompts()
+    migrate_transcriptions()
+    segment_search.backfill_index()
+    near_dup.backfill_index()
+    audit.prune()
+    return True
+
+_bootstrap_db()
+# leituras desta sessão vão para a réplica, menos logo depois de ela escrever
+bind_session(st.session_state.setdefault("_db_session", secrets.token_hex(8)))
+# storage/app.db antigo ainda não importado: somente leitura até o job offline terminar
+set_read_only("Migração de dados em andamento: o app está em modo somente leitura." if app_db_import_pending() else None)
+if read_only():
+    st.warning(read_only() + " Rode `python -m scripts.migrate_app_db` e recarregue a página.")
+else:
+    auth.bootstrap_admin()
+    from services.scheduler import get_scheduler
+    get_scheduler()  # retoma as transcrições que estavam na fila antes de um restart
 
 st.session_state["_now"] = dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
 if "last_activity" not in st.session_state:
@@ -56,36 +80,44 @@ ws_ids = [(int(w["id"]), f"#{w['id']} — {w['name']} ({w['role']})") for w in w
 sel_ws = st.sidebar.selectbox("Painel", ws_ids, format_func=lambda x: x[1], key="ws_sel")
 st.session_state["workspace"] = auth.set_active_workspace(u, workspace_id=int(sel_ws[0]))
 ws = st.session_state["workspace"]
+if read_only():
+    ws = dict(ws, role="viewer")
 
 st.sidebar.markdown(f"**Usuário:** {u['email']}")
 if st.sidebar.button("Logout"):
     auth.logout()
 
-menu = ["Dashboard","Clientes","Gerador","Vídeos","Histórico","Equipe"]
+menu = ["Dashboard","Clientes","Gerador","Vídeos","Busca","Histórico","Equipe"]
 if u.get("is_admin"):
     menu.append("Admin")
 choice = st.sidebar.radio("Menu", menu)
 
-if choice == "Dashboard":
-    dashboard.render(ws["id"])
-elif choice == "Clientes":
-    if ws["role"] not in ["owner","editor"]:
-        st.error("Sem permissão.")
-    else:
-        clients.render(ws["id"])
-elif choice == "Gerador":
-    if ws["role"] not in ["owner","editor"]:
-        st.error("Sem permissão.")
-    else:
-        generator.render(ws["id"], u["id"])
-elif choice == "Vídeos":
-    if ws["role"] not in ["owner","editor"]:
-        st.error("Sem permissão.")
-    else:
-        videos.render(ws["id"], u["id"])
-elif choice == "Histórico":
-    history.render(ws["id"])
-elif choice == "Equipe":
-    team.render(ws["id"], u["id"], ws["role"])
-elif choice == "Admin":
-    admin.render(u)
+try:
+    if choice == "Dashboard":
+        dashboard.render(ws["id"])
+    elif choice == "Clientes":
+        if ws["role"] not in ["owner","editor"]:
+            st.error("Sem permissão.")
+        else:
+            clients.render(ws["id"])
+    elif choice == "Gerador":
+        if ws["role"] not in ["owner","editor"]:
+            st.error("Sem permissão.")
+        else:
+            generator.render(ws["id"], u["id"])
+    elif choice == "Vídeos":
+        if ws["role"] not in ["owner","editor"]:
+            st.error("Sem permissão.")
+        else:
+            videos.render(ws["id"], u["id"])
+    elif choice == "Busca":
+        search.render(ws["id"])
+    elif choice == "Histórico":
+        history.render(ws["id"], ws["role"])
+    elif choice == "Equipe":
+        team.render(ws["id"], u["id"], ws["role"])
+    elif choice == "Admin":
+        admin.render(u)
+except ReadOnlyError as e:
+    # alguma tela escreveu sem checar read_only(): mostra o aviso em vez do traceback
+    st.warning(str(e))
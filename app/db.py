@@ -1,22 +1,30 @@
-
-import base64
+import datetime as dt
+import json
 import os
-import hashlib
-import hmac
 import secrets
-import json
 import sqlite3
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-DB_PATH = Path("storage") / "app.db"
+import db
+from db import exec_sql, fetchall, fetchall_rows, fetchone, fetchone_row, insert_many, upsert_many
+from security import pbkdf2_hash_password, verify_password
+from services import audit
 
-# ----------------- connection -----------------
-def get_conn() -> sqlite3.Connection:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH.as_posix(), check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+from .services.transcript_codec import decode_text, encode_segments, encode_text
+
+# Camada única de dados: tudo passa pelo db.py da raiz (pool/escritor, SQLite ou Postgres).
+# O arquivo SQLite antigo deste pacote só é lido uma vez, por import_app_db().
+LEGACY_DB_PATH = Path("storage") / "app.db"
+
+def _now(**delta: int) -> str:
+    return (dt.datetime.utcnow() + dt.timedelta(**delta)).replace(microsecond=0).isoformat() + "Z"
+
+def _iso(ts: Optional[str]) -> Optional[str]:
+    # datetime('now') do SQLite ("2024-01-31 12:00:00") -> ISO do db.py ("2024-01-31T12:00:00Z")
+    if not ts:
+        return ts
+    return ts if ts.endswith("Z") else ts.replace(" ", "T") + "Z"
 
 def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
     r = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
@@ -26,234 +34,14 @@ def _col_exists(conn: sqlite3.Connection, table: str, col: str) -> bool:
     rows = conn.execute(f"PRAGMA table_info({table})").fetchall()
     return any(r["name"] == col for r in rows)
 
-# ----------------- auth utils -----------------
-_PBKDF2_ITERATIONS = 210_000
-
-def _hash_password(password: str) -> str:
-    salt = hashlib.sha256(str(Path(DB_PATH).absolute()).encode("utf-8")).digest()[:8]  # stable but not secret
-    salt = salt + hashlib.sha256(os.urandom(16)).digest()[:8]  # per-user random
-    dk = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, _PBKDF2_ITERATIONS, dklen=32)
-    blob = salt + dk
-    return base64.b64encode(blob).decode("utf-8")
-
-def _verify_password(password: str, stored: str) -> bool:
-    try:
-        blob = base64.b64decode(stored.encode("utf-8"))
-        salt, dk = blob[:16], blob[16:]
-        cand = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, _PBKDF2_ITERATIONS, dklen=32)
-        return hmac.compare_digest(cand, dk)
-    except Exception:
-        return False
-
 # ----------------- schema -----------------
 def init_db() -> None:
-    """
-    Initializes DB and runs a one-time migration from the legacy single-tenant schema
-    (clients/videos/transcriptions/content_items/schedules) to multi-tenant schema with:
-      users, workspaces, memberships, invites + workspace_id columns.
-    """
-    conn = get_conn()
-    cur = conn.cursor()
-
-    legacy = _table_exists(conn, "clients") and not _table_exists(conn, "workspaces")
-
-    if legacy:
-        _migrate_legacy_to_multitenant(conn)
-
-    # Core tables
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    email TEXT NOT NULL UNIQUE,
-    name TEXT NOT NULL DEFAULT '',
-    password_hash TEXT NOT NULL,
-    is_admin INTEGER NOT NULL DEFAULT 0,
-    is_active INTEGER NOT NULL DEFAULT 0,
-    approved_at TEXT,
-    requested_workspace_name TEXT NOT NULL DEFAULT '',
-    created_at TEXT NOT NULL DEFAULT (datetime('now'))
-);
-    """)
-
-    # Ensure new auth columns exist (for older DBs)
-    for col_def in [
-        ("is_admin", "INTEGER NOT NULL DEFAULT 0"),
-        ("is_active", "INTEGER NOT NULL DEFAULT 0"),
-        ("approved_at", "TEXT"),
-        ("requested_workspace_name", "TEXT NOT NULL DEFAULT ''"),
-    ]:
-        col, sql = col_def
-        if not _col_exists(conn, "users", col):
-            cur.execute(f"ALTER TABLE users ADD COLUMN {col} {sql};")
-
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS workspaces (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        created_at TEXT NOT NULL DEFAULT (datetime('now'))
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS memberships (
-        user_id INTEGER NOT NULL,
-        workspace_id INTEGER NOT NULL,
-        role TEXT NOT NULL DEFAULT 'editor', -- owner | editor | viewer
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        PRIMARY KEY (user_id, workspace_id),
-        FOREIGN KEY (user_id) REFERENCES users(id),
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id)
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS invites (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        workspace_id INTEGER NOT NULL,
-        token TEXT NOT NULL UNIQUE,
-        invited_email TEXT NOT NULL DEFAULT '',
-        role TEXT NOT NULL DEFAULT 'editor',
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        expires_at TEXT,
-        used_at TEXT,
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id)
-    );
-    """)
-
-
-    # Ensure invites has expires_at (for older DBs)
-    if _table_exists(conn, "invites") and not _col_exists(conn, "invites", "expires_at"):
-        cur.execute("ALTER TABLE invites ADD COLUMN expires_at TEXT;")
-
-
-    # Password reset tokens (admin-generated or requested)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS password_resets (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        user_id INTEGER NOT NULL,
-        token TEXT NOT NULL UNIQUE,
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        expires_at TEXT NOT NULL,
-        used_at TEXT,
-        created_by_admin INTEGER NOT NULL DEFAULT 0,
-        FOREIGN KEY (user_id) REFERENCES users(id)
-    );
-    """)
-
-    # Audit log
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS audit_log (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        actor_user_id INTEGER,
-        workspace_id INTEGER,
-        action TEXT NOT NULL,
-        entity_type TEXT NOT NULL DEFAULT '',
-        entity_id INTEGER,
-        meta_json TEXT NOT NULL DEFAULT '{}',
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        FOREIGN KEY (actor_user_id) REFERENCES users(id),
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id)
-    );
-    """)
-
-    # Tenant tables
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS clients (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        workspace_id INTEGER NOT NULL,
-        name TEXT NOT NULL,
-        description TEXT NOT NULL DEFAULT '',
-        profile_json TEXT NOT NULL DEFAULT '{}',
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        updated_at TEXT NOT NULL DEFAULT (datetime('now')),
-        UNIQUE(workspace_id, name),
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id)
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS videos (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        workspace_id INTEGER NOT NULL,
-        client_id INTEGER NOT NULL,
-        filename TEXT NOT NULL,
-        filepath TEXT NOT NULL,
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id),
-        FOREIGN KEY (client_id) REFERENCES clients(id)
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS transcriptions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        workspace_id INTEGER NOT NULL,
-        video_id INTEGER NOT NULL,
-        text TEXT NOT NULL,
-        segments_json TEXT NOT NULL DEFAULT '[]',
-        engine TEXT NOT NULL DEFAULT 'whisper',
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id),
-        FOREIGN KEY (video_id) REFERENCES videos(id)
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS content_items (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        workspace_id INTEGER NOT NULL,
-        client_id INTEGER NOT NULL,
-        type TEXT NOT NULL,
-        title TEXT NOT NULL DEFAULT '',
-        input_source TEXT NOT NULL DEFAULT 'manual', -- manual | transcription
-        input_ref INTEGER, -- transcription_id
-        provider TEXT NOT NULL,
-        model TEXT NOT NULL,
-        prompt_used TEXT NOT NULL,
-        output_text TEXT NOT NULL,
-        status TEXT NOT NULL DEFAULT 'draft', -- draft | approved | published
-        tags TEXT NOT NULL DEFAULT '',
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id),
-        FOREIGN KEY (client_id) REFERENCES clients(id)
-    );
-    """)
-
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS schedules (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        workspace_id INTEGER NOT NULL,
-        client_id INTEGER NOT NULL,
-        weekday INTEGER NOT NULL, -- 0=Mon ... 6=Sun
-        hour INTEGER NOT NULL,
-        minute INTEGER NOT NULL,
-        spec_json TEXT NOT NULL,
-        provider_default TEXT NOT NULL DEFAULT 'groq',
-        model_default TEXT NOT NULL DEFAULT 'llama-3.3-70b-versatile',
-        enabled INTEGER NOT NULL DEFAULT 1,
-        created_at TEXT NOT NULL DEFAULT (datetime('now')),
-        FOREIGN KEY (workspace_id) REFERENCES workspaces(id),
-        FOREIGN KEY (client_id) REFERENCES clients(id)
-    );
-    """)
-
-    conn.commit()
-    conn.close()
+    """Schema unificado (db.init_db). Um storage/app.db antigo fica para o job offline (scripts/migrate_app_db.py)."""
+    db.init_db()
 
-def _migrate_legacy_to_multitenant(conn: sqlite3.Connection) -> None:
-    """
-    Legacy had: clients(name UNIQUE), videos(client_id), transcriptions(video_id), content_items(client_id), schedules(client_id)
-    We create new tables with workspace_id, copy into workspace_id=1, then swap.
-    """
-    cur = conn.cursor()
-
-    # Create default workspace
-    cur.execute("CREATE TABLE IF NOT EXISTS workspaces (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, created_at TEXT NOT NULL DEFAULT (datetime('now')));")
-    cur.execute("INSERT INTO workspaces (id, name) VALUES (1, 'Workspace Padrão') ON CONFLICT(id) DO NOTHING;")
-
-    # clients_new
-    cur.execute("""
+# Tabelas do schema single-tenant: (nome, DDL da *_new, colunas copiadas além de id/workspace_id)
+_LEGACY_TABLES: List[Tuple[str, str, List[str]]] = [
+    ("clients", """
     CREATE TABLE IF NOT EXISTS clients_new (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         workspace_id INTEGER NOT NULL,
@@ -264,17 +52,8 @@ def _migrate_legacy_to_multitenant(conn: sqlite3.Connection) -> None:
         updated_at TEXT NOT NULL DEFAULT (datetime('now')),
         UNIQUE(workspace_id, name)
     );
-    """)
-    if _table_exists(conn, "clients"):
-        rows = conn.execute("SELECT id, name, description, profile_json, created_at, updated_at FROM clients").fetchall()
-        for r in rows:
-            cur.execute(
-                "INSERT INTO clients_new (id, workspace_id, name, description, profile_json, created_at, updated_at) VALUES (?,?,?,?,?,?,?)",
-                (r["id"], 1, r["name"], r["description"], r["profile_json"], r["created_at"], r["updated_at"]),
-            )
-
-    # videos_new
-    cur.execute("""
+    """, ["name", "description", "profile_json", "created_at", "updated_at"]),
+    ("videos", """
     CREATE TABLE IF NOT EXISTS videos_new (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         workspace_id INTEGER NOT NULL,
@@ -283,17 +62,8 @@ def _migrate_legacy_to_multitenant(conn: sqlite3.Connection) -> None:
         filepath TEXT NOT NULL,
         created_at TEXT NOT NULL DEFAULT (datetime('now'))
     );
-    """)
-    if _table_exists(conn, "videos"):
-        rows = conn.execute("SELECT id, client_id, filename, filepath, created_at FROM videos").fetchall()
-        for r in rows:
-            cur.execute(
-                "INSERT INTO videos_new (id, workspace_id, client_id, filename, filepath, created_at) VALUES (?,?,?,?,?,?)",
-                (r["id"], 1, r["client_id"], r["filename"], r["filepath"], r["created_at"]),
-            )
-
-    # transcriptions_new
-    cur.execute("""
+    """, ["client_id", "filename", "filepath", "created_at"]),
+    ("transcriptions", """
     CREATE TABLE IF NOT EXISTS transcriptions_new (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         workspace_id INTEGER NOT NULL,
@@ -303,17 +73,8 @@ def _migrate_legacy_to_multitenant(conn: sqlite3.Connection) -> None:
         engine TEXT NOT NULL DEFAULT 'whisper',
         created_at TEXT NOT NULL DEFAULT (datetime('now'))
     );
-    """)
-    if _table_exists(conn, "transcriptions"):
-        rows = conn.execute("SELECT id, video_id, text, segments_json, engine, created_at FROM transcriptions").fetchall()
-        for r in rows:
-            cur.execute(
-                "INSERT INTO transcriptions_new (id, workspace_id, video_id, text, segments_json, engine, created_at) VALUES (?,?,?,?,?,?,?)",
-                (r["id"], 1, r["video_id"], r["text"], r["segments_json"], r["engine"], r["created_at"]),
-            )
-
-    # content_items_new
-    cur.execute("""
+    """, ["video_id", "text", "segments_json", "engine", "created_at"]),
+    ("content_items", """
     CREATE TABLE IF NOT EXISTS content_items_new (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         workspace_id INTEGER NOT NULL,
@@ -330,19 +91,9 @@ def _migrate_legacy_to_multitenant(conn: sqlite3.Connection) -> None:
         tags TEXT NOT NULL DEFAULT '',
         created_at TEXT NOT NULL DEFAULT (datetime('now'))
     );
-    """)
-    if _table_exists(conn, "content_items"):
-        rows = conn.execute("SELECT * FROM content_items").fetchall()
-        for r in rows:
-            cur.execute(
-                """INSERT INTO content_items_new
-                (id, workspace_id, client_id, type, title, input_source, input_ref, provider, model, prompt_used, output_text, status, tags, created_at)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
-                (r["id"], 1, r["client_id"], r["type"], r["title"], r["input_source"], r["input_ref"], r["provider"], r["model"], r["prompt_used"], r["output_text"], r["status"], r["tags"], r["created_at"]),
-            )
-
-    # schedules_new
-    cur.execute("""
+    """, ["client_id", "type", "title", "input_source", "input_ref", "provider", "model", "prompt_used",
+          "output_text", "status", "tags", "created_at"]),
+    ("schedules", """
     CREATE TABLE IF NOT EXISTS schedules_new (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         workspace_id INTEGER NOT NULL,
@@ -356,53 +107,272 @@ def _migrate_legacy_to_multitenant(conn: sqlite3.Connection) -> None:
         enabled INTEGER NOT NULL DEFAULT 1,
         created_at TEXT NOT NULL DEFAULT (datetime('now'))
     );
-    """)
-    if _table_exists(conn, "schedules"):
-        rows = conn.execute("SELECT * FROM schedules").fetchall()
-        for r in rows:
-            cur.execute(
-                """INSERT INTO schedules_new
-                (id, workspace_id, client_id, weekday, hour, minute, spec_json, provider_default, model_default, enabled, created_at)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?)""",
-                (r["id"], 1, r["client_id"], r["weekday"], r["hour"], r["minute"], r["spec_json"], r["provider_default"], r["model_default"], r["enabled"], r["created_at"]),
-            )
-
-    # Swap
-    for t in ["clients","videos","transcriptions","content_items","schedules"]:
-        if _table_exists(conn, t):
-            cur.execute(f"DROP TABLE {t};")
-    cur.execute("ALTER TABLE clients_new RENAME TO clients;")
-    cur.execute("ALTER TABLE videos_new RENAME TO videos;")
-    cur.execute("ALTER TABLE transcriptions_new RENAME TO transcriptions;")
-    cur.execute("ALTER TABLE content_items_new RENAME TO content_items;")
-    cur.execute("ALTER TABLE schedules_new RENAME TO schedules;")
+    """, ["client_id", "weekday", "hour", "minute", "spec_json", "provider_default", "model_default", "enabled",
+          "created_at"]),
+]
+
+def _is_legacy(conn: sqlite3.Connection) -> bool:
+    # clients sem workspace_id = schema single-tenant; clients_new = migração interrompida no meio
+    return _table_exists(conn, "clients_new") or (
+        _table_exists(conn, "clients") and not _col_exists(conn, "clients", "workspace_id"))
+
+def legacy_migration_pending(path: Path = LEGACY_DB_PATH) -> bool:
+    """O storage/app.db ainda está no schema single-tenant? Barato o bastante para cada rerun."""
+    path = Path(path)
+    if not path.exists():
+        return False
+    conn = sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        return _is_legacy(conn)
+    finally:
+        conn.close()
+
+def migrate_legacy_app_db(path: Path = LEGACY_DB_PATH, batch: int = 2000,
+                          progress: Optional[Callable[[str, int, int], None]] = None) -> bool:
+    """Job offline: converte o app.db single-tenant no próprio arquivo, em lotes. False se não havia o que fazer."""
+    path = Path(path)
+    if not path.exists():
+        return False
+    conn = sqlite3.connect(path.as_posix())
+    conn.row_factory = sqlite3.Row
+    try:
+        if not _is_legacy(conn):
+            return False
+        _migrate_legacy_to_multitenant(conn, batch=batch, progress=progress)
+        return True
+    finally:
+        conn.close()
+
+def _migrate_legacy_to_multitenant(conn: sqlite3.Connection, batch: int = 2000,
+                                   progress: Optional[Callable[[str, int, int], None]] = None) -> None:
+    """
+    Legacy had: clients(name UNIQUE), videos(client_id), transcriptions(video_id), content_items(client_id), schedules(client_id)
+    We create new tables with workspace_id, copy into workspace_id=1, then swap.
 
+    A cópia vai em lotes por id, um commit por lote, então o lock de escrita nunca fica preso
+    por muito tempo. O checkpoint é o MAX(id) já copiado em cada *_new: se o processo cair,
+    a próxima chamada continua dali. progress(tabela, copiadas, total) é chamado a cada lote.
+    """
+    conn.execute("CREATE TABLE IF NOT EXISTS workspaces (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, created_at TEXT NOT NULL DEFAULT (datetime('now')));")
+    conn.execute("INSERT INTO workspaces (id, name) VALUES (1, 'Workspace Padrão') ON CONFLICT(id) DO NOTHING;")
+    conn.commit()
+
+    for table, ddl, cols in _LEGACY_TABLES:
+        conn.execute(ddl)
+        conn.commit()
+        if not _table_exists(conn, table) or _col_exists(conn, table, "workspace_id"):
+            continue
+        total = conn.execute(f"SELECT COUNT(1) FROM {table}").fetchone()[0]
+        copied = conn.execute(f"SELECT COUNT(1) FROM {table}_new").fetchone()[0]
+        col_sql = ", ".join(cols)
+        while True:
+            last = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}_new").fetchone()[0]
+            n = conn.execute(
+                f"INSERT INTO {table}_new (id, workspace_id, {col_sql}) "
+                f"SELECT id, 1, {col_sql} FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (last, int(batch))).rowcount
+            conn.commit()
+            copied += n
+            if progress and n:
+                progress(table, copied, total)
+            if n < batch:
+                break
+
+    # Swap: só DDL, numa transação curta (o sqlite3 não abre transação sozinho para DDL)
+    conn.execute("BEGIN")
+    for table, _, _ in _LEGACY_TABLES:
+        if _table_exists(conn, table):
+            conn.execute(f"DROP TABLE {table};")
+        conn.execute(f"ALTER TABLE {table}_new RENAME TO {table};")
     conn.commit()
 
+
+# Checkpoint do import_app_db no banco unificado: último rowid importado de cada tabela e
+# old id -> new id das tabelas referenciadas pelas outras. Gravados na mesma transação do lote.
+_IMPORT_DDL = (
+    "CREATE TABLE IF NOT EXISTS _app_db_import (table_name TEXT PRIMARY KEY, last_rowid BIGINT NOT NULL DEFAULT 0)",
+    "CREATE TABLE IF NOT EXISTS _app_db_import_ids (table_name TEXT NOT NULL, old_id BIGINT NOT NULL, "
+    "new_id BIGINT NOT NULL, PRIMARY KEY (table_name, old_id))",
+)
+
+def app_db_import_pending(path: Path = LEGACY_DB_PATH) -> bool:
+    """Ainda há um storage/app.db (legado ou não) para o scripts/migrate_app_db.py importar?"""
+    return Path(path).exists()
+
+def import_app_db(path: Path = LEGACY_DB_PATH, batch: int = 2000,
+                  progress: Optional[Callable[[str, int, int], None]] = None) -> bool:
+    """Copia o banco SQLite antigo do app/ (memberships, profile_json, engine...) para o schema unificado.
+
+    Ids são remapeados (o banco unificado pode já ter linhas); usuários com o mesmo email são
+    reaproveitados. Cada lote de `batch` linhas vai numa transação só junto com o checkpoint
+    (_app_db_import) e os ids novos (_app_db_import_ids): rodar de novo depois de uma queda
+    continua do último lote gravado, sem duplicar. Só no fim o arquivo vira *.imported.
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    conn = sqlite3.connect(path.as_posix())
+    conn.row_factory = sqlite3.Row
+    try:
+        if _is_legacy(conn):
+            _migrate_legacy_to_multitenant(conn, batch=batch, progress=progress)
+        for ddl in _IMPORT_DDL:
+            exec_sql(ddl)
+        _import_tables(conn, batch, progress)
+    finally:
+        conn.close()
+    # prompts, busca e índice de duplicatas das linhas importadas ficam para os backfills do script
+    os.replace(path, path.with_name(path.name + ".imported"))
+    exec_sql("DROP TABLE _app_db_import_ids")
+    exec_sql("DROP TABLE _app_db_import")
+    return True
+
+def _import_table(conn: sqlite3.Connection, table: str, batch: int,
+                  progress: Optional[Callable[[str, int, int], None]],
+                  write: Callable[[db._Tx, List[sqlite3.Row]], None]) -> None:
+    if not _table_exists(conn, table):
+        return
+    r = fetchone("SELECT last_rowid FROM _app_db_import WHERE table_name=?", (table,))
+    last = int(r["last_rowid"]) if r else 0
+    total = conn.execute(f"SELECT COUNT(1) FROM {table}").fetchone()[0]
+    done = conn.execute(f"SELECT COUNT(1) FROM {table} WHERE rowid <= ?", (last,)).fetchone()[0]
+    while True:
+        src = conn.execute(f"SELECT rowid AS _rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                           (last, int(batch))).fetchall()
+        if not src:
+            return
+        last = src[-1]["_rowid"]
+
+        def op(tx: db._Tx) -> None:
+            write(tx, src)
+            tx.execute("INSERT INTO _app_db_import (table_name, last_rowid) VALUES (?, ?) "
+                       "ON CONFLICT (table_name) DO UPDATE SET last_rowid=excluded.last_rowid", (table, last))
+
+        db.transaction(op)
+        done += len(src)
+        if progress:
+            progress(table, done, total)
+        if len(src) < batch:
+            return
+
+def _import_tables(conn: sqlite3.Connection, batch: int, progress: Optional[Callable[[str, int, int], None]]) -> None:
+    maps: Dict[str, Dict[int, int]] = {}
+
+    def ids(table: str) -> Dict[int, int]:
+        # só é lido depois que a tabela terminou de importar
+        if table not in maps:
+            maps[table] = {int(r["old_id"]): int(r["new_id"]) for r in fetchall(
+                "SELECT old_id, new_id FROM _app_db_import_ids WHERE table_name=?", (table,))}
+        return maps[table]
+
+    def col(r: sqlite3.Row, name: str, default: Any = None) -> Any:
+        return r[name] if name in r.keys() else default
+
+    def keep_ids(tx: db._Tx, table: str, src: List[sqlite3.Row], new_ids: List[int]) -> None:
+        tx.executemany("INSERT INTO _app_db_import_ids (table_name, old_id, new_id) VALUES (?, ?, ?)",
+                       [(table, r["id"], i) for r, i in zip(src, new_ids)])
+
+    def copy(table: str, cols: List[str], values: Callable[[sqlite3.Row], tuple],
+             keep: Callable[[sqlite3.Row], bool] = lambda r: True) -> None:
+        def write(tx: db._Tx, src: List[sqlite3.Row]) -> None:
+            src = [r for r in src if keep(r)]
+            keep_ids(tx, table, src, tx.insert_many(table, cols, [values(r) for r in src]))
+        _import_table(conn, table, batch, progress, write)
+
+    def upsert(src_table: str, table: str, cols: List[str], conflict: List[str], values: Callable[[sqlite3.Row], tuple],
+               keep: Callable[[sqlite3.Row], bool], update: Sequence[str] = ()) -> None:
+        # sem ids novos para guardar: a chave de conflito já torna o lote idempotente
+        sql = db._upsert_sql(table, cols, conflict, update)
+        _import_table(conn, src_table, batch, progress,
+                      lambda tx, src: tx.executemany(sql, [values(r) for r in src if keep(r)]))
+
+    def write_users(tx: db._Tx, src: List[sqlite3.Row]) -> None:
+        new_ids = []
+        for r in src:
+            u = tx.fetchone("SELECT id FROM users WHERE email=?", (r["email"],))
+            new_ids.append(int(u["id"]) if u else tx.insert_many(
+                "users", ["email", "name", "salt", "password_hash", "is_admin", "is_active", "approved_at",
+                          "requested_workspace_name", "created_at"],
+                [(r["email"], r["name"], "", r["password_hash"], r["is_admin"], r["is_active"], _iso(col(r, "approved_at")),
+                  col(r, "requested_workspace_name", ""), _iso(r["created_at"]) or _now())])[0])
+        keep_ids(tx, "users", src, new_ids)
+
+    _import_table(conn, "users", batch, progress, write_users)
+    copy("workspaces", ["name", "created_at"], lambda r: (r["name"], _iso(r["created_at"]) or _now()))
+    users, wss = ids("users"), ids("workspaces")
+    upsert("memberships", "workspace_members", ["workspace_id", "user_id", "role", "added_at"], ["workspace_id", "user_id"],
+           lambda r: (wss[r["workspace_id"]], users[r["user_id"]], r["role"], _iso(r["created_at"]) or _now()),
+           lambda r: r["workspace_id"] in wss and r["user_id"] in users, update=["role"])
+    upsert("invites", "invites", ["token", "workspace_id", "role", "email_restriction", "created_at", "expires_at", "used_at"],
+           ["token"], lambda r: (r["token"], wss[r["workspace_id"]], r["role"], r["invited_email"] or None, _iso(r["created_at"]),
+                                 _iso(r["expires_at"]) or "9999-12-31T00:00:00Z", _iso(r["used_at"])),
+           lambda r: r["workspace_id"] in wss)
+    upsert("password_resets", "password_resets", ["user_id", "token", "created_at", "expires_at", "used_at", "created_by_admin"],
+           ["token"], lambda r: (users[r["user_id"]], r["token"], _iso(r["created_at"]), _iso(r["expires_at"]), _iso(r["used_at"]),
+                                 r["created_by_admin"]),
+           lambda r: r["user_id"] in users)
+    audit_cols = ["workspace_id", "actor_user_id", "action", "entity_type", "entity_id", "details_json", "created_at"]
+    _import_table(conn, "audit_log", batch, progress, lambda tx, src: tx.executemany(
+        f"INSERT INTO audit_log ({', '.join(audit_cols)}) VALUES ({', '.join('?' for _ in audit_cols)})",
+        [(wss.get(r["workspace_id"]), users.get(r["actor_user_id"]), r["action"], col(r, "entity_type", ""), col(r, "entity_id"),
+          col(r, "meta_json"), _iso(r["created_at"])) for r in src]))
+
+    copy("clients", ["workspace_id", "name", "description", "profile_json", "created_at", "updated_at"],
+         lambda r: (wss[r["workspace_id"]], r["name"], r["description"], r["profile_json"],
+                    _iso(r["created_at"]), _iso(r["updated_at"])),
+         lambda r: r["workspace_id"] in wss)
+    clients = ids("clients")
+    copy("videos", ["workspace_id", "client_id", "filename", "filepath", "created_at"],
+         lambda r: (wss[r["workspace_id"]], clients[r["client_id"]], r["filename"], r["filepath"], _iso(r["created_at"])),
+         lambda r: r["client_id"] in clients)
+    videos = ids("videos")
+
+    def tr_values(r: sqlite3.Row) -> tuple:
+        text, text_z, segs_z = r["text"] or "", col(r, "text_z"), col(r, "segments_z")
+        if text_z is None:
+            text_z, segs_z = encode_text(text), encode_segments(text, json.loads(r["segments_json"] or "[]"))
+        return (wss[r["workspace_id"]], videos[r["video_id"]], col(r, "engine", "whisper"), "", text_z, segs_z, _iso(r["created_at"]))
+
+    copy("transcriptions", ["workspace_id", "video_id", "whisper_model", "text", "text_z", "segments_z", "created_at"],
+         tr_values, lambda r: r["video_id"] in videos)
+    trs = ids("transcriptions")
+    copy("content_items", ["workspace_id", "client_id", "type", "title", "input_source", "input_ref", "provider", "model",
+                           "prompt_used", "output_text", "status", "tags", "created_at"],
+         lambda r: (wss[r["workspace_id"]], clients[r["client_id"]], r["type"], r["title"], r["input_source"],
+                    str(trs.get(r["input_ref"], r["input_ref"])) if r["input_ref"] is not None else None,
+                    col(r, "provider"), r["model"], r["prompt_used"], r["output_text"], r["status"], r["tags"], _iso(r["created_at"])),
+         lambda r: r["client_id"] in clients)
+    copy("schedules", ["workspace_id", "client_id", "weekday", "hour", "minute", "spec_json", "provider_default",
+                       "model_default", "enabled", "created_at"],
+         lambda r: (wss[r["workspace_id"]], clients[r["client_id"]], r["weekday"], r["hour"], r["minute"], r["spec_json"],
+                    r["provider_default"], r["model_default"], r["enabled"], _iso(r["created_at"])),
+         lambda r: r["client_id"] in clients)
+
 # ----------------- helpers -----------------
 def row_to_dict(r) -> Dict[str, Any]:
-    return dict(r) if r is not None else {}
+    return dict(r.items()) if hasattr(r, "items") else (dict(r) if r is not None else {})
+
+def _role(role: str, default: str) -> str:
+    role = (role or default).strip().lower()
+    return role if role in ("owner", "editor", "viewer") else default
+
+def _set_membership(user_id: int, workspace_id: int, role: str) -> None:
+    upsert_many("workspace_members", ["workspace_id", "user_id", "role", "added_at"],
+                [(workspace_id, user_id, role, _now())], conflict=["workspace_id", "user_id"], update=["role"])
 
 # ----------------- auth: users/workspaces -----------------
 
 def create_user(email: str, password: str, name: str = "", *, is_admin: bool = False, is_active: bool = False, requested_workspace_name: str = "") -> int:
     """Create a user. For normal signups use is_active=False and store requested_workspace_name."""
-    conn = get_conn()
-    cur = conn.cursor()
-    ph = _hash_password(password)
-    cur.execute(
-        "INSERT INTO users (email, name, password_hash, is_admin, is_active, requested_workspace_name) VALUES (?,?,?,?,?,?)",
-        (email.lower().strip(), name.strip(), ph, 1 if is_admin else 0, 1 if is_active else 0, (requested_workspace_name or "").strip()),
-    )
-    uid = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(uid)
+    salt, ph = pbkdf2_hash_password(password)
+    return insert_many(
+        "users", ["email", "name", "salt", "password_hash", "is_admin", "is_active", "approved_at",
+                  "requested_workspace_name", "created_at"],
+        [(email.lower().strip(), name.strip(), salt, ph, 1 if is_admin else 0, 1 if is_active else 0,
+          _now() if is_active else None, (requested_workspace_name or "").strip(), _now())])[0]
 
 def count_admins() -> int:
-    conn = get_conn()
-    r = conn.execute("SELECT COUNT(1) AS n FROM users WHERE is_admin=1").fetchone()
-    conn.close()
+    r = fetchone("SELECT COUNT(1) AS n FROM users WHERE is_admin=1")
     return int(r["n"]) if r else 0
 
 def bootstrap_admin_from_env() -> Optional[int]:
@@ -413,285 +383,171 @@ def bootstrap_admin_from_env() -> Optional[int]:
     password = os.getenv("ADMIN_PASSWORD", "")
     if not email or not password:
         return None
-    conn = get_conn()
-    r = conn.execute("SELECT * FROM users WHERE email=?", (email,)).fetchone()
+    r = fetchone("SELECT id FROM users WHERE email=?", (email,))
     if r:
-        conn.execute("UPDATE users SET is_admin=1, is_active=1, approved_at=datetime('now') WHERE email=?", (email,))
-        conn.commit()
-        conn.close()
+        exec_sql("UPDATE users SET is_admin=1, is_active=1, approved_at=? WHERE email=?", (_now(), email))
         return int(r["id"])
-    conn.close()
     return create_user(email=email, password=password, name="Admin", is_admin=True, is_active=True)
 
 def verify_user(email: str, password: str) -> Optional[Dict[str, Any]]:
-    conn = get_conn()
-    r = conn.execute("SELECT * FROM users WHERE email=?", (email.lower().strip(),)).fetchone()
-    conn.close()
-    if not r:
+    d = fetchone("SELECT * FROM users WHERE email=?", (email.lower().strip(),))
+    if not d:
         return None
-    d = row_to_dict(r)
-    if _verify_password(password, d.get("password_hash","")):
-        d.pop("password_hash", None)
+    if verify_password(password, d.pop("salt", "") or "", d.pop("password_hash", "") or ""):
         return d
     return None
 
 def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-    conn=get_conn()
-    r=conn.execute("SELECT id, email, name, created_at FROM users WHERE email=?", (email.lower().strip(),)).fetchone()
-    conn.close()
-    return row_to_dict(r) if r else None
+    return fetchone("SELECT id, email, name, created_at FROM users WHERE email=?", (email.lower().strip(),))
 
 
 def list_pending_users() -> List[Dict[str, Any]]:
-    conn = get_conn()
-    rows = conn.execute(
-        "SELECT id, email, name, requested_workspace_name, created_at FROM users WHERE is_active=0 ORDER BY created_at ASC"
-    ).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+    return fetchall_rows(
+        "SELECT id, email, name, requested_workspace_name, created_at FROM users WHERE is_active=0 ORDER BY created_at ASC")
 
 def set_user_active(user_id: int, active: bool) -> None:
-    conn = get_conn()
-    conn.execute(
-        "UPDATE users SET is_active=?, approved_at=CASE WHEN ?=1 THEN datetime('now') ELSE approved_at END WHERE id=?",
-        (1 if active else 0, 1 if active else 0, user_id),
-    )
-    conn.commit()
-    conn.close()
+    if active:
+        exec_sql("UPDATE users SET is_active=1, approved_at=? WHERE id=?", (_now(), user_id))
+    else:
+        exec_sql("UPDATE users SET is_active=0 WHERE id=?", (user_id,))
 
 def promote_to_admin(user_id: int, is_admin: bool) -> None:
-    conn = get_conn()
-    conn.execute("UPDATE users SET is_admin=? WHERE id=?", (1 if is_admin else 0, user_id))
-    conn.commit()
-    conn.close()
+    exec_sql("UPDATE users SET is_admin=? WHERE id=?", (1 if is_admin else 0, user_id))
 
 def approve_user(user_id: int) -> Optional[int]:
     """Activate user and create their requested workspace, returning workspace_id."""
-    conn = get_conn()
-    cur = conn.cursor()
-    u = cur.execute("SELECT * FROM users WHERE id=?", (user_id,)).fetchone()
+    u = fetchone("SELECT requested_workspace_name FROM users WHERE id=?", (user_id,))
     if not u:
-        conn.close()
         return None
-    cur.execute("UPDATE users SET is_active=1, approved_at=datetime('now') WHERE id=?", (user_id,))
-    ws_name = (u["requested_workspace_name"] or "").strip() or "Meu Painel"
-    cur.execute("INSERT INTO workspaces (name) VALUES (?)", (ws_name,))
-    wid = cur.lastrowid
-    cur.execute("INSERT OR REPLACE INTO memberships (user_id, workspace_id, role) VALUES (?,?,?)", (user_id, wid, "owner"))
-    conn.commit()
-    conn.close()
-    return int(wid)
+    # workspace e vínculo antes de ativar: se algo falhar no meio, o usuário continua pendente
+    wid = insert_many("workspaces", ["name", "created_at", "created_by_user_id"],
+                      [((u["requested_workspace_name"] or "").strip() or "Meu Painel", _now(), user_id)])[0]
+    _set_membership(user_id, wid, "owner")
+    set_user_active(user_id, True)
+    return wid
 
 def delete_user(user_id: int) -> None:
-    conn = get_conn()
-    conn.execute("DELETE FROM memberships WHERE user_id=?", (user_id,))
-    conn.execute("DELETE FROM users WHERE id=?", (user_id,))
-    conn.commit()
-    conn.close()
+    exec_sql("DELETE FROM workspace_members WHERE user_id=?", (user_id,))
+    exec_sql("DELETE FROM users WHERE id=?", (user_id,))
 
 def list_users() -> List[Dict[str, Any]]:
-    conn = get_conn()
-    rows = conn.execute(
-        "SELECT id, email, name, is_admin, is_active, approved_at, created_at FROM users ORDER BY created_at DESC"
-    ).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+    return fetchall_rows(
+        "SELECT id, email, name, is_admin, is_active, approved_at, created_at FROM users ORDER BY created_at DESC")
 
 
 def create_workspace(name: str) -> int:
-    conn=get_conn()
-    cur=conn.cursor()
-    cur.execute("INSERT INTO workspaces (name) VALUES (?)", (name.strip(),))
-    wid=cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(wid)
+    return insert_many("workspaces", ["name", "created_at"], [(name.strip(), _now())])[0]
 
 def add_membership(user_id: int, workspace_id: int, role: str = "member") -> None:
-    conn=get_conn()
-    conn.execute(
-        "INSERT OR REPLACE INTO memberships (user_id, workspace_id, role) VALUES (?,?,?)",
-        (user_id, workspace_id, role),
-    )
-    conn.commit()
-    conn.close()
+    _set_membership(user_id, workspace_id, role)
 
 def list_user_workspaces(user_id: int) -> List[Dict[str, Any]]:
-    conn=get_conn()
-    rows=conn.execute(
+    return fetchall_rows(
         """SELECT w.id, w.name, m.role, w.created_at
            FROM workspaces w
-           JOIN memberships m ON m.workspace_id=w.id
+           JOIN workspace_members m ON m.workspace_id=w.id
            WHERE m.user_id=?
            ORDER BY w.created_at DESC""",
         (user_id,),
-    ).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+    )
 
 def get_membership(user_id: int, workspace_id: int) -> Optional[Dict[str, Any]]:
-    conn=get_conn()
-    r=conn.execute("SELECT * FROM memberships WHERE user_id=? AND workspace_id=?", (user_id, workspace_id)).fetchone()
-    conn.close()
-    return row_to_dict(r) if r else None
+    return fetchone("SELECT user_id, workspace_id, role, added_at AS created_at FROM workspace_members "
+                    "WHERE user_id=? AND workspace_id=?", (user_id, workspace_id))
 
 def create_invite(workspace_id: int, invited_email: str = "", role: str = "editor", expires_in_days: int = 7) -> str:
     """Creates an invite token for a workspace. Optionally restrict to an email and set expiry."""
-    conn = get_conn()
     token = secrets.token_urlsafe(16)
-    invited_email = invited_email.lower().strip()
-    role = (role or "editor").strip().lower()
-    if role not in ("owner","editor","viewer"):
-        role = "editor"
-    # expires_at stored as SQLite datetime string
-    conn.execute(
-        "INSERT INTO invites (workspace_id, token, invited_email, role, expires_at) VALUES (?,?,?,?,datetime('now', ?))",
-        (workspace_id, token, invited_email, role, f'+{int(expires_in_days)} days'),
+    exec_sql(
+        "INSERT INTO invites (token, workspace_id, role, email_restriction, created_at, expires_at) VALUES (?,?,?,?,?,?)",
+        (token, workspace_id, _role(role, "editor"), invited_email.lower().strip() or None, _now(),
+         _now(days=int(expires_in_days))),
     )
-    conn.commit()
-    conn.close()
     return token
 
 def accept_invite(token: str, user_id: int) -> Optional[int]:
     """Accepts an invite if valid, unused and not expired. Returns workspace_id or None."""
-    conn = get_conn()
-    cur = conn.cursor()
-    inv = cur.execute(
-        """SELECT * FROM invites
-            WHERE token=? AND used_at IS NULL
-              AND (expires_at IS NULL OR expires_at > datetime('now'))""",
-        (token.strip(),),
-    ).fetchone()
+    inv = fetchone("SELECT * FROM invites WHERE token=? AND used_at IS NULL AND expires_at > ?", (token.strip(), _now()))
     if not inv:
-        conn.close()
         return None
 
     # If invite is restricted to an email, enforce it
-    if (inv["invited_email"] or "").strip():
-        u = cur.execute("SELECT email FROM users WHERE id=?", (user_id,)).fetchone()
-        if not u or u["email"].lower().strip() != inv["invited_email"].lower().strip():
-            conn.close()
+    if (inv["email_restriction"] or "").strip():
+        u = fetchone("SELECT email FROM users WHERE id=?", (user_id,))
+        if not u or u["email"].lower().strip() != inv["email_restriction"].lower().strip():
             return None
 
     workspace_id = int(inv["workspace_id"])
-    role = (inv["role"] or "editor").strip().lower()
-    if role not in ("owner","editor","viewer"):
-        role = "editor"
-
-    cur.execute("UPDATE invites SET used_at=datetime('now') WHERE id=?", (inv["id"],))
-    cur.execute(
-        "INSERT OR REPLACE INTO memberships (user_id, workspace_id, role) VALUES (?,?,?)",
-        (user_id, workspace_id, role),
-    )
-    conn.commit()
-    conn.close()
+    exec_sql("UPDATE invites SET used_at=?, used_by_user_id=? WHERE id=?", (_now(), user_id, inv["id"]))
+    _set_membership(user_id, workspace_id, _role(inv["role"], "editor"))
     return workspace_id
 
 def list_clients(workspace_id: int) -> List[Dict[str, Any]]:
-    conn = get_conn()
-    rows = conn.execute("SELECT * FROM clients WHERE workspace_id=? ORDER BY name ASC", (workspace_id,)).fetchall()
-    conn.close()
-    out = []
-    for r in rows:
-        d = row_to_dict(r)
-        d["profile"] = json.loads(d.get("profile_json") or "{}")
-        out.append(d)
-    return out
+    return fetchall_rows("SELECT * FROM clients WHERE workspace_id=? ORDER BY name ASC", (workspace_id,),
+                         json_cols={"profile": "profile_json"})
 
 def get_client(workspace_id: int, client_id: int) -> Optional[Dict[str, Any]]:
-    conn=get_conn()
-    r=conn.execute("SELECT * FROM clients WHERE workspace_id=? AND id=?", (workspace_id, client_id)).fetchone()
-    conn.close()
-    if not r:
-        return None
-    d=row_to_dict(r)
-    d["profile"]=json.loads(d.get("profile_json") or "{}")
-    return d
+    return fetchone_row("SELECT * FROM clients WHERE workspace_id=? AND id=?", (workspace_id, client_id),
+                        json_cols={"profile": "profile_json"})
 
 def upsert_client(name: str, description: str, profile: Dict[str, Any], workspace_id: int, client_id: Optional[int]=None) -> int:
-    conn=get_conn()
-    cur=conn.cursor()
+    profile_json = json.dumps(profile or {}, ensure_ascii=False)
     if client_id:
-        cur.execute(
-            "UPDATE clients SET name=?, description=?, profile_json=?, updated_at=datetime('now') WHERE workspace_id=? AND id=?",
-            (name.strip(), description or "", json.dumps(profile or {}, ensure_ascii=False), workspace_id, client_id),
-        )
-        cid = client_id
-    else:
-        cur.execute(
-            "INSERT INTO clients (workspace_id, name, description, profile_json) VALUES (?,?,?,?)",
-            (workspace_id, name.strip(), description or "", json.dumps(profile or {}, ensure_ascii=False)),
-        )
-        cid = cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(cid)
+        exec_sql("UPDATE clients SET name=?, description=?, profile_json=?, updated_at=? WHERE workspace_id=? AND id=?",
+                 (name.strip(), description or "", profile_json, _now(), workspace_id, client_id))
+        return int(client_id)
+    now = _now()
+    return insert_many("clients", ["workspace_id", "name", "description", "profile_json", "created_at", "updated_at"],
+                       [(workspace_id, name.strip(), description or "", profile_json, now, now)])[0]
 
 def delete_client(workspace_id: int, client_id: int) -> None:
-    conn=get_conn()
-    conn.execute("DELETE FROM content_items WHERE workspace_id=? AND client_id=?", (workspace_id, client_id))
-    conn.execute("DELETE FROM schedules WHERE workspace_id=? AND client_id=?", (workspace_id, client_id))
-    vids = conn.execute("SELECT id FROM videos WHERE workspace_id=? AND client_id=?", (workspace_id, client_id)).fetchall()
-    for v in vids:
-        conn.execute("DELETE FROM transcriptions WHERE workspace_id=? AND video_id=?", (workspace_id, v["id"]))
-    conn.execute("DELETE FROM videos WHERE workspace_id=? AND client_id=?", (workspace_id, client_id))
-    conn.execute("DELETE FROM clients WHERE workspace_id=? AND id=?", (workspace_id, client_id))
-    conn.commit()
-    conn.close()
+    # índices derivados (busca, duplicatas) saem junto com as linhas de origem
+    exec_sql("DELETE FROM content_lsh WHERE client_id=?", (client_id,))
+    exec_sql("DELETE FROM content_minhash WHERE client_id=?", (client_id,))
+    exec_sql("DELETE FROM transcript_segments WHERE workspace_id=? AND client_id=?", (workspace_id, client_id))
+    exec_sql("DELETE FROM content_items WHERE workspace_id=? AND client_id=?", (workspace_id, client_id))
+    exec_sql("DELETE FROM schedules WHERE workspace_id=? AND client_id=?", (workspace_id, client_id))
+    exec_sql("DELETE FROM transcriptions WHERE workspace_id=? AND video_id IN "
+             "(SELECT id FROM videos WHERE workspace_id=? AND client_id=?)", (workspace_id, workspace_id, client_id))
+    exec_sql("DELETE FROM videos WHERE workspace_id=? AND client_id=?", (workspace_id, client_id))
+    exec_sql("DELETE FROM clients WHERE workspace_id=? AND id=?", (workspace_id, client_id))
 
 # ----------------- videos & transcriptions -----------------
 def add_video(workspace_id: int, client_id: int, filename: str, filepath: str) -> int:
-    conn=get_conn()
-    cur=conn.cursor()
-    cur.execute("INSERT INTO videos (workspace_id, client_id, filename, filepath) VALUES (?,?,?,?)", (workspace_id, client_id, filename, filepath))
-    vid=cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(vid)
+    return insert_many("videos", ["workspace_id", "client_id", "filename", "filepath", "created_at"],
+                       [(workspace_id, client_id, filename, filepath, _now())])[0]
 
 def list_videos(workspace_id: int, client_id: int) -> List[Dict[str, Any]]:
-    conn=get_conn()
-    rows=conn.execute("SELECT * FROM videos WHERE workspace_id=? AND client_id=? ORDER BY created_at DESC", (workspace_id, client_id)).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+    return fetchall_rows("SELECT * FROM videos WHERE workspace_id=? AND client_id=? ORDER BY created_at DESC",
+                         (workspace_id, client_id))
 
 def get_video(workspace_id: int, video_id: int) -> Optional[Dict[str, Any]]:
-    conn=get_conn()
-    r=conn.execute("SELECT * FROM videos WHERE workspace_id=? AND id=?", (workspace_id, video_id)).fetchone()
-    conn.close()
-    return row_to_dict(r) if r else None
+    return fetchone("SELECT * FROM videos WHERE workspace_id=? AND id=?", (workspace_id, video_id))
 
 def add_transcription(workspace_id: int, video_id: int, text: str, segments: List[Dict[str, Any]], engine: str="whisper") -> int:
-    conn=get_conn()
-    cur=conn.cursor()
-    cur.execute(
-        "INSERT INTO transcriptions (workspace_id, video_id, text, segments_json, engine) VALUES (?,?,?,?,?)",
-        (workspace_id, video_id, text or "", json.dumps(segments or [], ensure_ascii=False), engine),
-    )
-    tid=cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(tid)
+    from services.transcripts import save_transcription
+    return save_transcription(workspace_id, video_id, engine, None, text or "", segments or [])
 
 def list_transcriptions_for_video(workspace_id: int, video_id: int) -> List[Dict[str, Any]]:
-    conn=get_conn()
-    rows=conn.execute("SELECT * FROM transcriptions WHERE workspace_id=? AND video_id=? ORDER BY created_at DESC", (workspace_id, video_id)).fetchall()
-    conn.close()
-    out=[]
-    for r in rows:
-        d=row_to_dict(r)
-        d["segments"]=json.loads(d.get("segments_json") or "[]")
-        out.append(d)
-    return out
+    """Lista sem decodificar segmentos; use get_transcription() para tê-los."""
+    rows = fetchall(
+        "SELECT id, workspace_id, video_id, whisper_model AS engine, created_at, text, text_z FROM transcriptions "
+        "WHERE workspace_id=? AND video_id=? ORDER BY created_at DESC",
+        (workspace_id, video_id),
+    )
+    for d in rows:
+        z = d.pop("text_z", None)
+        if z is not None:
+            d["text"] = decode_text(z)
+    return rows
 
 def get_transcription(workspace_id: int, transcription_id: int) -> Optional[Dict[str, Any]]:
-    conn=get_conn()
-    r=conn.execute("SELECT * FROM transcriptions WHERE workspace_id=? AND id=?", (workspace_id, transcription_id)).fetchone()
-    conn.close()
-    if not r:
+    from services import transcripts
+    d = transcripts.get_transcription(workspace_id, transcription_id)
+    if not d:
         return None
-    d=row_to_dict(r)
-    d["segments"]=json.loads(d.get("segments_json") or "[]")
+    d["engine"] = d.get("whisper_model")
+    d["segments"] = transcripts.load_segments(d)
     return d
 
 # ----------------- content -----------------
@@ -709,52 +565,35 @@ def add_content_item(
     status: str="draft",
     tags: str="",
 ) -> int:
-    conn=get_conn()
-    cur=conn.cursor()
-    cur.execute(
-        """INSERT INTO content_items
-        (workspace_id, client_id, type, title, input_source, input_ref, provider, model, prompt_used, output_text, status, tags)
-        VALUES(?,?,?,?,?,?,?,?,?,?,?,?)""",
-        (workspace_id, client_id, type_, title or "", input_source, input_ref, provider, model, prompt_used, output_text, status, tags or ""),
-    )
-    cid=cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(cid)
+    from services.content_items import save_content_item
+    return save_content_item(workspace_id, client_id, type_, title or "", input_source,
+                             str(input_ref) if input_ref is not None else None, model, prompt_used, output_text,
+                             tags=tags or "", status=status, provider=provider)
+
+def _with_prompts(rows) -> List[Dict[str, Any]]:
+    # prompt_used ficou vazio nas linhas novas: o texto vem do blob store (prompt_ref)
+    from services.blobstore import prompt_texts
+    return [dict(r.items(), prompt_used=p) for r, p in zip(rows, prompt_texts(rows))]
 
 def list_content_items(workspace_id: int, client_id: int, limit: int=200) -> List[Dict[str, Any]]:
-    conn=get_conn()
-    rows=conn.execute(
+    return _with_prompts(fetchall_rows(
         "SELECT * FROM content_items WHERE workspace_id=? AND client_id=? ORDER BY created_at DESC LIMIT ?",
         (workspace_id, client_id, limit),
-    ).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+    ))
 
 def list_content_items_by_video(workspace_id: int, client_id: int, video_id: int, limit: int=200) -> List[Dict[str, Any]]:
     tag = f"video:{video_id}"
-    conn=get_conn()
-    rows=conn.execute(
+    return _with_prompts(fetchall_rows(
         "SELECT * FROM content_items WHERE workspace_id=? AND client_id=? AND tags LIKE ? ORDER BY created_at DESC LIMIT ?",
         (workspace_id, client_id, f"%{tag}%", limit),
-    ).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+    ))
 
 # ----------------- schedules -----------------
 def list_schedules(workspace_id: int, client_id: int) -> List[Dict[str, Any]]:
-    conn=get_conn()
-    rows=conn.execute(
+    return fetchall_rows(
         "SELECT * FROM schedules WHERE workspace_id=? AND client_id=? ORDER BY weekday, hour, minute",
-        (workspace_id, client_id),
-    ).fetchall()
-    conn.close()
-    out=[]
-    for r in rows:
-        d=row_to_dict(r)
-        d["spec"]=json.loads(d.get("spec_json") or "{}")
-        out.append(d)
-    return out
+        (workspace_id, client_id), json_cols={"spec": "spec_json"},
+    )
 
 def upsert_schedule(
     workspace_id: int,
@@ -768,142 +607,73 @@ def upsert_schedule(
     enabled: int=1,
     schedule_id: Optional[int]=None,
 ) -> int:
-    conn=get_conn()
-    cur=conn.cursor()
+    spec_json = json.dumps(spec or {}, ensure_ascii=False)
     if schedule_id:
-        cur.execute(
+        exec_sql(
             """UPDATE schedules SET weekday=?, hour=?, minute=?, spec_json=?, provider_default=?, model_default=?, enabled=?
                WHERE workspace_id=? AND id=?""",
-            (weekday, hour, minute, json.dumps(spec or {}, ensure_ascii=False), provider_default, model_default, int(enabled), workspace_id, schedule_id),
+            (weekday, hour, minute, spec_json, provider_default, model_default, int(enabled), workspace_id, schedule_id),
         )
-        sid=schedule_id
-    else:
-        cur.execute(
-            """INSERT INTO schedules (workspace_id, client_id, weekday, hour, minute, spec_json, provider_default, model_default, enabled)
-               VALUES (?,?,?,?,?,?,?,?,?)""",
-            (workspace_id, client_id, weekday, hour, minute, json.dumps(spec or {}, ensure_ascii=False), provider_default, model_default, int(enabled)),
-        )
-        sid=cur.lastrowid
-    conn.commit()
-    conn.close()
-    return int(sid)
+        return int(schedule_id)
+    return insert_many(
+        "schedules", ["workspace_id", "client_id", "weekday", "hour", "minute", "spec_json", "provider_default",
+                      "model_default", "enabled", "created_at"],
+        [(workspace_id, client_id, weekday, hour, minute, spec_json, provider_default, model_default, int(enabled), _now())])[0]
 
 def delete_schedule(workspace_id: int, schedule_id: int) -> None:
-    conn=get_conn()
-    conn.execute("DELETE FROM schedules WHERE workspace_id=? AND id=?", (workspace_id, schedule_id))
-    conn.commit()
-    conn.close()
+    exec_sql("DELETE FROM schedules WHERE workspace_id=? AND id=?", (workspace_id, schedule_id))
 
 
 # ----------------- password reset -----------------
 def create_password_reset_for_user(user_id: int, expires_minutes: int = 60, created_by_admin: int = 0) -> str:
-    conn = get_conn()
     token = secrets.token_urlsafe(24)
-    conn.execute(
-        "INSERT INTO password_resets (user_id, token, expires_at, created_by_admin) VALUES (?,?,datetime('now', ?),?)",
-        (user_id, token, f'+{int(expires_minutes)} minutes', int(created_by_admin)),
+    exec_sql(
+        "INSERT INTO password_resets (user_id, token, created_at, expires_at, created_by_admin) VALUES (?,?,?,?,?)",
+        (user_id, token, _now(), _now(minutes=int(expires_minutes)), int(created_by_admin)),
     )
-    conn.commit()
-    conn.close()
     return token
 
 def list_password_resets(active_only: bool = True) -> List[Dict[str, Any]]:
-    conn = get_conn()
+    sql = "SELECT pr.*, u.email FROM password_resets pr JOIN users u ON u.id=pr.user_id "
     if active_only:
-        rows = conn.execute(
-            "SELECT pr.*, u.email FROM password_resets pr JOIN users u ON u.id=pr.user_id "
-            "WHERE pr.used_at IS NULL AND pr.expires_at > datetime('now') ORDER BY pr.created_at DESC"
-        ).fetchall()
-    else:
-        rows = conn.execute(
-            "SELECT pr.*, u.email FROM password_resets pr JOIN users u ON u.id=pr.user_id "
-            "ORDER BY pr.created_at DESC"
-        ).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+        return fetchall_rows(sql + "WHERE pr.used_at IS NULL AND pr.expires_at > ? ORDER BY pr.created_at DESC", (_now(),))
+    return fetchall_rows(sql + "ORDER BY pr.created_at DESC")
 
 def reset_password_with_token(token: str, new_password: str) -> bool:
-    conn = get_conn()
-    cur = conn.cursor()
-    pr = cur.execute(
-        "SELECT * FROM password_resets WHERE token=? AND used_at IS NULL AND expires_at > datetime('now')",
-        (token.strip(),),
-    ).fetchone()
+    pr = fetchone("SELECT id, user_id FROM password_resets WHERE token=? AND used_at IS NULL AND expires_at > ?",
+                  (token.strip(), _now()))
     if not pr:
-        conn.close()
         return False
-    user_id = int(pr["user_id"])
-    cur.execute("UPDATE users SET password_hash=? WHERE id=?", (_hash_password(new_password), user_id))
-    cur.execute("UPDATE password_resets SET used_at=datetime('now') WHERE id=?", (pr["id"],))
-    conn.commit()
-    conn.close()
+    salt, ph = pbkdf2_hash_password(new_password)
+    exec_sql("UPDATE users SET salt=?, password_hash=? WHERE id=?", (salt, ph, int(pr["user_id"])))
+    exec_sql("UPDATE password_resets SET used_at=? WHERE id=?", (_now(), pr["id"]))
     return True
 
 # ----------------- audit log -----------------
 def log_event(actor_user_id: Optional[int], workspace_id: Optional[int], action: str,
               entity_type: str = "", entity_id: Optional[int] = None, meta: Optional[Dict[str, Any]] = None) -> None:
-    conn = get_conn()
-    conn.execute(
-        "INSERT INTO audit_log (actor_user_id, workspace_id, action, entity_type, entity_id, meta_json) VALUES (?,?,?,?,?,?)",
-        (
-            actor_user_id if actor_user_id is not None else None,
-            workspace_id if workspace_id is not None else None,
-            action,
-            entity_type or "",
-            entity_id if entity_id is not None else None,
-            json.dumps(meta or {}, ensure_ascii=False),
-        ),
-    )
-    conn.commit()
-    conn.close()
+    # enfileira; a thread do services.audit grava em lote
+    audit.log_event(actor_user_id, workspace_id, action, entity_type, entity_id, meta)
 
 def list_audit(workspace_id: Optional[int] = None, limit: int = 200) -> List[Dict[str, Any]]:
-    conn = get_conn()
+    audit.flush()
+    sql = "SELECT a.*, u.email as actor_email FROM audit_log a LEFT JOIN users u ON u.id=a.actor_user_id "
     if workspace_id is None:
-        rows = conn.execute(
-            "SELECT a.*, u.email as actor_email FROM audit_log a LEFT JOIN users u ON u.id=a.actor_user_id "
-            "ORDER BY a.created_at DESC LIMIT ?",
-            (int(limit),),
-        ).fetchall()
-    else:
-        rows = conn.execute(
-            "SELECT a.*, u.email as actor_email FROM audit_log a LEFT JOIN users u ON u.id=a.actor_user_id "
-            "WHERE a.workspace_id=? ORDER BY a.created_at DESC LIMIT ?",
-            (int(workspace_id), int(limit)),
-        ).fetchall()
-    conn.close()
-    out=[]
-    for r in rows:
-        d=row_to_dict(r)
-        try:
-            d["meta"]=json.loads(d.get("meta_json","{}") or "{}")
-        except Exception:
-            d["meta"]={}
-        out.append(d)
-    return out
+        return fetchall_rows(sql + "ORDER BY a.created_at DESC LIMIT ?", (int(limit),), json_cols={"meta": "details_json"})
+    return fetchall_rows(sql + "WHERE a.workspace_id=? ORDER BY a.created_at DESC LIMIT ?",
+                         (int(workspace_id), int(limit)), json_cols={"meta": "details_json"})
 
 # ----------------- membership management -----------------
 def list_workspace_members(workspace_id: int) -> List[Dict[str, Any]]:
-    conn = get_conn()
-    rows = conn.execute(
-        "SELECT m.user_id, m.workspace_id, m.role, m.created_at, u.email, u.name, u.is_active "
-        "FROM memberships m JOIN users u ON u.id=m.user_id WHERE m.workspace_id=? ORDER BY u.email",
+    return fetchall_rows(
+        "SELECT m.user_id, m.workspace_id, m.role, m.added_at AS created_at, u.email, u.name, u.is_active "
+        "FROM workspace_members m JOIN users u ON u.id=m.user_id WHERE m.workspace_id=? ORDER BY u.email",
         (workspace_id,),
-    ).fetchall()
-    conn.close()
-    return [row_to_dict(r) for r in rows]
+    )
 
 def set_membership_role(workspace_id: int, user_id: int, role: str) -> None:
-    role = (role or "viewer").strip().lower()
-    if role not in ("owner","editor","viewer"):
-        role = "viewer"
-    conn = get_conn()
-    conn.execute("UPDATE memberships SET role=? WHERE workspace_id=? AND user_id=?", (role, workspace_id, user_id))
-    conn.commit()
-    conn.close()
+    exec_sql("UPDATE workspace_members SET role=? WHERE workspace_id=? AND user_id=?",
+             (_role(role, "viewer"), workspace_id, user_id))
 
 def remove_membership(workspace_id: int, user_id: int) -> None:
-    conn = get_conn()
-    conn.execute("DELETE FROM memberships WHERE workspace_id=? AND user_id=?", (workspace_id, user_id))
-    conn.commit()
-    conn.close()
+    exec_sql("DELETE FROM workspace_members WHERE workspace_id=? AND user_id=?", (workspace_id, user_id))
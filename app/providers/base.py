@@ -1,5 +1,6 @@
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 class LLMProvider(ABC):
     key_name: str  # for display
@@ -11,3 +12,27 @@ class LLMProvider(ABC):
     @abstractmethod
     def chat(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int) -> str:
         raise NotImplementedError
+
+    def chat_with_usage(self, messages: List[Dict[str, str]], model: str, temperature: float,
+                        max_tokens: int) -> Tuple[str, Dict[str, Any]]:
+        """Como chat(), devolvendo também tokens e latência. Providers que recebem `usage`
+        do upstream sobrescrevem; aqui os tokens são estimados e não há TTFT."""
+        from ..services.text_utils import count_tokens
+        t0 = time.perf_counter()
+        out = self.chat(messages=messages, model=model, temperature=temperature, max_tokens=max_tokens)
+        return out, usage_dict(
+            self.key_name, model,
+            sum(count_tokens(m.get("content", "")) for m in messages), count_tokens(out),
+            (time.perf_counter() - t0) * 1000, None,
+        )
+
+def usage_dict(provider: str, model: str, prompt_tokens: int, completion_tokens: int,
+               latency_ms: float, ttft_ms: Optional[float]) -> Dict[str, Any]:
+    return {
+        "provider": provider,
+        "model": model,
+        "prompt_tokens": int(prompt_tokens),
+        "completion_tokens": int(completion_tokens),
+        "latency_ms": int(latency_ms),
+        "ttft_ms": int(ttft_ms) if ttft_ms is not None else None,
+    }
@@ -1,16 +1,20 @@
 import os
-from typing import Dict, List
+import time
+from typing import Any, Dict, List, Tuple
 import streamlit as st
 from groq import Groq
-from .base import LLMProvider
+from .base import LLMProvider, usage_dict
 
 class GroqProvider(LLMProvider):
     key_name = "groq"
 
     def __init__(self) -> None:
         api_key = None
-        if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
-            api_key = st.secrets["GROQ_API_KEY"]
+        try:
+            if hasattr(st, "secrets") and "GROQ_API_KEY" in st.secrets:
+                api_key = st.secrets["GROQ_API_KEY"]
+        except Exception:
+            api_key = None  # sem secrets.toml (ex.: worker fora do Streamlit)
         if not api_key:
             api_key = os.environ.get("GROQ_API_KEY")
         if not api_key:
@@ -23,6 +27,8 @@ class GroqProvider(LLMProvider):
             "llama-3.3-70b-versatile",
             "llama-3.1-70b-versatile",
             "llama-3.1-8b-instant",
+            "openai/gpt-oss-120b",
+            "qwen/qwen3-32b",
         ]
 
     def chat(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int) -> str:
@@ -33,3 +39,34 @@ class GroqProvider(LLMProvider):
             max_tokens=max_tokens,
         )
         return resp.choices[0].message.content
+
+    def chat_with_usage(self, messages: List[Dict[str, str]], model: str, temperature: float,
+                        max_tokens: int) -> Tuple[str, Dict[str, Any]]:
+        # streaming só para medir o tempo até o 1º token; o uso real vem no último chunk (x_groq.usage)
+        t0 = time.perf_counter()
+        ttft = None
+        parts: List[str] = []
+        usage = None
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                if ttft is None:
+                    ttft = (time.perf_counter() - t0) * 1000
+                parts.append(delta)
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                usage = x_groq.usage
+        out = "".join(parts)
+        latency = (time.perf_counter() - t0) * 1000
+        if usage is None:
+            from ..services.text_utils import count_tokens
+            return out, usage_dict(self.key_name, model, sum(count_tokens(m["content"]) for m in messages),
+                                   count_tokens(out), latency, ttft)
+        return out, usage_dict(self.key_name, model, usage.prompt_tokens, usage.completion_tokens, latency, ttft)
@@ -0,0 +1,234 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from .base import LLMProvider
+
+log = logging.getLogger(__name__)
+
+class LatencyStats:
+    """Janela móvel de latência/erros de um (provider, modelo)."""
+
+    def __init__(self, window: int = 200) -> None:
+        self._samples: Deque[Tuple[float, bool]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_s: float, ok: bool) -> None:
+        with self._lock:
+            self._samples.append((latency_s, ok))
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            lat = sorted(l for l, ok in self._samples if ok)
+        if not lat:
+            return None
+        return lat[min(len(lat) - 1, int(q * len(lat)))]
+
+    @property
+    def p50(self) -> Optional[float]:
+        return self.percentile(0.50)
+
+    @property
+    def p95(self) -> Optional[float]:
+        return self.percentile(0.95)
+
+    @property
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+
+class _Attempt:
+    """Uma chamada disparada a um provider. A latência entra nas estatísticas uma vez só:
+    no timeout ou quando ela termina, o que vier primeiro."""
+
+    def __init__(self, provider: LLMProvider) -> None:
+        self.provider = provider
+        self.started = time.monotonic()
+        self.ended: Optional[float] = None
+        self._recorded = False
+        self._lock = threading.Lock()
+
+    def claim(self) -> bool:
+        with self._lock:
+            first, self._recorded = not self._recorded, True
+            return first
+
+
+class RouterProvider(LLMProvider):
+    """Roteia cada chamada entre vários providers.
+
+    - ordena os candidatos do modelo pela saúde medida (p95 e taxa de erro);
+    - em erro ou timeout passa para o próximo candidato (failover);
+    - com `hedge=True`, se a 1ª chamada passar do p95 dela, dispara uma 2ª em paralelo
+      (no próximo candidato, ou no mesmo provider se só houver um) e fica com a que
+      responder primeiro.
+    """
+
+    key_name = "router"
+
+    def __init__(
+        self,
+        providers: List[LLMProvider],
+        timeout_s: float = 60.0,
+        hedge: bool = True,
+        hedge_min_samples: int = 20,
+        max_workers: int = 16,
+    ) -> None:
+        if not providers:
+            raise RuntimeError("Nenhum provider configurado para o roteador.")
+        self.providers = list(providers)
+        self.timeout_s = timeout_s
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self._stats: Dict[Tuple[str, str], LatencyStats] = {}
+        self._stats_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-router")
+
+    def available_models(self) -> List[str]:
+        out: List[str] = []
+        for p in self.providers:
+            for m in p.available_models():
+                if m not in out:
+                    out.append(m)
+        return out
+
+    def stats(self, provider: LLMProvider, model: str) -> LatencyStats:
+        key = (provider.key_name, model)
+        with self._stats_lock:
+            if key not in self._stats:
+                self._stats[key] = LatencyStats()
+            return self._stats[key]
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        with self._stats_lock:
+            items = list(self._stats.items())
+        return [
+            {"provider": k[0], "model": k[1], "n": len(s), "p50": s.p50, "p95": s.p95, "error_rate": s.error_rate}
+            for k, s in items
+        ]
+
+    def candidates(self, model: str) -> List[LLMProvider]:
+        cands = [p for p in self.providers if not p.available_models() or model in p.available_models()]
+        if not cands:
+            raise RuntimeError(f"Nenhum provider atende o modelo {model}.")
+
+        def score(p: LLMProvider) -> float:
+            s = self.stats(p, model)
+            if not len(s):
+                return 0.0  # sem histórico: testa logo
+            return (s.p95 or self.timeout_s) * (1 + 10 * s.error_rate)
+
+        return sorted(cands, key=score)
+
+    def _hedge_delay(self, provider: LLMProvider, model: str) -> Optional[float]:
+        s = self.stats(provider, model)
+        if not self.hedge or len(s) < self.hedge_min_samples:
+            return None
+        return s.p95
+
+    def _call(self, attempt: _Attempt, messages: List[Dict[str, str]], model: str,
+              temperature: float, max_tokens: int) -> Tuple[str, Dict[str, Any]]:
+        t0 = time.perf_counter()
+        try:
+            out = attempt.provider.chat_with_usage(messages=messages, model=model, temperature=temperature,
+                                                   max_tokens=max_tokens)
+        except Exception:
+            attempt.ended = time.monotonic()
+            if attempt.claim():
+                self.stats(attempt.provider, model).record(time.perf_counter() - t0, False)
+            raise
+        attempt.ended = time.monotonic()
+        if attempt.claim():
+            self.stats(attempt.provider, model).record(time.perf_counter() - t0, True)
+        return out
+
+    def chat(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int) -> str:
+        return self.chat_with_usage(messages, model, temperature, max_tokens)[0]
+
+    def chat_with_usage(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int,
+                        on_other: Optional[Callable[[Dict[str, Any], bool], None]] = None) -> Tuple[str, Dict[str, Any]]:
+        """`on_other(usage, ok)` é chamado uma vez para cada chamada disparada que não é a devolvida
+        (falhas, timeouts e o perdedor do hedge), quando ela terminar: tokens gastos também contam."""
+        t0 = time.perf_counter()
+        queue = self.candidates(model)
+        pending: Dict[Future, _Attempt] = {}
+        launched: Dict[Future, _Attempt] = {}
+        errors: List[str] = []
+        hedged = False
+
+        def launch(p: LLMProvider) -> None:
+            a = _Attempt(p)
+            f = self._pool.submit(self._call, a, messages, model, temperature, max_tokens)
+            pending[f] = launched[f] = a
+
+        def settle(winner: Optional[Future]) -> None:
+            if on_other is None:
+                return
+            for f, a in launched.items():
+                if f is not winner:
+                    f.add_done_callback(lambda f, a=a: self._report(on_other, f, a, model))
+
+        primary = queue.pop(0)
+        launch(primary)
+        while pending:
+            now = time.monotonic()
+            deadline = min(a.started + self.timeout_s for a in pending.values())
+            wake = deadline
+            delay = None if hedged else self._hedge_delay(primary, model)
+            if delay is not None:
+                wake = min(wake, min(a.started for a in pending.values()) + delay)
+            done, _ = wait(list(pending), timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+
+            for f in done:
+                p = pending.pop(f).provider
+                try:
+                    out, usage = f.result()
+                except Exception as e:
+                    errors.append(f"{p.key_name}: {e}")
+                    if queue and not pending:
+                        launch(queue.pop(0))
+                    continue
+                # latência percebida por quem chamou (inclui failover e hedge)
+                usage.update(latency_ms=int((time.perf_counter() - t0) * 1000), hedged=hedged,
+                             attempts=len(launched))
+                settle(f)
+                return out, usage
+            if done:
+                continue
+
+            now = time.monotonic()
+            for f, a in list(pending.items()):
+                if now - a.started >= self.timeout_s:
+                    # a thread segue rodando, mas não esperamos mais por ela
+                    pending.pop(f)
+                    if a.claim():
+                        self.stats(a.provider, model).record(now - a.started, False)
+                    errors.append(f"{a.provider.key_name}: timeout de {self.timeout_s:.0f}s")
+            if not pending and queue:
+                launch(queue.pop(0))
+            elif pending and not hedged and delay is not None:
+                hedged = True
+                launch(queue.pop(0) if queue else primary)
+        settle(None)
+        raise RuntimeError("Todos os providers falharam: " + "; ".join(errors))
+
+    @staticmethod
+    def _report(on_other: Callable[[Dict[str, Any], bool], None], f: Future, a: _Attempt, model: str) -> None:
+        try:
+            usage, ok = f.result()[1], True
+        except Exception:
+            usage, ok = {"provider": a.provider.key_name, "model": model,
+                         "latency_ms": int(((a.ended or time.monotonic()) - a.started) * 1000)}, False
+        try:
+            on_other(usage, ok)
+        except Exception:
+            # contabilidade não derruba a resposta (roda também em thread do pool)
+            log.exception("falha ao registrar uso de %s/%s", a.provider.key_name, model)
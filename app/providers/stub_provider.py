@@ -0,0 +1,39 @@
+import random
+import time
+from typing import Dict, List, Optional
+from .base import LLMProvider
+
+class StubProvider(LLMProvider):
+    """Provider local para testes e desenvolvimento: latência e falhas configuráveis, sem rede."""
+
+    def __init__(
+        self,
+        key_name: str = "stub",
+        models: Optional[List[str]] = None,
+        latency_s: float = 0.0,
+        jitter_s: float = 0.0,
+        fail_rate: float = 0.0,
+        reply: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> None:
+        self.key_name = key_name
+        self.models = list(models or [])
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.fail_rate = fail_rate
+        self.reply = reply
+        self.calls = 0
+        self._rnd = random.Random(seed)
+
+    def available_models(self) -> List[str]:
+        return list(self.models)
+
+    def chat(self, messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int) -> str:
+        self.calls += 1
+        time.sleep(max(0.0, self.latency_s + self._rnd.uniform(0, self.jitter_s)))
+        if self._rnd.random() < self.fail_rate:
+            raise RuntimeError(f"{self.key_name}: falha simulada")
+        if self.reply is not None:
+            return self.reply
+        last = messages[-1]["content"] if messages else ""
+        return f"[{self.key_name}/{model}] {last[:200]}"
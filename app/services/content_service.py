@@ -1,6 +1,9 @@
-from typing import Dict, List, Optional
-from .text_utils import normalize_text, chunk_text
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from .text_utils import normalize_text, count_tokens, chunk_by_tokens, token_budget
 from ..providers.base import LLMProvider
+from ..providers.router import RouterProvider
 
 DEFAULT_SYSTEM = (
     "Você é um estrategista de marketing e copywriter focado em Instagram. "
@@ -32,49 +35,108 @@ def run_task(
     max_tokens: int = 1200,
     system_prompt: str = DEFAULT_SYSTEM,
     chunking: bool = True,
+    overlap_tokens: int = 150,
+    context_window: Optional[int] = None,
+    reduce: str = "tree",  # tree | flat
+    fan_in: int = 4,
+    parallelism: int = 4,
+    workspace_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    record_usage: bool = True,
 ) -> str:
+    """Cada chamada ao provider (blocos e consolidações) vira uma linha em llm_calls, como o
+    providers.router.chat_with_usage; record_usage=False desliga (benchmarks)."""
+    from services.usage import check_quota, record_call
+    if record_usage and workspace_id is not None:
+        check_quota(workspace_id)
     ctx = build_client_context(client)
     input_text = normalize_text(input_text or "")
     user_payload = f"Contexto do cliente:\n{ctx}\n\nTarefa:\n{instruction}".strip()
-    if input_text:
-        user_payload += f"\n\nMaterial de apoio (ex.: transcrição):\n{input_text}"
+    # tokens livres para o material depois de reservar system prompt, contexto/tarefa e saída
+    budget = token_budget(model, system_prompt, user_payload, "[Bloco 00/00]", max_output=max_tokens,
+                          window=context_window)
 
-    if not chunking or len(input_text) <= 6000:
-        return provider.chat(
+    def call(content: str) -> str:
+        kw = dict(
             messages=[
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_payload},
+                {"role": "user", "content": content},
             ],
             model=model,
             temperature=temperature,
             max_tokens=max_tokens,
         )
+        if not record_usage:
+            return provider.chat(**kw)
+        if isinstance(provider, RouterProvider):
+            # o roteador reporta sozinho as tentativas que não devolve (falhas, timeouts, hedge)
+            kw["on_other"] = lambda u, ok: record_call(u, workspace_id, client_id, ok=ok)
+            out, usage = provider.chat_with_usage(**kw)
+        else:
+            t0 = time.perf_counter()
+            try:
+                out, usage = provider.chat_with_usage(**kw)
+            except Exception:
+                record_call({"provider": provider.key_name, "model": model,
+                             "latency_ms": int((time.perf_counter() - t0) * 1000)}, workspace_id, client_id, ok=False)
+                raise
+        record_call(usage, workspace_id, client_id)
+        return out
 
-    # chunking do material de apoio
-    chunks = chunk_text(input_text, max_chars=6000)
-    partials=[]
-    for i,ch in enumerate(chunks, start=1):
-        partials.append(
-            provider.chat(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"{user_payload}\n\n[Bloco {i}/{len(chunks)}]\n{ch}"},
-                ],
-                model=model,
-                temperature=temperature,
-                max_tokens=max_tokens,
-            )
-        )
-    joined="\n\n".join([f"[BLOCO {i+1}]\n{p}" for i,p in enumerate(partials)])
-    return provider.chat(
-        messages=[
-            {"role":"system","content":system_prompt},
-            {"role":"user","content":"Consolide numa resposta final, sem repetir blocos:\n\n"+joined},
-        ],
-        model=model,
-        temperature=temperature,
-        max_tokens=max_tokens,
-    )
+    if not chunking or count_tokens(input_text) <= budget:
+        if input_text:
+            user_payload += f"\n\nMaterial de apoio (ex.: transcrição):\n{input_text}"
+        return call(user_payload)
+
+    # chunking do material de apoio, empacotado até o orçamento de tokens do modelo
+    chunks = chunk_by_tokens(input_text, budget, overlap_tokens=overlap_tokens)
+    with ThreadPoolExecutor(max_workers=max(1, parallelism)) as pool:
+        partials = list(pool.map(call, [f"{user_payload}\n\n[Bloco {i}/{len(chunks)}]\n{ch}"
+                                        for i, ch in enumerate(chunks, start=1)]))
+        if reduce == "flat":
+            return call(FINAL_REDUCE + _join_blocks(partials))
+        reduce_budget = token_budget(model, system_prompt, PARTIAL_REDUCE, max_output=max_tokens,
+                                     window=context_window)
+        return _tree_reduce(call, pool, partials, max(2, fan_in), reduce_budget)
+
+
+FINAL_REDUCE = "Consolide numa resposta final, sem repetir blocos:\n\n"
+PARTIAL_REDUCE = ("Consolide estes blocos numa síntese única, sem repetir itens e sem perder "
+                  "ideias úteis (ela será consolidada de novo depois):\n\n")
+
+def _join_blocks(partials: List[str]) -> str:
+    return "\n\n".join([f"[BLOCO {i+1}]\n{p}" for i,p in enumerate(partials)])
+
+def _group_partials(partials: List[str], fan_in: int, budget: int) -> List[List[str]]:
+    """Agrupa parciais vizinhas em grupos de até `fan_in` itens que caibam em `budget` tokens.
+    Todo grupo tem ao menos 2 itens (quando há), para que cada nível sempre encolha; só o
+    último pode ficar com 1, e aí passa direto para o nível seguinte."""
+    groups: List[List[str]] = []
+    size = 0
+    for p in partials:
+        t = count_tokens(p) + 8
+        g = groups[-1] if groups else None
+        if g is not None and (len(g) < 2 or (len(g) < fan_in and size + t <= budget)):
+            g.append(p)
+            size += t
+        else:
+            groups.append([p])
+            size = t
+    # juntar a sobra ao grupo anterior passaria de fan_in (e do orçamento): só pega um item emprestado
+    if len(groups) > 1 and len(groups[-1]) == 1 and len(groups[-2]) > 2:
+        groups[-1].insert(0, groups[-2].pop())
+    return groups
+
+def _tree_reduce(call: Callable[[str], str], pool: ThreadPoolExecutor, partials: List[str],
+                 fan_in: int, budget: int) -> str:
+    """Consolida em níveis de grupos com fan-in limitado até sobrar uma resposta:
+    cada nível roda em paralelo, então a latência cresce com log(n) e nenhum prompt
+    de consolidação passa do orçamento."""
+    while True:
+        groups = _group_partials(partials, fan_in, budget)
+        if len(groups) == 1:
+            return call(FINAL_REDUCE + _join_blocks(groups[0]))
+        partials = list(pool.map(lambda g: g[0] if len(g) == 1 else call(PARTIAL_REDUCE + _join_blocks(g)), groups))
 
 
 
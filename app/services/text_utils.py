@@ -1,5 +1,5 @@
 import re
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 def normalize_text(text: str) -> str:
     text = re.sub(r"[ \t]+", " ", text or "").strip()
@@ -32,3 +32,103 @@ def chunk_text(text: str, max_chars: int = 6000) -> List[str]:
     if buff:
         chunks.append(buff)
     return chunks
+
+# ----------------- tokens -----------------
+# Janela de contexto (tokens) por modelo; desconhecidos caem no DEFAULT_CONTEXT
+MODEL_CONTEXT: Dict[str, int] = {
+    "llama-3.3-70b-versatile": 131_072,
+    "llama-3.1-70b-versatile": 131_072,
+    "llama-3.1-8b-instant": 131_072,
+    "openai/gpt-oss-120b": 131_072,
+    "qwen/qwen3-32b": 131_072,
+}
+DEFAULT_CONTEXT = 8_192
+# Teto por bloco mesmo em modelos de janela enorme: blocos gigantes estouram o TPM do Groq
+# e degradam a atenção do modelo no meio do texto.
+MAX_CHUNK_TOKENS = 12_000
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_encoder: Any = None
+
+def _get_encoder() -> Any:
+    global _encoder
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    return _encoder
+
+def count_tokens(text: str) -> int:
+    """Conta tokens com tiktoken se instalado; senão estima (~4 caracteres por token de palavra)."""
+    if not text:
+        return 0
+    enc = _get_encoder()
+    if enc:
+        return len(enc.encode(text, disallowed_special=()))
+    return sum(max(1, -(-len(w) // 4)) for w in _TOKEN_RE.findall(text))
+
+def context_window(model: str) -> int:
+    return MODEL_CONTEXT.get(model, DEFAULT_CONTEXT)
+
+def token_budget(model: str, *reserved: str, max_output: int = 1200, margin: float = 0.1,
+                 window: Optional[int] = None) -> int:
+    """Tokens livres para o material de apoio depois de reservar prompts fixos e a saída."""
+    window = window or context_window(model)
+    used = sum(count_tokens(r) for r in reserved) + int(max_output)
+    free = int(window * (1 - margin)) - used
+    return max(256, min(free, MAX_CHUNK_TOKENS))
+
+def _split_long(piece: str, max_tokens: int) -> List[str]:
+    words = piece.split(" ")
+    out: List[str] = []
+    buff: List[str] = []
+    size = 0
+    for w in words:
+        t = count_tokens(w) + 1
+        if buff and size + t > max_tokens:
+            out.append(" ".join(buff))
+            buff, size = [], 0
+        buff.append(w)
+        size += t
+    if buff:
+        out.append(" ".join(buff))
+    return out
+
+def chunk_by_tokens(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """Empacota parágrafos em blocos de até `max_tokens`, repetindo no início de cada bloco
+    os últimos parágrafos do anterior até `overlap_tokens`."""
+    text = (text or "").strip()
+    if count_tokens(text) <= max_tokens:
+        return [text]
+    pieces: List[Tuple[str, int]] = []
+    for p in re.split(r"\n\s*\n", text):
+        p = p.strip()
+        if not p:
+            continue
+        t = count_tokens(p)
+        if t > max_tokens:
+            pieces.extend((s, count_tokens(s)) for s in _split_long(p, max_tokens))
+        else:
+            pieces.append((p, t))
+
+    chunks: List[str] = []
+    buff: List[Tuple[str, int]] = []
+    size = 0
+    for p, t in pieces:
+        if buff and size + t + 1 > max_tokens:
+            chunks.append("\n\n".join(x for x, _ in buff))
+            carry: List[Tuple[str, int]] = []
+            carried = 0
+            for x, xt in reversed(buff):
+                if carried + xt > overlap_tokens or carried + xt + t + 1 > max_tokens:
+                    break
+                carry.insert(0, (x, xt))
+                carried += xt + 1
+            buff, size = carry, carried
+        buff.append((p, t))
+        size += t + 1
+    if buff:
+        chunks.append("\n\n".join(x for x, _ in buff))
+    return chunks
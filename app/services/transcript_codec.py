@@ -0,0 +1,64 @@
+import json
+import zlib
+from typing import Any, Dict, List, Optional
+
+# Formato compacto de transcrição:
+#  - texto: utf-8 comprimido com zlib;
+#  - segmentos: colunas (início em ms com delta, duração em ms, offset/tamanho no texto)
+#    em JSON comprimido. O texto do segmento não é repetido: sai de um fatiamento do texto.
+_VERSION = 1
+
+def encode_text(text: str) -> bytes:
+    return zlib.compress((text or "").encode("utf-8"), 6)
+
+def decode_text(blob: Optional[bytes]) -> str:
+    if not blob:
+        return ""
+    return zlib.decompress(bytes(blob)).decode("utf-8")
+
+def encode_segments(text: str, segments: List[Dict[str, Any]]) -> bytes:
+    starts: List[int] = []
+    durs: List[int] = []
+    offs: List[int] = []
+    lens: List[int] = []
+    extra: Dict[str, str] = {}  # segmentos que não aparecem no texto (raro)
+    cursor = 0
+    prev = 0
+    for i, s in enumerate(segments or []):
+        st = int(round(float(s.get("start") or 0) * 1000))
+        en = int(round(float(s.get("end") or 0) * 1000))
+        starts.append(st - prev)
+        durs.append(max(0, en - st))
+        prev = st
+        seg_text = (s.get("text") or "").strip()
+        pos = text.find(seg_text, cursor) if seg_text else cursor
+        if pos < 0:
+            extra[str(i)] = seg_text
+            offs.append(cursor)
+            lens.append(0)
+            continue
+        offs.append(pos - cursor)
+        lens.append(len(seg_text))
+        cursor = pos + len(seg_text)
+    first_id = segments[0].get("id") if segments else 0
+    data = {"v": _VERSION, "id0": first_id or 0, "s": starts, "d": durs, "o": offs, "l": lens}
+    if extra:
+        data["x"] = extra
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode("utf-8"), 6)
+
+def decode_segments(blob: Optional[bytes], text: str) -> List[Dict[str, Any]]:
+    if not blob:
+        return []
+    data = json.loads(zlib.decompress(bytes(blob)).decode("utf-8"))
+    extra = data.get("x") or {}
+    out: List[Dict[str, Any]] = []
+    st = 0
+    cursor = 0
+    for i, (ds, du, do, ln) in enumerate(zip(data["s"], data["d"], data["o"], data["l"])):
+        st += ds
+        pos = cursor + do
+        seg_text = extra.get(str(i)) if str(i) in extra else text[pos:pos + ln]
+        if str(i) not in extra:
+            cursor = pos + ln
+        out.append({"id": data.get("id0", 0) + i, "start": st / 1000, "end": (st + du) / 1000, "text": seg_text})
+    return out
@@ -3,7 +3,7 @@ import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 import extra_streamlit_components as stx
 
-from db import fetchone, fetchall, exec_sql
+from db import fetchone, fetchall, exec_sql, read_only, IntegrityError
 from security import pbkdf2_hash_password, verify_password, make_session_token, parse_session_token
 
 COOKIE_NAME = "content_os_session"
@@ -96,6 +96,7 @@ def idle_guard():
 def login_ui():
     st.title("Content OS — Login")
     tabs = st.tabs(["Entrar", "Solicitar conta", "Aceitar convite"])
+    ro = read_only()  # modo somente leitura: dá para entrar, mas não para criar conta ou aceitar convite
 
     with tabs[0]:
         email = st.text_input("Email", key="li_email").strip().lower()
@@ -121,7 +122,9 @@ def login_ui():
         ws = st.text_input("Nome do painel", value="Meu Painel", key="su_ws").strip()
         p1 = st.text_input("Senha", type="password", key="su_p1")
         p2 = st.text_input("Confirmar senha", type="password", key="su_p2")
-        if st.button("Solicitar"):
+        if ro:
+            st.info(ro)
+        if st.button("Solicitar", disabled=bool(ro)):
             if not email or not p1:
                 st.error("Email e senha são obrigatórios.")
             elif p1 != p2:
@@ -135,7 +138,9 @@ def login_ui():
     with tabs[2]:
         email = st.text_input("Seu email", key="iv_email").strip().lower()
         token = st.text_input("Token do convite", key="iv_token").strip()
-        if st.button("Aceitar convite", type="primary"):
+        if ro:
+            st.info(ro)
+        if st.button("Aceitar convite", type="primary", disabled=bool(ro)):
             u = fetchone("SELECT * FROM users WHERE email=?", (email,))
             inv = fetchone("SELECT * FROM invites WHERE token=?", (token,))
             if not u or not u.get("is_active"):
@@ -148,7 +153,7 @@ def login_ui():
             try:
                 exec_sql("INSERT INTO workspace_members (workspace_id,user_id,role,added_at) VALUES (?,?,?,?)",
                          (inv["workspace_id"], u["id"], inv["role"], now_utc()))
-            except Exception:
+            except IntegrityError:  # já era membro: só troca o papel
                 exec_sql("UPDATE workspace_members SET role=? WHERE workspace_id=? AND user_id=?",
                          (inv["role"], inv["workspace_id"], u["id"]))
             exec_sql("UPDATE invites SET used_by_user_id=?, used_at=? WHERE id=?", (u["id"], now_utc(), inv["id"]))
@@ -0,0 +1,68 @@
+"""Chamadas ao provider por transcrição: chunk por caracteres (6000) x por tokens.
+
+    python -m bench.bench_chunking [--flat] [minutos_de_video ...]
+"""
+import random
+import sys
+import threading
+import time
+
+from app.providers.base import LLMProvider
+from app.services.content_service import run_task
+from app.services.text_utils import chunk_text, context_window, count_tokens, normalize_text
+
+WORDS = ("cliente conteúdo estratégia vendas público engajamento reels gancho oferta resultado "
+         "método semana dinheiro negócio instagram vídeo primeiro passo importante exemplo").split()
+
+
+class CountingProvider(LLMProvider):
+    key_name = "bench"
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self.calls = 0
+        self.max_prompt = 0
+        self.overflows = 0
+        self._lock = threading.Lock()
+
+    def available_models(self):
+        return ["bench"]
+
+    def chat(self, messages, model, temperature, max_tokens):
+        used = sum(count_tokens(m["content"]) for m in messages) + max_tokens
+        with self._lock:
+            self.calls += 1
+            self.max_prompt = max(self.max_prompt, used)
+            if used > self.window:
+                self.overflows += 1
+        return "resumo do bloco " * 40
+
+
+def fake_transcript(minutes: int, seed: int = 7) -> str:
+    rnd = random.Random(seed)
+    sentences = []
+    for _ in range(minutes * 150 // 12):  # ~150 palavras/min, ~12 palavras/frase
+        sentences.append(" ".join(rnd.choice(WORDS) for _ in range(rnd.randint(6, 18))).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def main(argv):
+    reduce = "flat" if "--flat" in argv else "tree"
+    minutes = [int(a) for a in argv if a.isdigit()] or [10, 30, 60, 120]
+    client = {"name": "Bench", "description": "cliente de benchmark"}
+    print(f"{'min':>5} {'tokens':>8} {'janela':>7} {'chars(6000)':>12} {'tokens':>7} {'max_prompt':>11} {'overflow':>9} {'ms':>6}")
+    for model, window in [("desconhecido", context_window("desconhecido")), ("llama-3.3-70b-versatile", None)]:
+        for m in minutes:
+            text = fake_transcript(m)
+            old_calls = len(chunk_text(normalize_text(text), max_chars=6000))
+            old_calls += 1 if old_calls > 1 else 0  # + consolidação
+            prov = CountingProvider(window or context_window(model))
+            t0 = time.perf_counter()
+            run_task(prov, model, client, "Gere 3 ideias de Reels.", input_text=text, reduce=reduce, record_usage=False)
+            ms = (time.perf_counter() - t0) * 1000
+            print(f"{m:>5} {count_tokens(text):>8} {prov.window:>7} {old_calls:>12} {prov.calls:>7} "
+                  f"{prov.max_prompt:>11} {prov.overflows:>9} {ms:>6.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
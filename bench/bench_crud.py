@@ -0,0 +1,63 @@
+"""Caminhos CRUD do app/db.py (agora sobre o db.py da raiz) e leitura em dict x Row.
+
+    python -m bench.bench_crud [n]
+
+Roda num banco SQLite novo em diretório temporário. Para cada operação mostra
+chamadas/s; no fim compara fetchall (dicts) com fetchall_rows (Row) na mesma consulta.
+"""
+import os
+import sys
+import tempfile
+import time
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+
+def _timed(label: str, n: int, fn) -> list:
+    t = time.perf_counter()
+    out = [fn(i) for i in range(n)]
+    dt = time.perf_counter() - t
+    print(f"{label:<28} {n:>6} chamadas  {n / dt:>10.0f}/s  {dt * 1000 / n:.3f} ms/chamada")
+    return out
+
+
+def main() -> None:
+    tmp = tempfile.mkdtemp()
+    os.environ["CONTENT_OS_DB"] = os.path.join(tmp, "bench.db")
+    os.chdir(tmp)
+    from app import db as repo
+    import db
+
+    repo.init_db()
+    uid = repo.create_user("bench@example.com", "senha", is_active=True)
+    wid = repo.create_workspace("Bench")
+    repo.add_membership(uid, wid, "owner")
+    cids = _timed("upsert_client (insert)", N, lambda i: repo.upsert_client(f"c{i}", "", {"tom": "leve"}, wid))
+    _timed("upsert_client (update)", N, lambda i: repo.upsert_client(f"c{i}", "d", {"tom": "sério"}, wid, cids[i]))
+    _timed("get_client", N, lambda i: repo.get_client(wid, cids[i])["profile"])
+    vids = _timed("add_video", N, lambda i: repo.add_video(wid, cids[0], f"v{i}.mp4", f"/tmp/v{i}.mp4"))
+    segs = [{"start": 0.0, "end": 2.5, "text": "olá, bem-vindos ao canal"}]
+    tids = _timed("add_transcription", N // 5, lambda i: repo.add_transcription(wid, vids[i], segs[0]["text"], segs))
+    _timed("get_transcription", N // 5, lambda i: repo.get_transcription(wid, tids[i])["segments"])
+    _timed("add_content_item", N, lambda i: repo.add_content_item(
+        wid, cids[0], "post", f"t{i}", "transcription", tids[0], "groq", "m", "prompt", f"saída {i} " * 30,
+        tags=f"video:{vids[0]}"))
+    _timed("list_content_items", 50, lambda i: repo.list_content_items(wid, cids[0]))
+    _timed("upsert_schedule", N, lambda i: repo.upsert_schedule(wid, cids[0], i % 7, 9, 0, {"type": "post"}))
+    _timed("list_schedules", 50, lambda i: repo.list_schedules(wid, cids[0]))
+    _timed("log_event", N, lambda i: repo.log_event(uid, wid, "bench", "client", cids[0], {"i": i}))
+    _timed("list_audit", 50, lambda i: repo.list_audit(wid))
+    _timed("list_user_workspaces", N, lambda i: repo.list_user_workspaces(uid))
+
+    sql, params = "SELECT * FROM content_items WHERE workspace_id=? ORDER BY id DESC", (wid,)
+    for label, fetch in (("fetchall (dict)", db.fetchall), ("fetchall_rows (Row)", db.fetchall_rows)):
+        fetch(sql, params)
+        t = time.perf_counter()
+        for _ in range(20):
+            rows = fetch(sql, params)
+            sum(len(r["output_text"]) for r in rows)
+        print(f"{label:<28} {len(rows):>6} linhas   {(time.perf_counter() - t) * 1000 / 20:.2f} ms/consulta")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Escritas concorrentes no SQLite: conexão por escrita sem ajustes (como era) x WAL + thread escritora.
+
+    python -m bench.bench_sqlite_concurrency [writers] [writes_por_thread] [readers]
+
+Cada modo roda num banco novo em diretório temporário. Mede vazão de escrita,
+erros "database is locked", latência p95 de escrita e leituras feitas em paralelo.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+DDL = "CREATE TABLE IF NOT EXISTS bench (id INTEGER PRIMARY KEY AUTOINCREMENT, ws INTEGER, body TEXT, created_at TEXT)"
+BODY = "texto de conteúdo gerado " * 20
+
+
+def _legacy_write(path: str, sql: str, params: tuple) -> None:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _legacy_read(path: str, sql: str, params: tuple) -> list:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+
+def run(mode: str, writers: int, per_thread: int, readers: int) -> None:
+    path = os.environ["CONTENT_OS_DB"]
+    if mode == "legacy":
+        _legacy_write(path, DDL, ())
+        write = lambda sql, p: _legacy_write(path, sql, p)
+        read = lambda sql, p: _legacy_read(path, sql, p)
+    else:
+        import db
+        db.exec_sql(DDL)
+        write, read = db.exec_sql, db.fetchall
+
+    errors, lat, reads = [0], [], [0]
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def writer(w: int) -> None:
+        for i in range(per_thread):
+            t0 = time.perf_counter()
+            try:
+                write("INSERT INTO bench (ws,body,created_at) VALUES (?,?,?)", (w, BODY, str(i)))
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                lat.append(time.perf_counter() - t0)
+
+    def reader() -> None:
+        while not stop.is_set():
+            try:
+                read("SELECT COUNT(*) FROM bench WHERE ws=?", (1,))
+                with lock:
+                    reads[0] += 1
+            except sqlite3.OperationalError:
+                pass
+
+    rs = [threading.Thread(target=reader) for _ in range(readers)]
+    ws = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    t0 = time.perf_counter()
+    for t in rs + ws:
+        t.start()
+    for t in ws:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    for t in rs:
+        t.join()
+    lat.sort()
+    p95 = lat[int(0.95 * (len(lat) - 1))] * 1000 if lat else 0.0
+    print(f"{mode:>7}: {len(lat)} escritas ok, {errors[0]} 'locked', {len(lat) / elapsed:.0f} escritas/s, "
+          f"p95 {p95:.1f} ms, {reads[0] / elapsed:.0f} leituras/s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--mode":
+        run(sys.argv[2], *(int(a) for a in sys.argv[3:6]))
+        sys.exit(0)
+    args = (sys.argv[1:] + ["8", "250", "4"][len(sys.argv[1:]):])[:3]
+    for mode in ["legacy", "writer"]:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, CONTENT_OS_DB=os.path.join(tmp, "bench.db"), DATABASE_URL="")
+            subprocess.run([sys.executable, "-m", "bench.bench_sqlite_concurrency", "--mode", mode] + args,
+                           env=env, check=True)
@@ -1,82 +1,551 @@
+import contextvars
+import json
 import os
+import queue
 import sqlite3
-from typing import Optional, List
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
-def _get_database_url() -> str:
-    url = os.environ.get("DATABASE_URL", "").strip()
+def _get_database_url(name: str = "DATABASE_URL") -> str:
+    url = os.environ.get(name, "").strip()
     if not url:
         try:
             import streamlit as st
-            url = str(st.secrets.get("DATABASE_URL", "")).strip()
+            url = str(st.secrets.get(name, "")).strip()
         except Exception:
             url = ""
     return url
 
 DATABASE_URL = _get_database_url()
+# Réplica de leitura opcional (só Postgres). Depois de escrever, a sessão lê do primário
+# por REPLICA_STICKY_S segundos para ver as próprias escritas apesar do atraso da réplica.
+DATABASE_REPLICA_URL = _get_database_url("DATABASE_REPLICA_URL") if DATABASE_URL else ""
+REPLICA_STICKY_S = float(os.environ.get("DATABASE_REPLICA_STICKY_S", "5"))
+# Réplica fora do ar: leituras vão para o primário e ela só é tentada de novo depois disto
+REPLICA_RETRY_S = float(os.environ.get("DATABASE_REPLICA_RETRY_S", "30"))
 DB_PATH = os.environ.get("CONTENT_OS_DB", "content_os.db")
 
+# SQLite em modo produção: WAL (leitores não bloqueiam o escritor), fsync só no checkpoint,
+# espera em vez de "database is locked", cache de 64 MB e leitura via mmap (256 MB).
+SQLITE_BUSY_TIMEOUT_MS = 5000
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA temp_store=MEMORY",
+)
+# Escritas passam por uma thread única que agrupa em transações (CONTENT_OS_SQLITE_WRITER=0 desliga)
+SQLITE_WRITER = os.environ.get("CONTENT_OS_SQLITE_WRITER", "1") != "0"
+
 _IS_PG = bool(DATABASE_URL)
 
+# Postgres: conexões de um pool e statements preparados no servidor (cada conexão do pool
+# prepara uma vez e reaproveita o plano). DATABASE_PREPARE=0 desliga, p.ex. atrás de um
+# PgBouncer em modo transaction.
+PG_POOL_MIN = int(os.environ.get("DATABASE_POOL_MIN", "1"))
+PG_POOL_MAX = int(os.environ.get("DATABASE_POOL_MAX", "10"))
+PG_PREPARE = os.environ.get("DATABASE_PREPARE", "1") != "0"
+
+# falhas de conexão (não de SQL): só estas mandam a leitura da réplica para o primário
+_REPLICA_ERRORS: Tuple[type, ...] = ()
 if _IS_PG:
     import psycopg
-    from psycopg.rows import dict_row
+    from psycopg.rows import dict_row, tuple_row
+    from psycopg_pool import ConnectionPool, PoolTimeout
+    _REPLICA_ERRORS = (psycopg.OperationalError, PoolTimeout)
+
+# OperationalError também cobre statement_timeout (57014) e conflito com a recuperação (40001):
+# esses sobem como erro normal. Conexão caiu = sem SQLSTATE (erro do cliente), classe 08,
+# ou servidor desligando/subindo (57P01..57P03).
+_CONN_SQLSTATES = ("08", "57P01", "57P02", "57P03")
+
+
+def _replica_unreachable(e: BaseException) -> bool:
+    sqlstate = getattr(e, "sqlstate", None)
+    return sqlstate is None or sqlstate.startswith(_CONN_SQLSTATES)
+
+
+@lru_cache(maxsize=1024)
+def _translate(sql: str) -> str:
+    """? -> %s (e % -> %%) fora de literais, identificadores entre aspas e comentários."""
+    out = []
+    i, n = 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c in ("'", '"'):
+            j = i + 1
+            while j < n:
+                if sql[j] == c:
+                    if j + 1 < n and sql[j + 1] == c:  # aspas escapadas ('' ou "")
+                        j += 2
+                        continue
+                    break
+                j += 1
+            out.append(sql[i:j + 1].replace("%", "%%"))
+            i = j + 1
+        elif sql.startswith("--", i):
+            j = sql.find("\n", i)
+            j = n if j < 0 else j
+            out.append(sql[i:j].replace("%", "%%"))
+            i = j
+        else:
+            out.append("%s" if c == "?" else "%%" if c == "%" else c)
+            i += 1
+    return "".join(out)
 
 
 def _adapt_sql(sql: str) -> str:
-    # Converte placeholders do SQLite (?) para Postgres (%s)
-    return sql.replace("?", "%s") if _IS_PG else sql
+    # Converte placeholders do SQLite (?) para Postgres (%s); traduz cada SQL uma vez só
+    return _translate(sql) if _IS_PG else sql
+
+
+_pg_pools: Dict[str, Any] = {}
+_pg_pool_lock = threading.Lock()
+
+
+def _pool(url: str = ""):
+    url = url or DATABASE_URL
+    with _pg_pool_lock:
+        if url not in _pg_pools:
+            _pg_pools[url] = ConnectionPool(url, min_size=PG_POOL_MIN, max_size=PG_POOL_MAX,
+                                            kwargs={"row_factory": dict_row, "autocommit": True}, open=True)
+        return _pg_pools[url]
+
+
+class ReadOnlyError(RuntimeError):
+    pass
+
+
+# violação de UNIQUE/FK/NOT NULL, em qualquer um dos dois bancos
+IntegrityError: Tuple[type, ...] = (sqlite3.IntegrityError,) + ((psycopg.IntegrityError,) if _IS_PG else ())
+
+
+_read_only: Optional[str] = None
+
+
+def set_read_only(reason: Optional[str]) -> None:
+    """Modo degradado: com um motivo, toda escrita levanta ReadOnlyError; None volta ao normal."""
+    global _read_only
+    _read_only = reason
+
+
+def read_only() -> Optional[str]:
+    return _read_only
+
+
+def _check_writable() -> None:
+    if _read_only:
+        raise ReadOnlyError(_read_only)
+
+
+_session: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("db_session", default=None)
+_last_write: Dict[str, float] = {}
+
+
+def bind_session(key: str) -> None:
+    """Associa as próximas operações desta thread/contexto a uma sessão (read-your-writes)."""
+    _session.set(str(key))
+
+
+def _session_key() -> str:
+    return _session.get() or f"thread:{threading.get_ident()}"
+
+
+def _mark_write() -> None:
+    if not DATABASE_REPLICA_URL:
+        return
+    now = time.monotonic()
+    _last_write[_session_key()] = now
+    if len(_last_write) > 10000:
+        for k, t in list(_last_write.items()):
+            if now - t > REPLICA_STICKY_S:
+                _last_write.pop(k, None)
+
+
+_replica_down_until = 0.0
+
+
+def _read_url() -> str:
+    # réplica, a não ser que a sessão tenha escrito há pouco (ou que ela tenha caído há pouco)
+    now = time.monotonic()
+    if (DATABASE_REPLICA_URL and now >= _replica_down_until
+            and now - _last_write.get(_session_key(), float("-inf")) > REPLICA_STICKY_S):
+        return DATABASE_REPLICA_URL
+    return DATABASE_URL
+
+
+def _read(op: Callable[[Any], Any]) -> Any:
+    """Roda op(conn) numa conexão de leitura; se a réplica estiver fora do ar, no primário."""
+    global _replica_down_until
+    url = _read_url()
+    if url != DATABASE_URL:
+        try:
+            with _pool(url).connection() as conn:
+                return op(conn)
+        except _REPLICA_ERRORS as e:
+            if not _replica_unreachable(e):
+                raise
+            _replica_down_until = time.monotonic() + REPLICA_RETRY_S
+    with _pool().connection() as conn:
+        return op(conn)
+
+
+def _pg_execute(cur, sql: str, params: tuple) -> None:
+    # sem parâmetros é DDL ou consulta avulsa: não vale (nem sempre dá) preparar
+    cur.execute(sql, params, prepare=PG_PREPARE and bool(params))
+
+
+def _sqlite_connect(autocommit: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+                           isolation_level=None if autocommit else "")
+    conn.row_factory = sqlite3.Row
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 
 def db():
     """Retorna uma conexão válida (Postgres se DATABASE_URL existir, senão SQLite)."""
     if _IS_PG:
         return psycopg.connect(DATABASE_URL, row_factory=dict_row, autocommit=True)
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
+    return _sqlite_connect()
+
+
+_local = threading.local()
+
+
+def _reader() -> sqlite3.Connection:
+    # Uma conexão de leitura por thread: com WAL as leituras não esperam o escritor.
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = _sqlite_connect()
     return conn
 
 
+class SQLiteWriter:
+    """Única thread que escreve no SQLite.
+
+    Cada escrita entra numa fila; a thread junta o que estiver pendente (até BATCH_MAX)
+    numa transação só, com um SAVEPOINT por escrita para que um erro não derrube as
+    outras. Quem enfileirou recebe o resultado depois do COMMIT.
+    """
+
+    BATCH_MAX = 256
+
+    def __init__(self) -> None:
+        self._q: "queue.Queue[Tuple[Callable[[sqlite3.Connection], Any], Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, op: Callable[[sqlite3.Connection], Any]) -> Future:
+        f: Future = Future()
+        self._q.put((op, f))
+        return f
+
+    def _run(self) -> None:
+        conn = _sqlite_connect(autocommit=True)
+        while True:
+            batch = [self._q.get()]
+            while len(batch) < self.BATCH_MAX:
+                try:
+                    batch.append(self._q.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(conn, batch)
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, batch: List[Tuple[Callable[[sqlite3.Connection], Any], Future]]) -> None:
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for op, f in batch:
+                conn.execute("SAVEPOINT w")
+                try:
+                    results.append((f, op(conn), None))
+                    conn.execute("RELEASE w")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO w")
+                    conn.execute("RELEASE w")
+                    results.append((f, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, f in batch:
+                f.set_exception(e)
+            return
+        for f, res, err in results:
+            if err is not None:
+                f.set_exception(err)
+            else:
+                f.set_result(res)
+
+
+_writer: Optional[SQLiteWriter] = None
+_writer_lock = threading.Lock()
+
+
+def _submit_write(op: Callable[[sqlite3.Connection], Any]) -> Future:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SQLiteWriter()
+    return _writer.submit(op)
+
+
+def _write(op: Callable[[sqlite3.Connection], Any]) -> Any:
+    if not SQLITE_WRITER:
+        conn = _sqlite_connect()
+        try:
+            with conn:
+                return op(conn)
+        finally:
+            conn.close()
+    return _submit_write(op).result()
+
+
 def exec_sql(sql: str, params: tuple = ()) -> None:
+    _check_writable()
     sql = _adapt_sql(sql)
     if _IS_PG:
-        with db() as conn:
+        _mark_write()
+        with _pool().connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(sql, params)
+                _pg_execute(cur, sql, params)
+        return
+
+    _write(lambda conn: conn.execute(sql, params).lastrowid)
+
+
+def exec_many(sql: str, rows: List[tuple]) -> None:
+    """Mesmo comando para várias linhas, numa única transação."""
+    _check_writable()
+    if not rows:
+        return
+    sql = _adapt_sql(sql)
+    if _IS_PG:
+        _mark_write()
+        # o pool é autocommit: sem a transação explícita cada lote do executemany seria gravado sozinho
+        with _pool().connection() as conn:
+            with conn.transaction(), conn.cursor() as cur:
+                cur.executemany(sql, rows)
         return
 
-    with db() as conn:
-        conn.execute(sql, params)
-        conn.commit()
+    _write(lambda conn: conn.executemany(sql, rows).rowcount)
+
+
+PG_VALUES_CHUNK = 500
+
+
+def insert_many(table: str, cols: Sequence[str], rows: Sequence[tuple], returning: Optional[str] = "id") -> List[int]:
+    """Insere várias linhas de uma vez e devolve os ids gerados, na ordem das linhas.
+
+    SQLite: uma transação só (uma ida ao escritor, um fsync). Postgres: VALUES com várias
+    linhas + RETURNING, em blocos dentro de uma transação; com returning=None usa COPY e devolve [].
+    """
+    _check_writable()
+    if not rows:
+        return []
+    col_sql = ",".join(cols)
+    if _IS_PG:
+        _mark_write()
+        with _pool().connection() as conn:
+            with conn.transaction(), conn.cursor() as cur:
+                if returning is None:
+                    with cur.copy(f"COPY {table} ({col_sql}) FROM STDIN") as cp:
+                        for r in rows:
+                            cp.write_row(r)
+                    return []
+                ids: List[int] = []
+                one = "(" + ",".join(["%s"] * len(cols)) + ")"
+                for i in range(0, len(rows), PG_VALUES_CHUNK):
+                    chunk = rows[i:i + PG_VALUES_CHUNK]
+                    cur.execute(f"INSERT INTO {table} ({col_sql}) VALUES " + ",".join([one] * len(chunk))
+                                + f" RETURNING {returning}", [v for r in chunk for v in r])
+                    ids.extend(int(r[returning]) for r in cur.fetchall())
+                return ids
+
+    sql = f"INSERT INTO {table} ({col_sql}) VALUES (" + ",".join("?" for _ in cols) + ")"
+    if returning is None:
+        _write(lambda conn: conn.executemany(sql, rows).rowcount)
+        return []
+    return _write(lambda conn: [conn.execute(sql, r).lastrowid for r in rows])
+
+
+def upsert_many(table: str, cols: Sequence[str], rows: Sequence[tuple], conflict: Sequence[str],
+                update: Sequence[str] = ()) -> None:
+    """INSERT ... ON CONFLICT em lote; sem `update` as linhas que já existem ficam como estão."""
+    exec_many(_upsert_sql(table, cols, conflict, update), list(rows))
+
+
+def _upsert_sql(table: str, cols: Sequence[str], conflict: Sequence[str], update: Sequence[str] = ()) -> str:
+    action = ("DO UPDATE SET " + ",".join(f"{c}=excluded.{c}" for c in update)) if update else "DO NOTHING"
+    return (f"INSERT INTO {table} ({','.join(cols)}) VALUES (" + ",".join("?" for _ in cols) + ") "
+            f"ON CONFLICT ({','.join(conflict)}) {action}")
+
+
+class _Tx:
+    """Cursor de transaction(): mesmo SQL com ? do resto do módulo, tudo na mesma transação."""
+
+    def __init__(self, cur) -> None:
+        self._cur = cur
+
+    def execute(self, sql: str, params: tuple = ()) -> None:
+        if _IS_PG:
+            _pg_execute(self._cur, _adapt_sql(sql), params)
+        else:
+            self._cur.execute(sql, params)
+
+    def executemany(self, sql: str, rows: Sequence[tuple]) -> None:
+        if rows:
+            self._cur.executemany(_adapt_sql(sql), rows)
+
+    def fetchone(self, sql: str, params: tuple = ()) -> Optional[dict]:
+        if _IS_PG:
+            _pg_execute(self._cur, _adapt_sql(sql), params)
+            row = self._cur.fetchone()
+        else:
+            row = self._cur.execute(sql, params).fetchone()
+        return dict(row) if row else None
+
+    def insert_many(self, table: str, cols: Sequence[str], rows: Sequence[tuple]) -> List[int]:
+        col_sql = ",".join(cols)
+        if not _IS_PG:
+            sql = f"INSERT INTO {table} ({col_sql}) VALUES (" + ",".join("?" for _ in cols) + ")"
+            return [self._cur.execute(sql, r).lastrowid for r in rows]
+        ids: List[int] = []
+        one = "(" + ",".join(["%s"] * len(cols)) + ")"
+        for i in range(0, len(rows), PG_VALUES_CHUNK):
+            chunk = rows[i:i + PG_VALUES_CHUNK]
+            self._cur.execute(f"INSERT INTO {table} ({col_sql}) VALUES " + ",".join([one] * len(chunk))
+                              + " RETURNING id", [v for r in chunk for v in r])
+            ids.extend(int(r["id"]) for r in self._cur.fetchall())
+        return ids
+
+
+def transaction(op: Callable[[_Tx], Any]) -> Any:
+    """Roda op(tx) numa transação só: se op levantar, nada do que ela escreveu fica gravado."""
+    _check_writable()
+    if _IS_PG:
+        _mark_write()
+        with _pool().connection() as conn:
+            with conn.transaction():
+                with conn.cursor() as cur:
+                    return op(_Tx(cur))
+    # no escritor cada op já roda no seu SAVEPOINT (ROLLBACK TO se levantar)
+    return _write(lambda conn: op(_Tx(conn)))
 
 
 def fetchone(sql: str, params: tuple = ()) -> Optional[dict]:
     sql = _adapt_sql(sql)
     if _IS_PG:
-        with db() as conn:
+        def op(conn):
             with conn.cursor() as cur:
-                cur.execute(sql, params)
+                _pg_execute(cur, sql, params)
                 row = cur.fetchone()
                 return dict(row) if row else None
+        return _read(op)
 
-    with db() as conn:
-        cur = conn.execute(sql, params)
-        row = cur.fetchone()
-        return dict(row) if row else None
+    row = _reader().execute(sql, params).fetchone()
+    return dict(row) if row else None
 
 
 def fetchall(sql: str, params: tuple = ()) -> List[dict]:
     sql = _adapt_sql(sql)
     if _IS_PG:
-        with db() as conn:
+        def op(conn):
             with conn.cursor() as cur:
-                cur.execute(sql, params)
-                rows = cur.fetchall()
-                return [dict(r) for r in rows]
+                _pg_execute(cur, sql, params)
+                return [dict(r) for r in cur.fetchall()]
+        return _read(op)
+
+    return [dict(r) for r in _reader().execute(sql, params).fetchall()]
+
+
+class _RowBase(tuple):
+    """Linha imutável e leve (tupla com __slots__ vazio), lida como dict: r["col"], r.get(), keys().
+
+    Colunas JSON podem ser expostas com outro nome (p.ex. "profile" para "profile_json");
+    o json.loads só acontece quando a chave é lida.
+    """
+
+    __slots__ = ()
+    _index: Dict[str, int] = {}
+    _json: Dict[str, str] = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            i = self._index.get(key)
+            if i is not None:
+                return tuple.__getitem__(self, i)
+            src = self._json.get(key)
+            if src is None:
+                raise KeyError(key)
+            raw = tuple.__getitem__(self, self._index[src])
+            try:
+                return json.loads(raw) if raw else {}
+            except Exception:
+                return {}
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        return key in self._index or key in self._json
+
+    def keys(self) -> List[str]:
+        return list(self._index) + list(self._json)
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(k, self[k]) for k in self.keys()]
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __repr__(self) -> str:
+        return "Row(" + ", ".join(f"{k}={tuple.__getitem__(self, i)!r}" for k, i in self._index.items()) + ")"
 
-    with db() as conn:
-        cur = conn.execute(sql, params)
-        rows = cur.fetchall()
-        return [dict(r) for r in rows]
+
+@lru_cache(maxsize=512)
+def _row_type(cols: Tuple[str, ...], json_cols: Tuple[Tuple[str, str], ...] = ()) -> type:
+    return type("Row", (_RowBase,), {"__slots__": (), "_index": {c: i for i, c in enumerate(cols)},
+                                     "_json": dict(json_cols)})
+
+
+def fetchall_rows(sql: str, params: tuple = (), json_cols: Optional[Dict[str, str]] = None) -> List[_RowBase]:
+    """Como fetchall, mas devolve linhas leves (uma classe por formato de resultado, sem cópia para dict)."""
+    sql = _adapt_sql(sql)
+    jc = tuple(sorted((json_cols or {}).items()))
+    if _IS_PG:
+        def op(conn):
+            with conn.cursor(row_factory=tuple_row) as cur:
+                _pg_execute(cur, sql, params)
+                return cur.fetchall(), tuple(d.name for d in cur.description or ())
+        raw, cols = _read(op)
+    else:
+        cur = _reader().cursor()
+        cur.row_factory = None
+        raw = cur.execute(sql, params).fetchall()
+        cols = tuple(d[0] for d in cur.description or ())
+    T = _row_type(cols, jc)
+    return [T(r) for r in raw]
+
+
+def fetchone_row(sql: str, params: tuple = (), json_cols: Optional[Dict[str, str]] = None) -> Optional[_RowBase]:
+    rows = fetchall_rows(sql, params, json_cols)
+    return rows[0] if rows else None
 
 
 def init_db():
@@ -114,7 +583,9 @@ def init_db():
             id BIGSERIAL PRIMARY KEY,
             name TEXT NOT NULL,
             created_at TEXT NOT NULL,
-            created_by_user_id BIGINT
+            created_by_user_id BIGINT,
+            transcribe_target_s REAL,
+            monthly_token_quota BIGINT
         )
         """)
 
@@ -152,6 +623,7 @@ def init_db():
             description TEXT,
             system_prompt TEXT,
             templates_json TEXT,
+            autogen_json TEXT,
             created_at TEXT NOT NULL,
             updated_at TEXT NOT NULL
         )
@@ -164,6 +636,7 @@ def init_db():
             client_id BIGINT NOT NULL,
             filename TEXT NOT NULL,
             filepath TEXT NOT NULL,
+            duration_s REAL,
             created_at TEXT NOT NULL
         )
         """)
@@ -177,6 +650,8 @@ def init_db():
             language TEXT,
             text TEXT NOT NULL,
             segments_json TEXT,
+            text_z BYTEA,
+            segments_z BYTEA,
             created_at TEXT NOT NULL
         )
         """)
@@ -192,9 +667,15 @@ def init_db():
             input_ref TEXT,
             model TEXT NOT NULL,
             prompt_used TEXT NOT NULL,
+            prompt_ref TEXT,
             output_text TEXT NOT NULL,
             tags TEXT,
             status TEXT NOT NULL DEFAULT 'draft',
+            segments_used TEXT,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            latency_ms INTEGER,
+            ttft_ms INTEGER,
             created_by_user_id BIGINT,
             created_at TEXT NOT NULL
         )
@@ -210,6 +691,97 @@ def init_db():
             created_at TEXT NOT NULL
         )
         """)
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_audit_log_ws_created ON audit_log (workspace_id, created_at)")
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_audit_log_created ON audit_log (created_at)")
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id BIGSERIAL PRIMARY KEY,
+            workspace_id BIGINT,
+            client_id BIGINT,
+            provider TEXT NOT NULL,
+            model TEXT NOT NULL,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            latency_ms INTEGER,
+            ttft_ms INTEGER,
+            ok INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL
+        )
+        """)
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_llm_calls_ws_created ON llm_calls (workspace_id, created_at)")
+
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            hash TEXT PRIMARY KEY,
+            codec TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            data BYTEA NOT NULL,
+            created_at TEXT NOT NULL
+        )
+        """)
+
+        # Busca por segmento (services/segment_search.py)
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS transcript_segments (
+            id BIGSERIAL PRIMARY KEY,
+            workspace_id BIGINT NOT NULL,
+            client_id BIGINT NOT NULL,
+            video_id BIGINT NOT NULL,
+            transcription_id BIGINT NOT NULL,
+            start_s REAL,
+            end_s REAL,
+            text TEXT NOT NULL,
+            tsv tsvector GENERATED ALWAYS AS (to_tsvector('portuguese', text)) STORED
+        )
+        """)
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_transcript_segments_tsv ON transcript_segments USING GIN (tsv)")
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_transcript_segments_ws ON transcript_segments (workspace_id, client_id)")
+
+        # Quase-duplicatas (services/near_dup.py): assinatura MinHash + baldes LSH
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS content_minhash (
+            content_item_id BIGINT PRIMARY KEY,
+            client_id BIGINT NOT NULL,
+            sig BYTEA NOT NULL
+        )
+        """)
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS content_lsh (
+            client_id BIGINT NOT NULL,
+            bucket BIGINT NOT NULL,
+            content_item_id BIGINT NOT NULL
+        )
+        """)
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_content_lsh_client_bucket ON content_lsh (client_id, bucket)")
+
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS schedules (
+            id BIGSERIAL PRIMARY KEY,
+            workspace_id BIGINT NOT NULL,
+            client_id BIGINT NOT NULL,
+            weekday INTEGER NOT NULL,
+            hour INTEGER NOT NULL,
+            minute INTEGER NOT NULL,
+            spec_json TEXT NOT NULL,
+            provider_default TEXT NOT NULL DEFAULT 'groq',
+            model_default TEXT NOT NULL DEFAULT 'llama-3.3-70b-versatile',
+            enabled INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL
+        )
+        """)
+
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS password_resets (
+            id BIGSERIAL PRIMARY KEY,
+            user_id BIGINT NOT NULL,
+            token TEXT UNIQUE NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            used_at TEXT,
+            created_by_admin INTEGER NOT NULL DEFAULT 0
+        )
+        """)
+        _migrate_columns()
         return
 
     # SQLite schema
@@ -245,7 +817,9 @@ def init_db():
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL,
         created_at TEXT NOT NULL,
-        created_by_user_id INTEGER
+        created_by_user_id INTEGER,
+        transcribe_target_s REAL,
+        monthly_token_quota INTEGER
     )
     """)
 
@@ -283,6 +857,7 @@ def init_db():
         description TEXT,
         system_prompt TEXT,
         templates_json TEXT,
+        autogen_json TEXT,
         created_at TEXT NOT NULL,
         updated_at TEXT NOT NULL
     )
@@ -295,6 +870,7 @@ def init_db():
         client_id INTEGER NOT NULL,
         filename TEXT NOT NULL,
         filepath TEXT NOT NULL,
+        duration_s REAL,
         created_at TEXT NOT NULL
     )
     """)
@@ -308,6 +884,8 @@ def init_db():
         language TEXT,
         text TEXT NOT NULL,
         segments_json TEXT,
+        text_z BLOB,
+        segments_z BLOB,
         created_at TEXT NOT NULL
     )
     """)
@@ -323,9 +901,15 @@ def init_db():
         input_ref TEXT,
         model TEXT NOT NULL,
         prompt_used TEXT NOT NULL,
+        prompt_ref TEXT,
         output_text TEXT NOT NULL,
         tags TEXT,
         status TEXT NOT NULL DEFAULT 'draft',
+        segments_used TEXT,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        latency_ms INTEGER,
+        ttft_ms INTEGER,
         created_by_user_id INTEGER,
         created_at TEXT NOT NULL
     )
@@ -341,3 +925,144 @@ def init_db():
         created_at TEXT NOT NULL
     )
     """)
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_audit_log_ws_created ON audit_log (workspace_id, created_at)")
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_audit_log_created ON audit_log (created_at)")
+
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS llm_calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        workspace_id INTEGER,
+        client_id INTEGER,
+        provider TEXT NOT NULL,
+        model TEXT NOT NULL,
+        prompt_tokens INTEGER NOT NULL DEFAULT 0,
+        completion_tokens INTEGER NOT NULL DEFAULT 0,
+        latency_ms INTEGER,
+        ttft_ms INTEGER,
+        ok INTEGER NOT NULL DEFAULT 1,
+        created_at TEXT NOT NULL
+    )
+    """)
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_llm_calls_ws_created ON llm_calls (workspace_id, created_at)")
+
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        codec TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        created_at TEXT NOT NULL
+    )
+    """)
+
+    # Busca por segmento: FTS5 quando o SQLite tiver, senão tabela comum (busca com LIKE).
+    # `scope` ("w<workspace> c<cliente>") é indexado para filtrar dentro do próprio MATCH.
+    try:
+        exec_sql("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS transcript_segments USING fts5(
+            text, scope,
+            workspace_id UNINDEXED, client_id UNINDEXED, video_id UNINDEXED,
+            transcription_id UNINDEXED, start_s UNINDEXED, end_s UNINDEXED,
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """)
+    except sqlite3.OperationalError:
+        exec_sql("""
+        CREATE TABLE IF NOT EXISTS transcript_segments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            workspace_id INTEGER NOT NULL,
+            client_id INTEGER NOT NULL,
+            video_id INTEGER NOT NULL,
+            transcription_id INTEGER NOT NULL,
+            start_s REAL,
+            end_s REAL,
+            text TEXT NOT NULL,
+            scope TEXT
+        )
+        """)
+        exec_sql("CREATE INDEX IF NOT EXISTS idx_transcript_segments_ws ON transcript_segments (workspace_id, client_id)")
+
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS content_minhash (
+        content_item_id INTEGER PRIMARY KEY,
+        client_id INTEGER NOT NULL,
+        sig BLOB NOT NULL
+    )
+    """)
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS content_lsh (
+        client_id INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        content_item_id INTEGER NOT NULL
+    )
+    """)
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_content_lsh_client_bucket ON content_lsh (client_id, bucket)")
+
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS schedules (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        workspace_id INTEGER NOT NULL,
+        client_id INTEGER NOT NULL,
+        weekday INTEGER NOT NULL,
+        hour INTEGER NOT NULL,
+        minute INTEGER NOT NULL,
+        spec_json TEXT NOT NULL,
+        provider_default TEXT NOT NULL DEFAULT 'groq',
+        model_default TEXT NOT NULL DEFAULT 'llama-3.3-70b-versatile',
+        enabled INTEGER NOT NULL DEFAULT 1,
+        created_at TEXT NOT NULL
+    )
+    """)
+
+    exec_sql("""
+    CREATE TABLE IF NOT EXISTS password_resets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        token TEXT UNIQUE NOT NULL,
+        created_at TEXT NOT NULL,
+        expires_at TEXT NOT NULL,
+        used_at TEXT,
+        created_by_admin INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+
+    _migrate_columns()
+
+
+def _ensure_column(table: str, col: str, ddl: str) -> None:
+    if _IS_PG:
+        exec_sql(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {ddl}")
+        return
+    cols = [r["name"] for r in fetchall(f"PRAGMA table_info({table})")]
+    if col not in cols:
+        exec_sql(f"ALTER TABLE {table} ADD COLUMN {col} {ddl}")
+
+
+def _migrate_columns():
+    # Colunas adicionadas depois do schema inicial (bancos já existentes)
+    _ensure_column("videos", "duration_s", "REAL")
+    _ensure_column("videos", "transcribe_status", "TEXT")
+    _ensure_column("videos", "transcribe_spec", "TEXT")
+    _ensure_column("workspaces", "transcribe_target_s", "REAL")
+    _ensure_column("clients", "autogen_json", "TEXT")
+    _ensure_column("content_items", "segments_used", "TEXT")
+    for col in ["prompt_tokens", "completion_tokens", "latency_ms", "ttft_ms"]:
+        _ensure_column("content_items", col, "INTEGER")
+    _ensure_column("workspaces", "monthly_token_quota", "BIGINT" if _IS_PG else "INTEGER")
+    _ensure_column("content_items", "prompt_ref", "TEXT")
+    # só as linhas que o migrate_prompts ainda tem que mover: vazio = checagem instantânea no bootstrap
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_content_items_prompt_pending ON content_items (id) "
+             "WHERE prompt_ref IS NULL AND prompt_used <> ''")
+    for col in ["text_z", "segments_z"]:
+        _ensure_column("transcriptions", col, "BYTEA" if _IS_PG else "BLOB")
+    # idem para o migrate_transcriptions: sem linhas antigas o índice fica vazio
+    exec_sql("CREATE INDEX IF NOT EXISTS idx_transcriptions_text_pending ON transcriptions (id) WHERE text_z IS NULL")
+    _ensure_column("transcriptions", "search_indexed", "INTEGER")
+    _ensure_column("transcriptions", "pregen_errors", "TEXT")
+    # Colunas que só existiam no schema do app/db.py (unificado aqui)
+    _ensure_column("users", "approved_at", "TEXT")
+    _ensure_column("users", "requested_workspace_name", "TEXT")
+    _ensure_column("clients", "profile_json", "TEXT")
+    _ensure_column("content_items", "provider", "TEXT")
+    _ensure_column("audit_log", "entity_type", "TEXT")
+    _ensure_column("audit_log", "entity_id", "BIGINT" if _IS_PG else "INTEGER")
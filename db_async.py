@@ -0,0 +1,184 @@
+"""Acesso ao banco para workers asyncio: mesmas funções do db.py, em versão `async`.
+
+Postgres usa psycopg async com AsyncConnectionPool (primário + réplica opcional, com a
+mesma regra de read-your-writes do db.py). No SQLite as escritas vão para a thread
+escritora do db.py; as leituras usam aiosqlite se estiver instalado, senão uma thread
+do executor por leitura.
+"""
+import asyncio
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+import db
+from db import _IS_PG, _adapt_sql
+
+POOL_MAX = db.PG_POOL_MAX
+SQLITE_READERS = 4
+
+if _IS_PG:
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool
+
+try:
+    import aiosqlite
+except ImportError:  # opcional
+    aiosqlite = None
+
+_pools: Dict[str, Any] = {}
+_pools_lock = asyncio.Lock()
+_readers: "Optional[asyncio.Queue]" = None
+_readers_lock = asyncio.Lock()
+
+
+async def _pool(url: str = ""):
+    url = url or db.DATABASE_URL
+    if url not in _pools:
+        async with _pools_lock:
+            if url not in _pools:
+                pool = AsyncConnectionPool(url, min_size=db.PG_POOL_MIN, max_size=POOL_MAX, open=False,
+                                           kwargs={"row_factory": dict_row, "autocommit": True})
+                await pool.open()
+                _pools[url] = pool
+    return _pools[url]
+
+
+async def _pg_execute(cur, sql: str, params: tuple) -> None:
+    await cur.execute(sql, params, prepare=db.PG_PREPARE and bool(params))
+
+
+async def _sqlite_write(op: Callable[[sqlite3.Connection], Any]) -> Any:
+    if not db.SQLITE_WRITER:
+        return await asyncio.to_thread(db._write, op)
+    return await asyncio.wrap_future(db._submit_write(op))
+
+
+async def _sqlite_read(sql: str, params: tuple) -> List[dict]:
+    global _readers
+    if aiosqlite is None:
+        return await asyncio.to_thread(lambda: [dict(r) for r in db._reader().execute(sql, params).fetchall()])
+    async with _readers_lock:
+        if _readers is None:
+            readers: asyncio.Queue = asyncio.Queue()
+            for _ in range(SQLITE_READERS):
+                conn = await aiosqlite.connect(db.DB_PATH, timeout=db.SQLITE_BUSY_TIMEOUT_MS / 1000)
+                conn.row_factory = sqlite3.Row
+                for pragma in db.SQLITE_PRAGMAS:
+                    await conn.execute(pragma)
+                readers.put_nowait(conn)
+            _readers = readers
+    conn = await _readers.get()
+    try:
+        async with conn.execute(sql, params) as cur:
+            return [dict(r) for r in await cur.fetchall()]
+    finally:
+        _readers.put_nowait(conn)
+
+
+async def exec_sql(sql: str, params: tuple = ()) -> None:
+    db._check_writable()
+    sql = _adapt_sql(sql)
+    if _IS_PG:
+        db._mark_write()
+        async with (await _pool()).connection() as conn:
+            async with conn.cursor() as cur:
+                await _pg_execute(cur, sql, params)
+        return
+
+    await _sqlite_write(lambda conn: conn.execute(sql, params).lastrowid)
+
+
+async def exec_many(sql: str, rows: List[tuple]) -> None:
+    db._check_writable()
+    if not rows:
+        return
+    sql = _adapt_sql(sql)
+    if _IS_PG:
+        db._mark_write()
+        async with (await _pool()).connection() as conn:
+            async with conn.transaction(), conn.cursor() as cur:
+                await cur.executemany(sql, rows)
+        return
+
+    await _sqlite_write(lambda conn: conn.executemany(sql, rows).rowcount)
+
+
+async def insert_many(table: str, cols: Sequence[str], rows: Sequence[tuple], returning: Optional[str] = "id") -> List[int]:
+    """Igual a db.insert_many (sem COPY): ids gerados na ordem das linhas."""
+    db._check_writable()
+    if not rows:
+        return []
+    col_sql = ",".join(cols)
+    if _IS_PG:
+        db._mark_write()
+        one = "(" + ",".join(["%s"] * len(cols)) + ")"
+        ids: List[int] = []
+        async with (await _pool()).connection() as conn:
+            async with conn.transaction(), conn.cursor() as cur:
+                for i in range(0, len(rows), db.PG_VALUES_CHUNK):
+                    chunk = rows[i:i + db.PG_VALUES_CHUNK]
+                    sql = f"INSERT INTO {table} ({col_sql}) VALUES " + ",".join([one] * len(chunk))
+                    await cur.execute(sql + (f" RETURNING {returning}" if returning else ""), [v for r in chunk for v in r])
+                    if returning:
+                        ids.extend(int(r[returning]) for r in await cur.fetchall())
+        return ids
+
+    sql = f"INSERT INTO {table} ({col_sql}) VALUES (" + ",".join("?" for _ in cols) + ")"
+    if returning is None:
+        await _sqlite_write(lambda conn: conn.executemany(sql, rows).rowcount)
+        return []
+    return await _sqlite_write(lambda conn: [conn.execute(sql, r).lastrowid for r in rows])
+
+
+async def _read(op: Callable[[Any], Awaitable[Any]]) -> Any:
+    # mesma regra do db._read: réplica fora do ar -> primário, e ela descansa REPLICA_RETRY_S
+    url = db._read_url()
+    if url != db.DATABASE_URL:
+        try:
+            async with (await _pool(url)).connection() as conn:
+                return await op(conn)
+        except db._REPLICA_ERRORS as e:
+            if not db._replica_unreachable(e):
+                raise
+            db._replica_down_until = time.monotonic() + db.REPLICA_RETRY_S
+    async with (await _pool()).connection() as conn:
+        return await op(conn)
+
+
+async def fetchall(sql: str, params: tuple = ()) -> List[dict]:
+    sql = _adapt_sql(sql)
+    if _IS_PG:
+        async def op(conn):
+            async with conn.cursor() as cur:
+                await _pg_execute(cur, sql, params)
+                return [dict(r) for r in await cur.fetchall()]
+        return await _read(op)
+
+    return await _sqlite_read(sql, params)
+
+
+async def fetchone(sql: str, params: tuple = ()) -> Optional[dict]:
+    if _IS_PG:
+        sql = _adapt_sql(sql)
+
+        async def op(conn):
+            async with conn.cursor() as cur:
+                await _pg_execute(cur, sql, params)
+                row = await cur.fetchone()
+                return dict(row) if row else None
+        return await _read(op)
+
+    rows = await fetchall(sql, params)
+    return rows[0] if rows else None
+
+
+async def close() -> None:
+    """Fecha pools e conexões de leitura (no fim do worker)."""
+    global _readers
+    for pool in list(_pools.values()):
+        await pool.close()
+    _pools.clear()
+    if _readers is not None:
+        while not _readers.empty():
+            await _readers.get_nowait().close()
+        _readers = None
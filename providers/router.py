@@ -0,0 +1,72 @@
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.providers.base import LLMProvider
+from app.providers.router import RouterProvider
+
+
+def _groq() -> LLMProvider:
+    from app.providers.groq_provider import GroqProvider
+    return GroqProvider()
+
+def _openai() -> LLMProvider:
+    from app.providers.openai_provider import OpenAIProvider
+    return OpenAIProvider()
+
+def _stub() -> LLMProvider:
+    from app.providers.stub_provider import StubProvider
+    return StubProvider(latency_s=0.2)
+
+FACTORIES: Dict[str, Callable[[], LLMProvider]] = {"groq": _groq, "openai": _openai, "stub": _stub}
+
+_router: Optional[RouterProvider] = None
+_lock = threading.Lock()
+
+
+def get_router() -> RouterProvider:
+    """Roteador compartilhado pelo processo. LLM_PROVIDERS lista os upstreams em ordem (ex.: "groq,openai")."""
+    global _router
+    with _lock:
+        if _router is None:
+            names = [n.strip() for n in os.environ.get("LLM_PROVIDERS", "groq").split(",") if n.strip()]
+            providers, errors = [], []
+            for name in names:
+                try:
+                    providers.append(FACTORIES[name]())
+                except Exception as e:
+                    errors.append(f"{name}: {e}")
+            if not providers:
+                raise RuntimeError("; ".join(errors) or "LLM_PROVIDERS vazio.")
+            _router = RouterProvider(
+                providers,
+                timeout_s=float(os.environ.get("LLM_TIMEOUT_S", "90")),
+                hedge=os.environ.get("LLM_HEDGE", "1") != "0",
+            )
+        return _router
+
+
+def chat_with_usage(model: str, system: str, user: str, temperature: float = 0.7, max_tokens: int = 1400,
+                    workspace_id: Optional[int] = None, client_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+    """Chamada instrumentada: checa a cota do painel e grava tokens/latência em llm_calls.
+
+    Uma linha por chamada disparada: a devolvida (com a latência percebida) e, quando
+    terminarem, as que falharam, estouraram o timeout ou perderam o hedge.
+    """
+    from services.usage import check_quota, record_call
+    if workspace_id is not None:
+        check_quota(workspace_id)
+    out, usage = get_router().chat_with_usage(
+        messages=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+        model=model,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        on_other=lambda u, ok: record_call(u, workspace_id, client_id, ok=ok),
+    )
+    record_call(usage, workspace_id, client_id)
+    return out, usage
+
+
+def chat(model: str, system: str, user: str, temperature: float = 0.7, max_tokens: int = 1400,
+         workspace_id: Optional[int] = None, client_id: Optional[int] = None) -> str:
+    return chat_with_usage(model, system, user, temperature, max_tokens, workspace_id, client_id)[0]
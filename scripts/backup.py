@@ -0,0 +1,211 @@
+"""Backup online do banco: snapshot comprimido + sha256, verificação e restore cronometrados.
+
+    python -m scripts.backup snapshot [--dir backups] [--pages 256] [--keep 14]
+    python -m scripts.backup verify backups/content_os-20240131T120000Z.db.gz
+    python -m scripts.backup restore backups/content_os-20240131T120000Z.db.gz [--to content_os.db]
+
+SQLite: usa a API de backup em passos de `--pages` páginas, com uma pausa curta entre eles;
+cada passo segura o lock de leitura só por um instante, então o escritor (e a UI) seguem
+andando. Se outra conexão escrever no meio, o SQLite recomeça a cópia; depois de alguns
+reinícios ela vai num passo só (em WAL, um snapshot de leitura que não trava o escritor).
+O snapshot é um banco íntegro (não o arquivo vivo copiado) comprimido com gzip.
+
+Postgres (DATABASE_URL): chama `pg_dump --format=custom` (ou o comando em CONTENT_OS_PG_DUMP)
+e restaura com `pg_restore --clean --if-exists`.
+
+verify confere o sha256 e faz um restore de ensaio num arquivo temporário (integrity_check),
+medindo o tempo; restore substitui o banco e deve rodar com o app parado.
+"""
+import argparse
+import datetime as dt
+import gzip
+import hashlib
+import os
+import shlex
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import db
+
+CHUNK = 1 << 20
+MAX_RESTARTS = 3
+
+
+class _Restarted(Exception):
+    pass
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _write_checksum(path: Path) -> str:
+    digest = _sha256(path)
+    Path(str(path) + ".sha256").write_text(f"{digest}  {path.name}\n", encoding="utf-8")
+    return digest
+
+
+def _check_checksum(path: Path) -> bool:
+    side = Path(str(path) + ".sha256")
+    if not side.exists():
+        raise SystemExit(f"sem {side.name}: snapshot sem checksum")
+    return side.read_text(encoding="utf-8").split()[0] == _sha256(path)
+
+
+def _stamp() -> str:
+    return dt.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+
+
+def _prune(out_dir: Path, prefix: str, keep: int) -> None:
+    if keep <= 0:
+        return
+    snaps = sorted(p for p in out_dir.glob(prefix + "-*") if not p.name.endswith(".sha256"))
+    for old in snaps[:-keep]:
+        old.unlink()
+        Path(str(old) + ".sha256").unlink(missing_ok=True)
+
+
+def snapshot_sqlite(src_path: str, out_dir: Path, pages: int = 256, pause_s: float = 0.005) -> Path:
+    name = Path(src_path).stem
+    out = out_dir / f"{name}-{_stamp()}.db.gz"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    t0 = time.time()
+    with tempfile.TemporaryDirectory(dir=out_dir) as tmp:
+        raw = Path(tmp) / "snapshot.db"
+        src = sqlite3.connect(src_path, timeout=db.SQLITE_BUSY_TIMEOUT_MS / 1000)
+        dst = sqlite3.connect(raw)
+        steps, restarts, last = [0], [0], [None]
+
+        def progress(status, remaining, total):
+            steps[0] += 1
+            if last[0] is not None and remaining > last[0]:
+                restarts[0] += 1
+                if restarts[0] > MAX_RESTARTS:
+                    raise _Restarted()
+            last[0] = remaining
+            if total:
+                print(f"\r  {total - remaining}/{total} páginas", end="", flush=True)
+
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=pause_s)
+        except _Restarted:
+            # escrita contínua reinicia a cópia em passos; em WAL um passo único é só um snapshot
+            # de leitura e não segura o escritor (sem WAL ele segura, pelo tempo da cópia)
+            print(f"\r  {MAX_RESTARTS} reinícios por escrita concorrente: cópia em passo único")
+            src.backup(dst, pages=-1)
+        finally:
+            src.close()
+        dst.execute("PRAGMA journal_mode=DELETE")  # snapshot autossuficiente, sem -wal
+        dst.close()
+        copied = time.time() - t0
+        with open(raw, "rb") as f, gzip.open(out, "wb", compresslevel=6) as z:
+            shutil.copyfileobj(f, z, CHUNK)
+        size = raw.stat().st_size
+    digest = _write_checksum(out)
+    print(f"\r  {steps[0]} passos de {pages} páginas, cópia {copied:.2f}s, total {time.time() - t0:.2f}s")
+    print(f"  {out}  {size / 1e6:.1f} MB -> {out.stat().st_size / 1e6:.1f} MB  sha256 {digest[:16]}")
+    return out
+
+
+def snapshot_pg(url: str, out_dir: Path) -> Path:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = out_dir / f"pg-{_stamp()}.dump"
+    cmd = shlex.split(os.environ.get("CONTENT_OS_PG_DUMP", "pg_dump")) + ["--format=custom", "--compress=6",
+                                                                          "--file", str(out), url]
+    t0 = time.time()
+    subprocess.run(cmd, check=True)
+    digest = _write_checksum(out)
+    print(f"  {out}  {out.stat().st_size / 1e6:.1f} MB em {time.time() - t0:.2f}s  sha256 {digest[:16]}")
+    return out
+
+
+def _gunzip(src: Path, dst: Path) -> None:
+    with gzip.open(src, "rb") as z, open(dst, "wb") as f:
+        shutil.copyfileobj(z, f, CHUNK)
+
+
+def verify(path: Path) -> bool:
+    t0 = time.time()
+    if not _check_checksum(path):
+        print(f"  ERRO {path.name}: sha256 não confere")
+        return False
+    if path.suffix == ".dump":
+        subprocess.run(["pg_restore", "--list", str(path)], check=True, stdout=subprocess.DEVNULL)
+        print(f"  ok {path.name}: sha256 e índice do dump conferem ({time.time() - t0:.2f}s)")
+        return True
+    with tempfile.TemporaryDirectory() as tmp:
+        raw = Path(tmp) / "restore.db"
+        _gunzip(path, raw)
+        conn = sqlite3.connect(raw)
+        ok = conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        tables = conn.execute("SELECT COUNT(1) FROM sqlite_master WHERE type='table'").fetchone()[0]
+        conn.close()
+    print(f"  {'ok' if ok else 'ERRO'} {path.name}: {tables} tabelas, restore de ensaio em {time.time() - t0:.2f}s")
+    return ok
+
+
+def restore(path: Path, target: str) -> None:
+    t0 = time.time()
+    if not _check_checksum(path):
+        raise SystemExit(f"sha256 de {path.name} não confere; nada foi alterado")
+    if path.suffix == ".dump":
+        subprocess.run(["pg_restore", "--clean", "--if-exists", "--no-owner", "--dbname", target, str(path)], check=True)
+        print(f"  restaurado em {time.time() - t0:.2f}s")
+        return
+    tmp = Path(target + ".restoring")
+    _gunzip(path, tmp)
+    conn = sqlite3.connect(tmp)
+    ok = conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+    conn.close()
+    if not ok:
+        tmp.unlink()
+        raise SystemExit("integrity_check falhou; nada foi alterado")
+    # -wal/-shm do banco antigo não podem sobreviver ao arquivo novo
+    for side in (target + "-wal", target + "-shm"):
+        Path(side).unlink(missing_ok=True)
+    os.replace(tmp, target)
+    print(f"  {target} restaurado em {time.time() - t0:.2f}s")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("snapshot")
+    s.add_argument("--dir", default="backups")
+    s.add_argument("--sqlite", default=db.DB_PATH)
+    s.add_argument("--pages", type=int, default=256)
+    s.add_argument("--keep", type=int, default=14, help="quantos snapshots manter (0 = todos)")
+    v = sub.add_parser("verify")
+    v.add_argument("path")
+    r = sub.add_parser("restore")
+    r.add_argument("path")
+    r.add_argument("--to", help="arquivo SQLite ou URL do Postgres (padrão: o banco configurado)")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "snapshot":
+        out_dir = Path(args.dir)
+        if db._IS_PG:
+            snapshot_pg(db.DATABASE_URL, out_dir)
+            _prune(out_dir, "pg", args.keep)
+        else:
+            snapshot_sqlite(args.sqlite, out_dir, pages=args.pages)
+            _prune(out_dir, Path(args.sqlite).stem, args.keep)
+        return 0
+    if args.cmd == "verify":
+        return 0 if verify(Path(args.path)) else 1
+    restore(Path(args.path), args.to or (db.DATABASE_URL if db._IS_PG else db.DB_PATH))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+"""Job offline: converte o storage/app.db single-tenant e importa no banco unificado.
+
+    python -m scripts.migrate_app_db [--path storage/app.db] [--batch 2000] [--legacy-only]
+
+Enquanto existir um storage/app.db o app sobe em modo somente leitura (ver app.py).
+A conversão vai em lotes com checkpoint no próprio arquivo; o import também, com o checkpoint
+no banco unificado: se o job cair, rodar de novo continua de onde parou. Sem --legacy-only,
+o arquivo convertido é importado em seguida (import_app_db), os backfills rodam sobre as
+linhas importadas e o arquivo vira *.imported, o que tira o app do modo degradado.
+"""
+import argparse
+import sys
+import time
+from typing import List, Optional
+
+import db
+from app.db import LEGACY_DB_PATH, import_app_db, legacy_migration_pending, migrate_legacy_app_db
+
+
+def _progress():
+    started = {}
+
+    def report(table: str, done: int, total: int) -> None:
+        t0 = started.setdefault(table, time.time())
+        pct = 100.0 * done / total if total else 100.0
+        rate = done / max(time.time() - t0, 1e-3)
+        end = "\n" if done >= total else ""
+        print(f"\r  {table}: {done}/{total} ({pct:.0f}%, {rate:.0f} linhas/s)", end=end, flush=True)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--path", default=str(LEGACY_DB_PATH))
+    ap.add_argument("--batch", type=int, default=2000)
+    ap.add_argument("--legacy-only", action="store_true", help="só converte o arquivo, sem importar")
+    args = ap.parse_args(argv)
+
+    t0 = time.time()
+    if legacy_migration_pending(args.path):
+        print("convertendo para multi-tenant...")
+        migrate_legacy_app_db(args.path, args.batch, _progress())
+    else:
+        print("app.db já está no schema multi-tenant (ou não existe)")
+    if not args.legacy_only:
+        db.init_db()
+        print("importando no banco unificado...")
+        if import_app_db(args.path, batch=args.batch, progress=_progress()):
+            from services import near_dup, segment_search
+            from services.blobstore import migrate_prompts
+            from services.transcripts import migrate_transcriptions
+            print("backfills das linhas importadas...")
+            migrate_prompts()
+            migrate_transcriptions()
+            segment_search.backfill_index()
+            near_dup.backfill_index()
+        else:
+            print("nada para importar")
+    print(f"ok em {time.time() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+"""Copia o banco SQLite (content_os.db) para o Postgres, tabela por tabela, via COPY.
+
+    python -m scripts.migrate_sqlite_to_pg --sqlite content_os.db --pg postgresql://... [--batch 5000]
+    python -m scripts.migrate_sqlite_to_pg ... --verify-only
+
+O storage/app.db antigo do pacote app/ entra antes no content_os.db pelo scripts/migrate_app_db.py.
+O schema do Postgres é criado pelo db.init_db(); os ids são preservados e as sequências
+reajustadas no fim. Cada lote (COPY + checkpoint em _sqlite_migration) é uma transação só,
+então uma execução interrompida continua do último lote gravado. Se uma tabela já tem dados
+no Postgres sem checkpoint o script para; --restart apaga as tabelas do plano
+(TRUNCATE ... RESTART IDENTITY CASCADE) e os checkpoints, e copia do zero.
+No fim confere contagem e checksum de cada tabela nos dois lados.
+
+transcript_segments (FTS5) não é copiada: as transcrições chegam com search_indexed NULL
+e o backfill_index() do bootstrap reindexa no tsvector do Postgres.
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SKIP = {"transcript_segments"}
+OVERRIDES: Dict[str, Dict[str, Any]] = {"transcriptions": {"search_indexed": None}}
+STATE_DDL = """
+CREATE TABLE IF NOT EXISTS _sqlite_migration (
+    table_name TEXT PRIMARY KEY,
+    last_rowid BIGINT NOT NULL DEFAULT 0,
+    copied BIGINT NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def _sqlite_tables(src: sqlite3.Connection) -> List[str]:
+    rows = src.execute("SELECT name, sql FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' "
+                       "ORDER BY rowid").fetchall()
+    # tabelas-sombra do FTS5 (transcript_segments_data, ..._idx) vêm junto com a virtual
+    fts = [n for n, sql in rows if "virtual table" in (sql or "").lower()]
+    return [n for n, _ in rows if n not in SKIP and n not in fts and not any(n.startswith(f + "_") for f in fts)]
+
+
+def _pg_columns(cur, table: str) -> Dict[str, str]:
+    cur.execute("SELECT column_name, data_type, is_generated FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s", (table,))
+    return {r[0]: r[1] for r in cur.fetchall() if r[2] != "ALWAYS"}
+
+
+def _order_cols(src: sqlite3.Connection, table: str, cols: Sequence[str]) -> List[str]:
+    if "id" in cols:
+        return ["id"]
+    pk = sorted((r[5], r[1]) for r in src.execute(f"PRAGMA table_info({table})").fetchall() if r[5])
+    return [c for _, c in pk] or list(cols)
+
+
+def _norm(v: Any) -> bytes:
+    # SQLite é de tipagem dinâmica e REAL no Postgres é float4: compara pelo valor, não pelo tipo
+    if v is None:
+        return b"\\N"
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return bytes(v).hex().encode()
+    if isinstance(v, float):
+        return (str(int(v)) if v.is_integer() else f"{v:.6g}").encode()
+    return str(v).encode("utf-8")
+
+
+def _checksum(rows) -> Tuple[int, str]:
+    h, n = hashlib.sha256(), 0
+    for r in rows:
+        h.update(b"\x1e".join(_norm(v) for v in r))
+        h.update(b"\x1f")
+        n += 1
+    return n, h.hexdigest()
+
+
+def _fetch_stream(cur, size: int):
+    while True:
+        batch = cur.fetchmany(size)
+        if not batch:
+            return
+        yield from batch
+
+
+def verify(src: sqlite3.Connection, pg, table: str, cols: List[str], batch: int) -> Tuple[bool, str]:
+    cols = [c for c in cols if c not in OVERRIDES.get(table, {})]
+    order = _order_cols(src, table, cols)
+    with pg.cursor() as cur:
+        pg_types = _pg_columns(cur, table)
+    pg_order = ", ".join(f'{c} COLLATE "C"' if pg_types.get(c) == "text" else c for c in order)
+    s_cur = src.execute(f"SELECT {', '.join(cols)} FROM {table} ORDER BY {', '.join(order)}")
+    with pg.cursor(name=f"verify_{table}") as p_cur:  # cursor no servidor: não traz a tabela inteira
+        p_cur.itersize = batch
+        p_cur.execute(f"SELECT {', '.join(cols)} FROM {table} ORDER BY {pg_order}")
+        a, b = _checksum(_fetch_stream(s_cur, batch)), _checksum(p_cur)
+    pg.rollback()
+    ok = a == b
+    return ok, f"sqlite {a[0]} linhas {a[1][:12]}  postgres {b[0]} linhas {b[1][:12]}"
+
+
+def _has_rows(cur, table: str) -> bool:
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM {table})")
+    return bool(cur.fetchone()[0])
+
+
+def _has_checkpoint(cur, table: str) -> bool:
+    cur.execute("SELECT 1 FROM _sqlite_migration WHERE table_name=%s", (table,))
+    return cur.fetchone() is not None
+
+
+def copy_table(src: sqlite3.Connection, pg, table: str, cols: List[str], batch: int) -> int:
+    with pg.cursor() as cur:
+        cur.execute("INSERT INTO _sqlite_migration (table_name) VALUES (%s) ON CONFLICT DO NOTHING", (table,))
+        cur.execute("SELECT last_rowid, copied, done FROM _sqlite_migration WHERE table_name=%s", (table,))
+        last, copied, done = cur.fetchone()
+    pg.commit()
+    if done:
+        return copied
+    over = OVERRIDES.get(table, {})
+    picks = [None if c in over else i + 1 for i, c in enumerate(cols)]
+    s_cur = src.execute(f"SELECT rowid, {', '.join(cols)} FROM {table} WHERE rowid > ? ORDER BY rowid", (last,))
+    t0 = time.time()
+    while True:
+        rows = s_cur.fetchmany(batch)
+        if not rows:
+            break
+        with pg.cursor() as cur:
+            with cur.copy(f"COPY {table} ({', '.join(cols)}) FROM STDIN") as cp:
+                for r in rows:
+                    cp.write_row([over[c] if p is None else r[p] for c, p in zip(cols, picks)])
+            copied += len(rows)
+            cur.execute("UPDATE _sqlite_migration SET last_rowid=%s, copied=%s WHERE table_name=%s",
+                        (rows[-1][0], copied, table))
+        pg.commit()
+        rate = copied / max(time.time() - t0, 1e-6)
+        print(f"\r  {table}: {copied} linhas ({rate:.0f}/s)", end="", flush=True)
+    with pg.cursor() as cur:
+        if "id" in cols:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1), "
+                        f"MAX(id) IS NOT NULL) FROM {table}")
+        cur.execute("UPDATE _sqlite_migration SET done=1 WHERE table_name=%s", (table,))
+    pg.commit()
+    print(f"\r  {table}: {copied} linhas copiadas" + " " * 20)
+    return copied
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    ap.add_argument("--sqlite", default=os.environ.get("CONTENT_OS_DB", "content_os.db"))
+    ap.add_argument("--pg", default=os.environ.get("DATABASE_URL", ""))
+    ap.add_argument("--batch", type=int, default=5000)
+    ap.add_argument("--tables", nargs="*", help="só estas tabelas (padrão: todas)")
+    ap.add_argument("--restart", action="store_true",
+                    help="apaga as tabelas copiadas no Postgres (TRUNCATE ... RESTART IDENTITY) e os checkpoints")
+    ap.add_argument("--verify-only", action="store_true")
+    args = ap.parse_args(argv)
+    if not args.pg.startswith(("postgres://", "postgresql://")):
+        ap.error("--pg (ou DATABASE_URL) precisa ser uma URL postgresql://")
+
+    # db.py decide SQLite x Postgres no import: cria o schema no destino antes de copiar
+    os.environ["DATABASE_URL"] = args.pg
+    os.environ.pop("DATABASE_REPLICA_URL", None)
+    import db
+    import psycopg
+    db.init_db()
+
+    src = sqlite3.connect(f"file:{args.sqlite}?mode=ro", uri=True)
+    pg = psycopg.connect(args.pg)
+    with pg.cursor() as cur:
+        cur.execute(STATE_DDL)
+    pg.commit()
+
+    tables = [t for t in _sqlite_tables(src) if not args.tables or t in args.tables]
+    plan = []
+    for t in tables:
+        with pg.cursor() as cur:
+            pg_cols = _pg_columns(cur, t)
+        if not pg_cols:
+            print(f"  {t}: não existe no Postgres, ignorada")
+            continue
+        s_cols = [r[1] for r in src.execute(f"PRAGMA table_info({t})").fetchall()]
+        missing = [c for c in s_cols if c not in pg_cols]
+        if missing:
+            print(f"  {t}: colunas só no SQLite, ignoradas: {', '.join(missing)}")
+        plan.append((t, [c for c in s_cols if c in pg_cols]))
+
+    if not args.verify_only and plan:
+        names = [t for t, _ in plan]
+        with pg.cursor() as cur:
+            if args.restart:
+                cur.execute(f"TRUNCATE {', '.join(names)} RESTART IDENTITY CASCADE")
+                cur.execute("DELETE FROM _sqlite_migration WHERE table_name = ANY(%s)", (names,))
+            else:
+                # linhas sem checkpoint não vieram deste script: o COPY bateria na PK
+                busy = [t for t in names if _has_rows(cur, t) and not _has_checkpoint(cur, t)]
+                if busy:
+                    pg.rollback()
+                    raise SystemExit(f"tabelas já têm dados no Postgres: {', '.join(busy)}. "
+                                     "Use --restart para apagá-las e copiar do zero.")
+        pg.commit()
+        for t, cols in plan:
+            copy_table(src, pg, t, cols, args.batch)
+
+    bad = 0
+    for t, cols in plan:
+        ok, detail = verify(src, pg, t, cols, args.batch)
+        bad += not ok
+        print(f"  {'ok ' if ok else 'ERRO'} {t}: {detail}")
+    src.close()
+    pg.close()
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
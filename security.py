@@ -8,9 +8,21 @@ def pbkdf2_hash_password(password: str, salt: Optional[str] = None) -> Tuple[str
     return salt, base64.urlsafe_b64encode(dk).decode("utf-8").rstrip("=")
 
 def verify_password(password: str, salt: str, hashed: str) -> bool:
+    if not salt:
+        return _verify_app_password(password, hashed)
     _, hashed2 = pbkdf2_hash_password(password, salt=salt)
     return hmac.compare_digest(hashed2, hashed)
 
+def _verify_app_password(password: str, stored: str) -> bool:
+    # Formato do antigo app/db.py (usuários importados): base64(salt de 16 bytes + dk), 210k iterações
+    try:
+        blob = base64.b64decode(stored.encode("utf-8"))
+        salt, dk = blob[:16], blob[16:]
+        cand = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 210_000, dklen=32)
+        return hmac.compare_digest(cand, dk)
+    except Exception:
+        return False
+
 def sign(payload: str, secret: str) -> str:
     sig = hmac.new(secret.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).digest()
     return base64.urlsafe_b64encode(sig).decode("utf-8").rstrip("=")
@@ -0,0 +1,133 @@
+import atexit
+import datetime as dt
+import gzip
+import json
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from db import exec_many, fetchall, insert_many
+
+# Eventos vão para uma fila em memória e uma thread grava em lote. Perda máxima num crash
+# (kill -9, queda da máquina): o que chegou nos últimos FLUSH_S segundos, até QUEUE_MAX
+# eventos. Na saída normal do processo o atexit esvazia a fila.
+FLUSH_S = float(os.environ.get("AUDIT_FLUSH_S", "1"))
+BATCH_MAX = 500
+QUEUE_MAX = 10000
+RETENTION_DAYS = int(os.environ.get("AUDIT_RETENTION_DAYS", "180"))
+ARCHIVE_DIR = os.environ.get("AUDIT_ARCHIVE_DIR", "")
+PRUNE_BATCH = 2000
+
+COLS = ["actor_user_id", "workspace_id", "action", "entity_type", "entity_id", "details_json", "created_at"]
+
+
+def _now(**delta: int) -> str:
+    return (dt.datetime.utcnow() + dt.timedelta(**delta)).replace(microsecond=0).isoformat() + "Z"
+
+
+class AuditWriter:
+    """Fila limitada + thread que junta até BATCH_MAX eventos (ou FLUSH_S segundos) num insert_many."""
+
+    def __init__(self) -> None:
+        self._q: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=QUEUE_MAX)
+        self.dropped = 0
+        self.last_error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, row: Tuple) -> None:
+        try:
+            self._q.put_nowait(row)
+        except queue.Full:
+            # fila cheia = banco não acompanha: quem loga paga a escrita em vez de crescer a memória
+            self._write([row])
+
+    def _write(self, rows) -> None:
+        try:
+            insert_many("audit_log", COLS, rows, returning=None)
+        except Exception as e:
+            self.dropped += len(rows)
+            self.last_error = e
+
+    def _run(self) -> None:
+        while True:
+            item = self._q.get()
+            batch, got = ([] if item is None else [item]), 1
+            deadline = time.monotonic() + FLUSH_S
+            # None na fila = flush() esperando: grava o que já juntou sem esperar o prazo
+            while item is not None and len(batch) < BATCH_MAX:
+                try:
+                    item = self._q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                got += 1
+                if item is not None:
+                    batch.append(item)
+            if batch:
+                self._write(batch)
+            for _ in range(got):
+                self._q.task_done()
+
+    def flush(self) -> None:
+        """Grava já o lote em andamento e espera a fila esvaziar (leituras que precisam ver o recém-logado)."""
+        if self._q.unfinished_tasks:
+            self._q.put(None)
+            self._q.join()
+
+
+_writer: Optional[AuditWriter] = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer() -> AuditWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AuditWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def log_event(actor_user_id: Optional[int], workspace_id: Optional[int], action: str,
+              entity_type: str = "", entity_id: Optional[int] = None, meta: Optional[Dict[str, Any]] = None) -> None:
+    _get_writer().put((actor_user_id, workspace_id, action, entity_type or "", entity_id,
+                       json.dumps(meta or {}, ensure_ascii=False), _now()))
+
+
+def flush() -> None:
+    if _writer is not None:
+        _writer.flush()
+
+
+def prune(retention_days: int = RETENTION_DAYS, archive_dir: str = ARCHIVE_DIR) -> int:
+    """Apaga eventos mais velhos que retention_days, em lotes; com archive_dir guarda antes em JSONL gzip.
+
+    Usa o índice de created_at, então roda no bootstrap sem custo quando não há o que apagar.
+    """
+    if retention_days <= 0:
+        return 0
+    cutoff = _now(days=-int(retention_days))
+    out = None
+    total = 0
+    try:
+        while True:
+            rows = fetchall("SELECT * FROM audit_log WHERE created_at < ? ORDER BY created_at LIMIT ?",
+                            (cutoff, PRUNE_BATCH))
+            if not rows:
+                return total
+            if archive_dir:
+                if out is None:
+                    Path(archive_dir).mkdir(parents=True, exist_ok=True)
+                    out = gzip.open(Path(archive_dir) / f"audit-{_now().replace(':', '')}.jsonl.gz", "wt",
+                                    encoding="utf-8")
+                for r in rows:
+                    out.write(json.dumps(r, ensure_ascii=False, default=str) + "\n")
+                out.flush()
+            exec_many("DELETE FROM audit_log WHERE id=?", [(r["id"],) for r in rows])
+            total += len(rows)
+    finally:
+        if out is not None:
+            out.close()
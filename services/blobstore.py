@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import zlib
+import datetime as dt
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from db import exec_many, fetchall, fetchone, upsert_many
+
+# Mesmo separador de services.generation.build_prompt: cada seção do prompt vira um blob,
+# então o bloco da transcrição e o contexto do cliente são guardados uma vez só.
+PROMPT_SEP = "\n\n---\n\n"
+REF_PREFIX = "blobs:"
+
+_cache: "OrderedDict[str, str]" = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 512
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def blob_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def put_many(texts: List[str]) -> List[str]:
+    """Guarda cada texto comprimido (zlib), endereçado pelo sha256, numa escrita só. Idempotente."""
+    hashes = [blob_hash(t) for t in texts]
+    with _cache_lock:
+        new = {h: t for h, t in zip(hashes, texts) if h not in _cache}
+    if new:
+        now = _now()
+        rows = []
+        for h, t in new.items():
+            raw = t.encode("utf-8")
+            rows.append((h, "zlib", len(raw), zlib.compress(raw, 6), now))
+        upsert_many("blobs", ["hash", "codec", "size", "data", "created_at"], rows, conflict=["hash"])
+        for h, t in new.items():
+            _remember(h, t)
+    return hashes
+
+
+def put(text: str) -> str:
+    return put_many([text])[0]
+
+
+def _remember(h: str, text: str) -> None:
+    with _cache_lock:
+        _cache[h] = text
+        _cache.move_to_end(h)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def _decode(codec: str, data) -> str:
+    data = bytes(data)
+    if codec == "zlib":
+        data = zlib.decompress(data)
+    return data.decode("utf-8")
+
+
+def get_many(hashes: List[str]) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    missing = []
+    with _cache_lock:
+        for h in hashes:
+            if h in _cache:
+                out[h] = _cache[h]
+            else:
+                missing.append(h)
+    if missing:
+        marks = ",".join("?" for _ in missing)
+        for r in fetchall(f"SELECT hash,codec,data FROM blobs WHERE hash IN ({marks})", tuple(missing)):
+            out[r["hash"]] = _decode(r["codec"], r["data"])
+            _remember(r["hash"], out[r["hash"]])
+    return out
+
+
+def get(h: str) -> Optional[str]:
+    return get_many([h]).get(h)
+
+
+def store_prompt(prompt: str) -> str:
+    """Quebra o prompt nas seções do build_prompt e devolve a referência para content_items.prompt_ref."""
+    return REF_PREFIX + ",".join(put_many(prompt.split(PROMPT_SEP)))
+
+
+def load_prompt(ref: str) -> str:
+    hashes = ref[len(REF_PREFIX):].split(",") if ref.startswith(REF_PREFIX) else []
+    parts = get_many(hashes)
+    return PROMPT_SEP.join(parts.get(h, "") for h in hashes)
+
+
+def prompt_text(item: dict) -> str:
+    """Prompt de um content_item, venha da coluna antiga ou do blob store."""
+    return prompt_texts([item])[0]
+
+
+def prompt_texts(items: List[dict]) -> List[str]:
+    """prompt_text de vários itens, com uma consulta só para os blobs que não estão no cache."""
+    refs = [(it.get("prompt_ref") or "") for it in items]
+    hashes = [ref[len(REF_PREFIX):].split(",") if ref.startswith(REF_PREFIX) else None for ref in refs]
+    parts = get_many(sorted({h for hs in hashes if hs for h in hs}))
+    return [PROMPT_SEP.join(parts.get(h, "") for h in hs) if hs is not None else (it.get("prompt_used") or "")
+            for it, hs in zip(items, hashes)]
+
+
+_PENDING = "FROM content_items WHERE prompt_ref IS NULL AND prompt_used <> ''"
+
+
+def migrate_prompts(batch: int = 200) -> int:
+    """Move prompt_used das linhas antigas para o blob store, em lotes. Retorna quantas migrou.
+
+    Roda em todo bootstrap: o índice parcial idx_content_items_prompt_pending fica vazio
+    depois da migração, então o caso comum é uma consulta que não lê nenhuma linha.
+    """
+    if not fetchone(f"SELECT 1 AS x {_PENDING} LIMIT 1"):
+        return 0
+    total, last = 0, 0
+    while True:
+        rows = fetchall(f"SELECT id,prompt_used {_PENDING} AND id > ? ORDER BY id LIMIT ?", (last, int(batch)))
+        if not rows:
+            return total
+        # os blobs do lote inteiro numa escrita só
+        sections = [r["prompt_used"].split(PROMPT_SEP) for r in rows]
+        hashes = iter(put_many([sec for secs in sections for sec in secs]))
+        exec_many("UPDATE content_items SET prompt_ref=?, prompt_used='' WHERE id=?",
+                  [(REF_PREFIX + ",".join(next(hashes) for _ in secs), r["id"]) for r, secs in zip(rows, sections)])
+        total += len(rows)
+        last = rows[-1]["id"]
@@ -0,0 +1,44 @@
+import json
+import datetime as dt
+from typing import Any, Dict, List, Optional
+
+from db import exec_sql, fetchone, insert_many
+from services.blobstore import store_prompt
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def save_content_item(workspace_id: int, client_id: int, type_: str, title: str, input_source: str,
+                      input_ref: Optional[str], model: str, prompt: str, output_text: str, tags: str = "",
+                      status: str = "draft", segments_used: Optional[List[int]] = None,
+                      usage: Optional[Dict[str, Any]] = None, created_by_user_id: Optional[int] = None,
+                      created_at: Optional[str] = None, provider: Optional[str] = None) -> int:
+    usage = usage or {}
+    item_id = insert_many(
+        "content_items",
+        ["workspace_id", "client_id", "type", "title", "input_source", "input_ref", "model", "prompt_used", "prompt_ref",
+         "output_text", "tags", "status", "segments_used", "prompt_tokens", "completion_tokens", "latency_ms", "ttft_ms",
+         "created_by_user_id", "created_at", "provider"],
+        [(workspace_id, client_id, type_, title, input_source, input_ref, model, "", store_prompt(prompt), output_text, tags, status,
+          json.dumps(segments_used) if segments_used is not None else None,
+          usage.get("prompt_tokens"), usage.get("completion_tokens"), usage.get("latency_ms"), usage.get("ttft_ms"),
+          created_by_user_id, created_at or _now(), provider)],
+    )[0]
+    from services.near_dup import index_item
+    index_item(item_id, client_id, output_text)
+    return item_id
+
+
+STATUSES = ["draft", "approved", "published", "rejected"]
+
+
+def set_status(workspace_id: int, item_id: int, status: str) -> None:
+    row = fetchone("SELECT client_id,type,output_text FROM content_items WHERE workspace_id=? AND id=?",
+                   (workspace_id, item_id))
+    if not row:
+        return
+    exec_sql("UPDATE content_items SET status=? WHERE workspace_id=? AND id=?", (status, workspace_id, item_id))
+    from services.examples import on_status_change
+    on_status_change(int(row["client_id"]), int(item_id), status, row["type"], row["output_text"] or "")
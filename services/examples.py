@@ -0,0 +1,117 @@
+import math
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.services.text_utils import chunk_by_tokens, count_tokens
+from db import fetchall
+from services.retrieval import tokenize
+
+APPROVED = ("approved", "published")
+EXAMPLES_BUDGET_TOKENS = 900
+EXAMPLE_MAX_TOKENS = 350
+SAME_TYPE_BOOST = 1.5
+
+
+class ExampleIndex:
+    """BM25 incremental (listas invertidas) sobre os conteúdos aprovados de um cliente."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1, self.b = k1, b
+        self.docs: Dict[int, Tuple[str, str, Counter, int]] = {}  # id -> (tipo, texto, tf, tamanho)
+        self.postings: Dict[str, Set[int]] = {}
+        self.total_len = 0
+
+    def add(self, item_id: int, type_: str, text: str) -> None:
+        self.remove(item_id)
+        tf = Counter(tokenize(text))
+        self.docs[item_id] = (type_, text, tf, sum(tf.values()))
+        self.total_len += self.docs[item_id][3]
+        for t in tf:
+            self.postings.setdefault(t, set()).add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        doc = self.docs.pop(item_id, None)
+        if not doc:
+            return
+        self.total_len -= doc[3]
+        for t in doc[2]:
+            ids = self.postings.get(t)
+            if ids:
+                ids.discard(item_id)
+                if not ids:
+                    del self.postings[t]
+
+    def search(self, query: str, type_: Optional[str] = None, k: int = 3) -> List[Tuple[int, float]]:
+        n = len(self.docs)
+        if not n:
+            return []
+        avg = self.total_len / n or 1.0
+        scores: Dict[int, float] = {}
+        for t in set(tokenize(query)):
+            ids = self.postings.get(t)
+            if not ids:
+                continue
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            for i in ids:
+                _, _, tf, ln = self.docs[i]
+                f = tf[t]
+                scores[i] = scores.get(i, 0.0) + idf * f * (self.k1 + 1) / (f + self.k1 * (1 - self.b + self.b * ln / avg))
+        if type_:
+            # mesmo tipo vale mais; sem termo em comum, os mais recentes do tipo ainda servem de exemplo
+            for i, (t, _, _, _) in self.docs.items():
+                if t == type_:
+                    scores[i] = scores.get(i, 0.0) * SAME_TYPE_BOOST + 1e-6 * i
+        return sorted(scores.items(), key=lambda x: -x[1])[:k]
+
+
+_indexes: Dict[int, ExampleIndex] = {}
+_lock = threading.Lock()
+
+
+def _index(client_id: int) -> ExampleIndex:
+    with _lock:
+        idx = _indexes.get(client_id)
+    if idx is not None:
+        return idx
+    idx = ExampleIndex()
+    marks = ",".join("?" for _ in APPROVED)
+    for r in fetchall(f"SELECT id,type,output_text FROM content_items WHERE client_id=? AND status IN ({marks})",
+                      (client_id,) + APPROVED):
+        idx.add(int(r["id"]), r["type"], r["output_text"] or "")
+    with _lock:
+        return _indexes.setdefault(client_id, idx)
+
+
+def on_status_change(client_id: int, item_id: int, status: str, type_: str, text: str) -> None:
+    """Mantém o índice do cliente (se já carregado) em dia com o novo status do item."""
+    with _lock:
+        idx = _indexes.get(client_id)
+        if idx is None:
+            return
+        if status in APPROVED:
+            idx.add(item_id, type_, text)
+        else:
+            idx.remove(item_id)
+
+
+def style_examples(client: dict, content_type: str, query: str = "", k: int = 3,
+                   max_tokens: int = EXAMPLES_BUDGET_TOKENS) -> List[str]:
+    """Até k conteúdos aprovados do cliente mais parecidos com a tarefa, dentro de max_tokens."""
+    idx = _index(int(client["id"]))
+    with _lock:
+        hits = idx.search(f"{content_type} {query}", type_=content_type, k=k)
+        texts = [idx.docs[i][1] for i, _ in hits]
+    out, used = [], 0
+    for text in texts:
+        room = min(EXAMPLE_MAX_TOKENS, max_tokens - used)
+        if room <= 0:
+            break
+        chunks = chunk_by_tokens(text.strip(), room)
+        text = chunks[0] + (" [...]" if len(chunks) > 1 else "") if chunks else ""
+        t = count_tokens(text)
+        if not text or used + t > max_tokens:
+            break
+        out.append(text)
+        used += t
+    return out
@@ -1,5 +1,9 @@
 import json
-from typing import Dict
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.services.text_utils import count_tokens
+from services.retrieval import select_excerpt
 
 CONTENT_TYPES = ["Ideias", "Copy Reels", "Carrossel", "Campanha", "Stories", "Roteiro"]
 
@@ -12,6 +16,19 @@ DEFAULT_TEMPLATES = {
     "Roteiro": "Crie {n} roteiros completos para Reels (30–60s).",
 }
 
+# Orçamento de tokens da transcrição no prompt; acima disso só entram os trechos relevantes
+TRANSCRIPT_BUDGET_TOKENS = 3000
+
+# Termos que puxam os trechos úteis para cada tipo (além do template e do "extra")
+CONTENT_TYPE_HINTS = {
+    "Ideias": "dica erro problema dúvida como porque segredo exemplo história",
+    "Copy Reels": "problema dor desejo resultado transformação benefício chamada",
+    "Carrossel": "passo etapa método lista explicação conceito exemplo",
+    "Campanha": "oferta produto serviço preço cliente resultado benefício garantia",
+    "Stories": "bastidor rotina pergunta opinião dia hoje",
+    "Roteiro": "história exemplo começo final momento cena",
+}
+
 def client_context(client: dict) -> str:
     parts = [f"Cliente: {client.get('name','')}".strip()]
     if client.get("description"):
@@ -32,13 +49,32 @@ def system_prompt(client: dict) -> str:
     return ("Você é um estrategista e copywriter sênior para Instagram. "
             "Responda em PT-BR, objetivo, comercial e aplicável. Evite promessas irreais.")
 
-def build_prompt(client: dict, content_type: str, n: int, extra: str = "", transcript: str = "") -> str:
+def build_prompt(client: dict, content_type: str, n: int, extra: str = "", transcript: str = "",
+                 examples: Sequence[str] = ()) -> str:
     templates = get_templates(client)
     tpl = (templates.get(content_type) or DEFAULT_TEMPLATES[content_type]).format(n=n)
     parts = ["CONTEXTO DO CLIENTE:\n" + client_context(client)]
+    if examples:
+        parts.append("EXEMPLOS APROVADOS (referência de tom e formato; não copie):\n"
+                     + "\n\n".join(f"[{i}] {e}" for i, e in enumerate(examples, 1)))
     if transcript.strip():
         parts.append("TRANSCRIÇÃO:\n" + transcript.strip())
     if extra.strip():
         parts.append("EXTRA:\n" + extra.strip())
     parts.append("TAREFA:\n" + tpl)
     return "\n\n---\n\n".join(parts)
+
+def transcript_excerpt(client: dict, content_type: str, n: int, transcript: str,
+                       segments: Optional[List[dict]] = None, extra: str = "",
+                       max_tokens: int = TRANSCRIPT_BUDGET_TOKENS) -> Tuple[str, List[int]]:
+    """Transcrição (ou os trechos mais relevantes para a tarefa) + ids dos segmentos usados."""
+    transcript = (transcript or "").strip()
+    if not segments:
+        segments = [{"id": i, "start": None, "text": s}
+                    for i, s in enumerate(re.split(r"(?<=[.!?])\s+", transcript)) if s.strip()]
+    if count_tokens(transcript) <= max_tokens:
+        return transcript, [s.get("id") for s in segments]
+    templates = get_templates(client)
+    tpl = templates.get(content_type) or DEFAULT_TEMPLATES[content_type]
+    query = " ".join([CONTENT_TYPE_HINTS.get(content_type, ""), tpl, extra or ""])
+    return select_excerpt(segments, query, max_tokens)
@@ -0,0 +1,98 @@
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from app.services.text_utils import count_tokens
+
+AUTO_MODEL = "auto"
+MODELS = ["llama-3.3-70b-versatile", "llama-3.1-8b-instant", "openai/gpt-oss-120b", "qwen/qwen3-32b"]
+
+# Tokens de saída por item gerado, por tipo (medido por alto nas saídas salvas)
+OUTPUT_TOKENS_PER_ITEM = {
+    "Ideias": 160,
+    "Copy Reels": 120,
+    "Carrossel": 350,
+    "Campanha": 300,
+    "Stories": 150,
+    "Roteiro": 420,
+}
+
+# Avaliadas em ordem; vale a primeira regra que aceitar a tarefa.
+# Chaves opcionais: types, max_prompt_tokens, max_output_tokens,
+# max_p95_s (latência medida no roteador) e min_quality (taxa de aprovação do modelo).
+DEFAULT_RULES: List[Dict] = [
+    {"model": "llama-3.1-8b-instant", "types": ["Ideias", "Copy Reels", "Stories"],
+     "max_prompt_tokens": 1500, "max_output_tokens": 1000, "min_quality": 0.3},
+    {"model": "llama-3.3-70b-versatile", "max_prompt_tokens": 12000, "max_output_tokens": 4000, "max_p95_s": 30},
+    {"model": "openai/gpt-oss-120b"},
+]
+QUALITY_MIN_SAMPLES = 20
+
+
+def load_rules() -> List[Dict]:
+    """Regras de MODEL_RULES (JSON em env ou Streamlit Secrets), senão as padrão."""
+    raw = os.environ.get("MODEL_RULES", "")
+    if not raw:
+        try:
+            import streamlit as st
+            raw = str(st.secrets.get("MODEL_RULES", ""))
+        except Exception:
+            raw = ""
+    try:
+        rules = json.loads(raw) if raw else None
+    except Exception:
+        rules = None
+    return rules if isinstance(rules, list) and rules else DEFAULT_RULES
+
+
+def estimate_tokens(system: str, prompt: str, content_type: str, n: int) -> Tuple[int, int]:
+    return count_tokens(system) + count_tokens(prompt), OUTPUT_TOKENS_PER_ITEM.get(content_type, 250) * max(1, int(n))
+
+
+def measured_latency() -> Dict[str, float]:
+    """p95 (s) por modelo segundo o roteador do processo."""
+    try:
+        from providers.router import get_router
+        snap = get_router().snapshot()
+    except Exception:
+        return {}
+    return {s["model"]: s["p95"] for s in snap if s["p95"] is not None}
+
+
+def measured_quality(workspace_id: int) -> Dict[str, float]:
+    """Taxa de aprovação (approved/published) por modelo, só com amostra suficiente."""
+    from db import fetchall
+    rows = fetchall(
+        "SELECT model, COUNT(*) AS n, SUM(CASE WHEN status IN ('approved','published') THEN 1 ELSE 0 END) AS ok "
+        "FROM content_items WHERE workspace_id=? GROUP BY model", (workspace_id,))
+    return {r["model"]: int(r["ok"] or 0) / int(r["n"]) for r in rows if int(r["n"]) >= QUALITY_MIN_SAMPLES}
+
+
+def pick_model(system: str, prompt: str, content_type: str, n: int, workspace_id: Optional[int] = None,
+               rules: Optional[List[Dict]] = None) -> str:
+    """Modelo mais barato cuja regra aceita o tamanho/tipo da tarefa e a latência/qualidade medidas."""
+    prompt_tokens, output_tokens = estimate_tokens(system, prompt, content_type, n)
+    latency = measured_latency()
+    quality = measured_quality(workspace_id) if workspace_id is not None else {}
+    rules = rules or load_rules()
+    for r in rules:
+        m = r["model"]
+        if r.get("types") and content_type not in r["types"]:
+            continue
+        if prompt_tokens > r.get("max_prompt_tokens", float("inf")):
+            continue
+        if output_tokens > r.get("max_output_tokens", float("inf")):
+            continue
+        if m in latency and latency[m] > r.get("max_p95_s", float("inf")):
+            continue
+        if m in quality and quality[m] < r.get("min_quality", 0.0):
+            continue
+        return m
+    return rules[-1]["model"]
+
+
+def resolve_model(model: str, system: str, prompt: str, content_type: str, n: int,
+                  workspace_id: Optional[int] = None) -> str:
+    if model != AUTO_MODEL:
+        return model
+    return pick_model(system, prompt, content_type, n, workspace_id=workspace_id)
@@ -0,0 +1,126 @@
+import random
+import struct
+import zlib
+from array import array
+from typing import Callable, Dict, List, Optional, Tuple
+
+from db import fetchall, insert_many
+from services.retrieval import tokenize
+
+# MinHash com 64 permutações em 16 bandas de 4 linhas: pares com Jaccard ~0.5+ caem
+# no mesmo balde em alguma banda; a similaridade estimada pela assinatura decide.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+THRESHOLD = 0.6
+DEDUPE_HINT = "Evite repetir ideias, ganchos e frases de conteúdos anteriores deste cliente; traga ângulos novos."
+
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+_rng = random.Random(1009)
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def _shingles(text: str) -> set:
+    words = tokenize(text)
+    if len(words) < SHINGLE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE]) for i in range(len(words) - SHINGLE + 1)}
+
+
+def signature(text: str) -> List[int]:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in _shingles(text)]
+    if not hashes:
+        return [_MASK] * NUM_PERM
+    return [min(((a * h + b) % _PRIME) & _MASK for h in hashes) for a, b in _PERMS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _buckets(sig: List[int]) -> List[int]:
+    # o índice da banda entra no hash: uma coluna só basta para (cliente, balde)
+    out = []
+    for b in range(BANDS):
+        band = sig[b * ROWS:(b + 1) * ROWS]
+        out.append(zlib.crc32(struct.pack(f"<{ROWS + 1}I", b, *band)) & 0x7FFFFFFF)
+    return out
+
+
+def _pack(sig: List[int]) -> bytes:
+    return array("I", sig).tobytes()
+
+
+def _unpack(blob) -> List[int]:
+    a = array("I")
+    a.frombytes(bytes(blob))
+    return list(a)
+
+
+def index_items(items: List[Tuple[int, int, str]]) -> None:
+    """Indexa [(content_item_id, client_id, texto)] com duas escritas em lote."""
+    sigs, buckets = [], []
+    for item_id, client_id, text in items:
+        sig = signature(text)
+        sigs.append((item_id, client_id, _pack(sig)))
+        buckets.extend((client_id, bk, item_id) for bk in set(_buckets(sig)))
+    insert_many("content_minhash", ["content_item_id", "client_id", "sig"], sigs, returning=None)
+    insert_many("content_lsh", ["client_id", "bucket", "content_item_id"], buckets, returning=None)
+
+
+def index_item(content_item_id: int, client_id: int, text: str) -> None:
+    index_items([(content_item_id, client_id, text)])
+
+
+def find_near_duplicates(client_id: int, text: str, threshold: float = THRESHOLD,
+                         exclude_id: Optional[int] = None) -> List[Tuple[int, float]]:
+    """Conteúdos anteriores do cliente parecidos com `text`: [(content_item_id, similaridade)], maior primeiro.
+
+    Só as linhas que dividem algum balde LSH são lidas, então o custo não cresce com o histórico.
+    """
+    sig = signature(text)
+    buckets = sorted(set(_buckets(sig)))
+    marks = ",".join("?" for _ in buckets)
+    rows = fetchall(
+        f"SELECT m.content_item_id, m.sig FROM content_minhash m WHERE m.content_item_id IN ("
+        f"SELECT content_item_id FROM content_lsh WHERE client_id=? AND bucket IN ({marks}))",
+        tuple([client_id] + buckets))
+    out = []
+    for r in rows:
+        if exclude_id is not None and int(r["content_item_id"]) == int(exclude_id):
+            continue
+        s = similarity(sig, _unpack(r["sig"]))
+        if s >= threshold:
+            out.append((int(r["content_item_id"]), s))
+    return sorted(out, key=lambda x: -x[1])
+
+
+def generate_distinct(call: Callable[[str], Tuple[str, Dict]], client_id: int, prompt: str,
+                      retries: int = 0) -> Tuple[str, Dict, List[Tuple[int, float]]]:
+    """Chama `call(prompt)` e, se sair repetido, tenta de novo até `retries` vezes pedindo ângulos novos.
+
+    Retorna a última saída, o uso dela e os parecidos encontrados (vazio se ficou inédita).
+    """
+    out, usage = call(prompt)
+    dups = find_near_duplicates(client_id, out)
+    for _ in range(max(0, int(retries))):
+        if not dups:
+            break
+        out, usage = call(prompt + "\n\n" + DEDUPE_HINT)
+        dups = find_near_duplicates(client_id, out)
+    return out, usage, dups
+
+
+def backfill_index(batch: int = 200) -> int:
+    """Indexa conteúdos salvos antes do índice existir."""
+    total = 0
+    while True:
+        rows = fetchall("SELECT c.id, c.client_id, c.output_text FROM content_items c "
+                        "LEFT JOIN content_minhash m ON m.content_item_id = c.id "
+                        "WHERE m.content_item_id IS NULL ORDER BY c.id LIMIT ?", (int(batch),))
+        if not rows:
+            return total
+        index_items([(int(r["id"]), int(r["client_id"]), r["output_text"] or "") for r in rows])
+        total += len(rows)
@@ -0,0 +1,125 @@
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from db import exec_sql, fetchone
+from services.content_items import save_content_item
+from services.generation import system_prompt, build_prompt, transcript_excerpt
+from services.model_select import AUTO_MODEL, resolve_model
+from services.near_dup import generate_distinct
+from services.examples import style_examples
+
+# Conjunto que os editores geram logo depois de quase toda transcrição
+DEFAULT_TYPES = ["Ideias", "Copy Reels", "Roteiro"]
+DEFAULT_MODEL = AUTO_MODEL
+AUTO_TAG = "auto"
+
+_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="pregen")
+_pending: Dict[int, int] = {}  # transcription_id -> gerações ainda rodando
+_lock = threading.Lock()
+_errors_lock = threading.Lock()
+log = logging.getLogger(__name__)
+
+
+def get_policy(client: dict) -> Optional[dict]:
+    """Política de pré-geração do cliente (opt-in), ou None se desligada."""
+    try:
+        policy = json.loads(client.get("autogen_json") or "null")
+    except Exception:
+        return None
+    if not isinstance(policy, dict) or not policy.get("enabled"):
+        return None
+    policy.setdefault("types", DEFAULT_TYPES)
+    policy.setdefault("n", 3)
+    policy.setdefault("model", DEFAULT_MODEL)
+    policy.setdefault("dedupe_retries", 1)
+    return policy
+
+
+def pending(transcription_id: int) -> int:
+    with _lock:
+        return _pending.get(int(transcription_id), 0)
+
+
+def failures(transcription_id: int) -> Dict[str, str]:
+    """Tipos cuja pré-geração falhou nesta transcrição -> mensagem de erro."""
+    r = fetchone("SELECT pregen_errors FROM transcriptions WHERE id=?", (int(transcription_id),))
+    try:
+        return json.loads((r or {}).get("pregen_errors") or "{}")
+    except Exception:
+        return {}
+
+
+def _set_failures(transcription_id: int, update: Dict[str, Optional[str]]) -> None:
+    # read-modify-write do JSON: as gerações de uma transcrição terminam em threads diferentes
+    with _errors_lock:
+        errs = failures(transcription_id)
+        for ct, msg in update.items():
+            if msg:
+                errs[ct] = msg
+            else:
+                errs.pop(ct, None)
+        exec_sql("UPDATE transcriptions SET pregen_errors=? WHERE id=?",
+                 (json.dumps(errs, ensure_ascii=False) if errs else None, int(transcription_id)))
+
+
+def queue_pregeneration(workspace_id: int, video_id: int, transcription_id: int, transcript: str,
+                        segments: Optional[list] = None, types: Optional[List[str]] = None) -> int:
+    """Enfileira os rascunhos padrão (ou só `types`) se o cliente do vídeo optou por isso. Retorna quantos."""
+    client = fetchone("SELECT c.* FROM clients c JOIN videos v ON v.client_id = c.id "
+                      "WHERE v.workspace_id=? AND v.id=?", (workspace_id, video_id))
+    policy = get_policy(client) if client else None
+    if not policy or not transcript.strip():
+        return 0
+    types = [ct for ct in policy["types"] if types is None or ct in types]
+    with _lock:
+        _pending[int(transcription_id)] = _pending.get(int(transcription_id), 0) + len(types)
+    for ct in types:
+        _pool.submit(_generate, workspace_id, client, video_id, transcription_id, transcript, segments, ct,
+                     int(policy["n"]), policy["model"], int(policy["dedupe_retries"]))
+    return len(types)
+
+
+def retry_failed(workspace_id: int, video_id: int, transcription_id: int, transcript: str,
+                 segments: Optional[list] = None) -> int:
+    """Enfileira de novo só os tipos que falharam (o erro sai da transcrição ao enfileirar)."""
+    types = list(failures(transcription_id))
+    if not types:
+        return 0
+    _set_failures(transcription_id, {ct: None for ct in types})
+    return queue_pregeneration(workspace_id, video_id, transcription_id, transcript, segments, types=types)
+
+
+def _generate(workspace_id: int, client: dict, video_id: int, transcription_id: int, transcript: str,
+              segments: Optional[list], content_type: str, n: int, model: str, dedupe_retries: int = 0) -> None:
+    from providers.router import chat_with_usage
+    try:
+        excerpt, used = transcript_excerpt(client, content_type, n, transcript, segments)
+        p = build_prompt(client, content_type, n, transcript=excerpt,
+                         examples=style_examples(client, content_type, excerpt))
+        model = resolve_model(model, system_prompt(client), p, content_type, n, workspace_id=workspace_id)
+        out, usage, dups = generate_distinct(
+            lambda prompt: chat_with_usage(model=model, system=system_prompt(client), user=prompt,
+                                           workspace_id=workspace_id, client_id=int(client["id"])),
+            int(client["id"]), p, retries=dedupe_retries)
+        dup_tag = f"dup:{dups[0][0]}," if dups else ""
+        save_content_item(workspace_id, int(client["id"]), content_type, f"{content_type} (vídeo #{video_id})",
+                          "transcription", str(transcription_id), model, p, out,
+                          tags=f"video:{video_id},transcription:{transcription_id},{dup_tag}{AUTO_TAG}",
+                          segments_used=used, usage=usage)
+    except Exception as e:
+        # ninguém lê o Future do pool: sem isto o erro some e o rascunho fica "gerando" para sempre
+        log.exception("pré-geração de %s falhou (transcrição #%s)", content_type, transcription_id)
+        try:
+            _set_failures(transcription_id, {content_type: str(e) or type(e).__name__})
+        except Exception:
+            log.exception("não consegui registrar a falha da pré-geração (transcrição #%s)", transcription_id)
+    finally:
+        with _lock:
+            left = _pending.get(int(transcription_id), 1) - 1
+            if left > 0:
+                _pending[int(transcription_id)] = left
+            else:
+                _pending.pop(int(transcription_id), None)
@@ -0,0 +1,112 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+from app.services.text_utils import count_tokens
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = set("""
+a o as os um uma uns umas de do da dos das no na nos nas em por para pra com sem que se nao sim
+e ou mas como mais menos muito muita muitos muitas ja tambem isso isto esse essa este esta aquele
+aquela ele ela eles elas eu voce voces nos me te lhe ser estar ter foi era sao tem vai vou ai entao
+la aqui ate sobre quando onde porque qual quais quem cada todo toda todos todas the and of to in
+""".split())
+
+
+def _fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text: str) -> List[str]:
+    return [w for w in _WORD_RE.findall(_fold(text or "")) if len(w) > 2 and w not in STOPWORDS]
+
+
+class BM25:
+    """BM25 (Okapi) em memória sobre uma lista pequena de documentos."""
+
+    def __init__(self, docs: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1, self.b = k1, b
+        self.tfs = [Counter(tokenize(d)) for d in docs]
+        self.lens = [sum(tf.values()) for tf in self.tfs]
+        self.avg = (sum(self.lens) / len(self.lens)) if self.lens else 0.0
+        df: Counter = Counter()
+        for tf in self.tfs:
+            df.update(tf.keys())
+        n = len(self.tfs)
+        self.idf: Dict[str, float] = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def scores(self, query: str) -> List[float]:
+        terms = [t for t in set(tokenize(query)) if t in self.idf]
+        out = []
+        for tf, ln in zip(self.tfs, self.lens):
+            s = 0.0
+            norm = self.k1 * (1 - self.b + self.b * ln / self.avg) if self.avg else self.k1
+            for t in terms:
+                f = tf.get(t)
+                if f:
+                    s += self.idf[t] * f * (self.k1 + 1) / (f + norm)
+            out.append(s)
+        return out
+
+
+def _passages(segments: List[dict], max_tokens: int) -> List[List[dict]]:
+    """Junta segmentos vizinhos do Whisper em trechos de até ~max_tokens."""
+    out: List[List[dict]] = []
+    cur: List[dict] = []
+    size = 0
+    for s in segments:
+        t = count_tokens(s.get("text") or "")
+        if cur and size + t > max_tokens:
+            out.append(cur)
+            cur, size = [], 0
+        cur.append(s)
+        size += t
+    if cur:
+        out.append(cur)
+    return out
+
+
+def _fmt_ts(sec) -> str:
+    sec = int(sec or 0)
+    return f"{sec // 60:02d}:{sec % 60:02d}"
+
+
+def select_excerpt(segments: List[dict], query: str, max_tokens: int,
+                   passage_tokens: int = 120) -> Tuple[str, List[int]]:
+    """Escolhe os trechos mais relevantes para `query` dentro de `max_tokens`.
+
+    Retorna o texto (trechos em ordem cronológica, com timestamp) e os ids dos
+    segmentos usados. Sem nenhum termo em comum, espalha os trechos pelo vídeo.
+    """
+    passages = _passages([s for s in segments if (s.get("text") or "").strip()], passage_tokens)
+    if not passages:
+        return "", []
+    texts = [" ".join(s["text"].strip() for s in p) for p in passages]
+    scores = BM25(texts).scores(query)
+    if max(scores) > 0:
+        ranked = sorted(range(len(passages)), key=lambda i: (-scores[i], i))
+    else:
+        step = max(1, len(passages) // 8)
+        ranked = list(range(0, len(passages), step)) + [i for i in range(len(passages)) if i % step]
+
+    chosen, used = [], 0
+    for i in ranked:
+        t = count_tokens(texts[i]) + 4
+        if used + t > max_tokens:
+            continue
+        chosen.append(i)
+        used += t
+    chosen.sort()
+
+    lines, last = [], None
+    for i in chosen:
+        if last is not None and i != last + 1:
+            lines.append("[...]")
+        start = passages[i][0].get("start")
+        lines.append(f"[{_fmt_ts(start)}] {texts[i]}" if start is not None else texts[i])
+        last = i
+    ids = [s.get("id") for i in chosen for s in passages[i]]
+    return "\n".join(lines), ids
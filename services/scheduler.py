@@ -0,0 +1,272 @@
+import heapq
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import datetime as dt
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# Segundos de processamento por segundo de áudio (CPU), ajustado com as execuções reais
+REALTIME_FACTOR = {"tiny": 0.1, "base": 0.2, "small": 0.5}
+DEFAULT_DURATION_S = 300.0  # quando o ffprobe não conseguiu ler a duração
+WHISPER_MODELS = ["tiny", "base", "small"]  # do mais rápido ao mais preciso
+AUTO_MODEL = "auto"
+DEFAULT_TARGET_S = float(os.environ.get("TRANSCRIBE_TARGET_S", "900"))
+
+log = logging.getLogger(__name__)
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+@dataclass
+class TranscriptionJob:
+    id: int
+    workspace_id: int
+    video_id: int
+    filepath: str
+    whisper_model: str
+    language: Optional[str]
+    duration_s: Optional[float]
+    target_s: float = DEFAULT_TARGET_S
+    status: str = "queued"  # queued | running | done | error
+    done_s: float = 0.0
+    segments: List[dict] = field(default_factory=list)
+    transcription_id: Optional[int] = None
+    error: str = ""
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def audio_s(self) -> float:
+        return float(self.duration_s or DEFAULT_DURATION_S)
+
+
+class TranscriptionScheduler:
+    """Fila de transcrições em background.
+
+    - round-robin entre workspaces (um workspace com 50 vídeos não trava os outros);
+    - dentro do workspace, o vídeo mais curto primeiro (SJF pela duração do ffprobe);
+    - no máximo `per_workspace_cap` jobs rodando por workspace;
+    - um vídeo já na fila (ou rodando) não entra de novo;
+    - `on_status(job)` é chamado a cada mudança de status (ver get_scheduler: grava no vídeo).
+    """
+
+    def __init__(self, run_job: Callable[[TranscriptionJob], None], workers: int = 1, per_workspace_cap: int = 1,
+                 on_status: Optional[Callable[[TranscriptionJob], None]] = None):
+        self._run_job = run_job
+        self._on_status = on_status
+        self.workers = max(1, int(workers))
+        self.per_workspace_cap = max(1, int(per_workspace_cap))
+        self._cv = threading.Condition()
+        self._ids = itertools.count(1)
+        self._jobs: Dict[int, TranscriptionJob] = {}
+        self._queues: Dict[int, List[TranscriptionJob]] = {}
+        self._order: List[int] = []  # workspaces na ordem do round-robin
+        self._running: Dict[int, int] = {}
+        self._rtf = dict(REALTIME_FACTOR)
+        self._threads = [threading.Thread(target=self._loop, daemon=True, name=f"transcribe-{i}")
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+
+    # ---- fila ----
+    def submit(self, workspace_id: int, video_id: int, filepath: str, whisper_model: str,
+               language: Optional[str] = None, duration_s: Optional[float] = None,
+               target_s: Optional[float] = None) -> TranscriptionJob:
+        with self._cv:
+            for j in self._jobs.values():
+                if j.video_id == int(video_id) and j.status in ("queued", "running"):
+                    return j
+            job = TranscriptionJob(next(self._ids), int(workspace_id), int(video_id), filepath,
+                                   whisper_model, language, duration_s, float(target_s or DEFAULT_TARGET_S))
+            self._jobs[job.id] = job
+            self._forget_finished()
+            q = self._queues.setdefault(job.workspace_id, [])
+            q.append(job)
+            q.sort(key=lambda j: (j.audio_s, j.id))
+            if job.workspace_id not in self._order:
+                self._order.append(job.workspace_id)
+            # grava "queued" antes de acordar um worker: senão esta escrita pode chegar depois
+            # do "done" dele e deixar o vídeo pendente de novo (transcrito outra vez no restart)
+            self._status(job)
+            self._cv.notify()
+        return job
+
+    def _status(self, job: TranscriptionJob) -> None:
+        if self._on_status is None:
+            return
+        try:
+            self._on_status(job)
+        except Exception:
+            # o status persistido é só para retomar depois de um restart: não derruba o worker
+            log.exception("não consegui gravar o status do job #%s (vídeo #%s)", job.id, job.video_id)
+
+    def _forget_finished(self, keep_s: float = 3600) -> None:
+        cutoff = time.time() - keep_s
+        for jid in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[jid]
+
+    def _pick(self, running: Dict[int, int], queues: Dict[int, List[TranscriptionJob]], order: List[int]):
+        for i, ws in enumerate(order):
+            if queues.get(ws) and running.get(ws, 0) < self.per_workspace_cap:
+                # quem foi atendido vai para o fim da fila
+                order.append(order.pop(i))
+                return queues[ws].pop(0)
+        return None
+
+    def _loop(self) -> None:
+        while True:
+            with self._cv:
+                job = self._pick(self._running, self._queues, self._order)
+                while job is None:
+                    self._cv.wait()
+                    job = self._pick(self._running, self._queues, self._order)
+                self._running[job.workspace_id] = self._running.get(job.workspace_id, 0) + 1
+                if job.whisper_model == AUTO_MODEL:
+                    job.whisper_model = self.choose_model(job, sum(len(q) for q in self._queues.values()))
+                job.status = "running"
+                job.started_at = time.time()
+            self._status(job)
+            try:
+                self._run_job(job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "error"
+                job.error = str(e)
+            with self._cv:
+                job.finished_at = time.time()
+                self._running[job.workspace_id] -= 1
+                if job.status == "done" and job.started_at:
+                    self._learn(job)
+                self._cv.notify_all()
+            self._status(job)
+
+    def _learn(self, job: TranscriptionJob) -> None:
+        if not job.duration_s:
+            return
+        rtf = (job.finished_at - job.started_at) / job.duration_s
+        prev = self._rtf.get(job.whisper_model, rtf)
+        self._rtf[job.whisper_model] = 0.7 * prev + 0.3 * rtf
+
+    # ---- consulta ----
+    def estimate_seconds(self, job: TranscriptionJob, model: Optional[str] = None) -> float:
+        return job.audio_s * self._rtf.get(model or job.whisper_model, self._rtf["base"])
+
+    def choose_model(self, job: TranscriptionJob, queue_depth: int) -> str:
+        """Modelo mais preciso que cabe na meta de latência do workspace.
+
+        O orçamento é o que sobrou da meta (descontada a espera na fila), dividido
+        com quem ainda está na fila: com backlog grande cai para `tiny`, com a fila
+        vazia um clipe curto vai de `small`.
+        """
+        waited = time.time() - job.submitted_at
+        budget = min(job.target_s - waited, job.target_s / (1 + queue_depth / self.workers))
+        for model in reversed(WHISPER_MODELS):
+            if self.estimate_seconds(job, model) <= budget:
+                return model
+        return WHISPER_MODELS[0]
+
+    def jobs(self, workspace_id: Optional[int] = None) -> List[TranscriptionJob]:
+        with self._cv:
+            out = [j for j in self._jobs.values() if workspace_id is None or j.workspace_id == int(workspace_id)]
+        return sorted(out, key=lambda j: j.id, reverse=True)
+
+    def etas(self) -> Dict[int, float]:
+        """Segundos até terminar, por job ativo, simulando a mesma política de despacho."""
+        with self._cv:
+            now = time.time()
+            queues = {ws: list(q) for ws, q in self._queues.items()}
+            order = list(self._order)
+            running = [j for j in self._jobs.values() if j.status == "running"]
+        est: Dict[int, float] = {}
+        ends = []  # heap de (t_fim, workspace)
+        busy: Dict[int, int] = {}
+        for j in running:
+            est[j.id] = max(0.0, self.estimate_seconds(j) - (now - (j.started_at or now)))
+            heapq.heappush(ends, (est[j.id], j.workspace_id))
+            busy[j.workspace_id] = busy.get(j.workspace_id, 0) + 1
+        t, free = 0.0, max(0, self.workers - len(running))
+        while True:
+            while free:
+                job = self._pick(busy, queues, order)
+                if job is None:
+                    break
+                est[job.id] = t + self.estimate_seconds(job)
+                heapq.heappush(ends, (est[job.id], job.workspace_id))
+                busy[job.workspace_id] = busy.get(job.workspace_id, 0) + 1
+                free -= 1
+            if not any(queues.values()) or not ends:
+                return est
+            t, ws = heapq.heappop(ends)
+            busy[ws] -= 1
+            free += 1
+
+
+def run_transcription_job(job: TranscriptionJob) -> None:
+    from services.transcription import iter_transcribe_file
+    from services.transcripts import save_transcription
+    for step in iter_transcribe_file(job.filepath, whisper_model=job.whisper_model, language=job.language):
+        job.segments.extend(step["segments"])
+        job.done_s = step["done_s"]
+        if not job.duration_s:
+            job.duration_s = step["duration_s"]
+        job.language = job.language or step["language"]
+    text = " ".join(s["text"] for s in job.segments if s["text"]).strip()
+    job.transcription_id = save_transcription(job.workspace_id, job.video_id, job.whisper_model, job.language,
+                                              text, job.segments)
+    if job.transcription_id:
+        from services.pregen import queue_pregeneration
+        queue_pregeneration(job.workspace_id, job.video_id, job.transcription_id, text, job.segments)
+
+
+# videos.transcribe_status: pending | running | error | NULL (nada na fila)
+_DB_STATUS = {"queued": "pending", "running": "running", "done": None, "error": "error"}
+
+
+def save_job_status(job: TranscriptionJob) -> None:
+    from db import exec_sql
+    spec = None
+    if job.status in ("queued", "running"):
+        spec = json.dumps({"filepath": job.filepath, "whisper_model": job.whisper_model, "language": job.language,
+                           "target_s": job.target_s})
+    exec_sql("UPDATE videos SET transcribe_status=?, transcribe_spec=? WHERE workspace_id=? AND id=?",
+             (_DB_STATUS[job.status], spec, job.workspace_id, job.video_id))
+
+
+def requeue_pending(scheduler: TranscriptionScheduler) -> int:
+    """A fila é só memória: depois de um restart, volta para ela o que estava pendente ou rodando."""
+    from db import fetchall
+    rows = fetchall("SELECT id, workspace_id, duration_s, transcribe_spec FROM videos "
+                    "WHERE transcribe_status IN ('pending', 'running') ORDER BY id")
+    for r in rows:
+        spec = json.loads(r["transcribe_spec"] or "{}")
+        scheduler.submit(r["workspace_id"], r["id"], spec.get("filepath", ""), spec.get("whisper_model") or AUTO_MODEL,
+                         language=spec.get("language"), duration_s=r["duration_s"], target_s=spec.get("target_s"))
+    return len(rows)
+
+
+_scheduler: Optional[TranscriptionScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> TranscriptionScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TranscriptionScheduler(
+                run_transcription_job,
+                workers=int(os.environ.get("TRANSCRIBE_WORKERS", "1")),
+                per_workspace_cap=int(os.environ.get("TRANSCRIBE_PER_WORKSPACE", "1")),
+                on_status=save_job_status,
+            )
+            try:
+                requeue_pending(_scheduler)
+            except Exception:
+                log.exception("não consegui retomar as transcrições pendentes")
+        return _scheduler
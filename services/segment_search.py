@@ -0,0 +1,105 @@
+import re
+from typing import Any, Dict, List, Optional
+
+from db import _IS_PG, exec_sql, fetchall, fetchone, insert_many
+from services.retrieval import tokenize
+
+SNIPPET_CHARS = 160
+_fts: Optional[bool] = None
+
+
+def _has_fts() -> bool:
+    """SQLite: o índice foi criado como FTS5? (Postgres usa tsvector.)"""
+    global _fts
+    if _fts is None:
+        row = fetchone("SELECT sql FROM sqlite_master WHERE name='transcript_segments'")
+        _fts = bool(row and "fts5" in (row.get("sql") or "").lower())
+    return _fts
+
+
+def _scope(workspace_id: int, client_id: int) -> str:
+    return f"w{int(workspace_id)} c{int(client_id)}"
+
+
+def index_transcription(workspace_id: int, video_id: int, transcription_id: int, segments: List[Dict[str, Any]],
+                        client_id: Optional[int] = None) -> int:
+    """Indexa os segmentos de uma transcrição recém-salva. Retorna quantos entraram."""
+    if client_id is None:
+        v = fetchone("SELECT client_id FROM videos WHERE workspace_id=? AND id=?", (workspace_id, video_id))
+        client_id = int(v["client_id"]) if v else 0
+    rows = [(workspace_id, client_id, video_id, transcription_id, s.get("start"), s.get("end"), s["text"].strip(),
+             _scope(workspace_id, client_id))
+            for s in segments or [] if (s.get("text") or "").strip()]
+    cols = ["workspace_id", "client_id", "video_id", "transcription_id", "start_s", "end_s", "text", "scope"]
+    if _IS_PG:
+        cols, rows = cols[:7], [r[:7] for r in rows]
+    insert_many("transcript_segments", cols, rows, returning=None)
+    exec_sql("UPDATE transcriptions SET search_indexed=1 WHERE id=?", (transcription_id,))
+    return len(rows)
+
+
+def backfill_index(batch: int = 50) -> int:
+    """Indexa transcrições antigas que ainda não passaram por index_transcription()."""
+    from services.transcripts import get_transcription, load_segments
+    total = 0
+    while True:
+        rows = fetchall("SELECT id,workspace_id,video_id FROM transcriptions WHERE search_indexed IS NULL "
+                        "ORDER BY id LIMIT ?", (int(batch),))
+        if not rows:
+            return total
+        for r in rows:
+            tr = get_transcription(int(r["workspace_id"]), int(r["id"]))
+            index_transcription(int(r["workspace_id"]), int(r["video_id"]), int(r["id"]), load_segments(tr) if tr else [])
+        total += len(rows)
+
+
+def _like_snippet(text: str, terms: List[str]) -> str:
+    low = text.lower()
+    pos = min([i for i in (low.find(t) for t in terms) if i >= 0] or [0])
+    a = max(0, pos - SNIPPET_CHARS // 3)
+    out = text[a:a + SNIPPET_CHARS]
+    for t in terms:
+        out = re.sub(f"({re.escape(t)})", r"**\1**", out, flags=re.IGNORECASE)
+    return ("…" if a else "") + out + ("…" if a + SNIPPET_CHARS < len(text) else "")
+
+
+def search_segments(workspace_id: int, query: str, client_id: Optional[int] = None,
+                    limit: int = 50) -> List[Dict[str, Any]]:
+    """Segmentos que citam `query`: vídeo, início/fim (s) e trecho com os termos em **negrito**."""
+    terms = tokenize(query)
+    if not terms:
+        return []
+    base = ("SELECT s.video_id, s.transcription_id, s.start_s, s.end_s, v.filename, {snippet} AS snippet "
+            "FROM transcript_segments s JOIN videos v ON v.id = s.video_id ")
+    if _IS_PG:
+        sql = base.format(snippet="ts_headline('portuguese', s.text, q, 'StartSel=**,StopSel=**,MaxFragments=1,MaxWords=30')")
+        sql += ", plainto_tsquery('portuguese', ?) q WHERE s.tsv @@ q AND s.workspace_id=?"
+        params: list = [query, workspace_id]
+        if client_id is not None:
+            sql += " AND s.client_id=?"
+            params.append(client_id)
+        sql += " ORDER BY ts_rank(s.tsv, q) DESC, s.video_id DESC, s.start_s LIMIT ?"
+        return fetchall(sql, tuple(params + [int(limit)]))
+
+    if _has_fts():
+        scope = f'scope : "w{int(workspace_id)}"' + (f' AND scope : "c{int(client_id)}"' if client_id is not None else "")
+        match = scope + " AND text : (" + " AND ".join(f'"{t}"*' for t in terms) + ")"
+        return fetchall(
+            "SELECT s.video_id, s.transcription_id, s.start_s, s.end_s, v.filename, s.snippet FROM ("
+            " SELECT video_id, transcription_id, start_s, end_s, rank,"
+            " snippet(transcript_segments, 0, '**', '**', '…', 24) AS snippet"
+            " FROM transcript_segments WHERE transcript_segments MATCH ? ORDER BY rank LIMIT ?"
+            ") s JOIN videos v ON v.id = s.video_id ORDER BY s.rank", (match, int(limit)))
+
+    sql = base.format(snippet="s.text") + "WHERE s.workspace_id=?"
+    params = [workspace_id]
+    if client_id is not None:
+        sql += " AND s.client_id=?"
+        params.append(client_id)
+    for t in terms:
+        sql += " AND LOWER(s.text) LIKE ?"
+        params.append(f"%{t}%")
+    rows = fetchall(sql + " ORDER BY s.video_id DESC, s.start_s LIMIT ?", tuple(params + [int(limit)]))
+    for r in rows:
+        r["snippet"] = _like_snippet(r["snippet"], terms)
+    return rows
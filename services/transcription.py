@@ -1,18 +1,86 @@
-from typing import Optional, Tuple, List
+from typing import Callable, Iterator, Optional, Tuple, List
 
-def transcribe_video_bytes(video_bytes: bytes, whisper_model: str = "base", language: Optional[str] = None) -> Tuple[str, List[dict]]:
-    import tempfile, os
+SAMPLE_RATE = 16000  # whisper.audio.SAMPLE_RATE
+WINDOW_SECONDS = 60
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Duração da mídia em segundos via ffprobe (None se não der para ler)."""
+    try:
+        import ffmpeg
+        info = ffmpeg.probe(path)
+        return round(float(info["format"]["duration"]), 2)
+    except Exception:
+        return None
+
+
+def _norm_segments(segments: list, offset: float, first_id: int) -> List[dict]:
+    out = []
+    for i, s in enumerate(segments):
+        out.append({
+            "id": first_id + i,
+            "start": round(float(s.get("start") or 0.0) + offset, 2),
+            "end": round(float(s.get("end") or 0.0) + offset, 2),
+            "text": (s.get("text") or "").strip(),
+        })
+    return out
+
+
+def iter_transcribe_file(path: str, whisper_model: str = "base", language: Optional[str] = None,
+                         window_seconds: int = WINDOW_SECONDS) -> Iterator[dict]:
+    """Transcreve o arquivo em janelas de `window_seconds` e emite o progresso a cada janela.
+
+    Cada item: {"segments": [novos segmentos], "done_s", "duration_s", "language"}.
+    O idioma detectado na 1ª janela é fixado nas seguintes, e o fim do texto anterior
+    vai como initial_prompt para manter o contexto entre janelas.
+    """
     import whisper
+    model = whisper.load_model(whisper_model)
+    audio = whisper.load_audio(path)
+    duration = len(audio) / SAMPLE_RATE
+    step = max(1, int(window_seconds * SAMPLE_RATE))
+    lang = language
+    next_id = 0
+    tail = ""
+    for start in range(0, len(audio), step):
+        kwargs = {}
+        if lang:
+            kwargs["language"] = lang
+        if tail:
+            kwargs["initial_prompt"] = tail
+        result = model.transcribe(audio[start:start + step], **kwargs)
+        lang = lang or result.get("language")
+        segs = _norm_segments(result.get("segments") or [], start / SAMPLE_RATE, next_id)
+        next_id += len(segs)
+        if segs:
+            tail = " ".join(s["text"] for s in segs)[-200:]
+        yield {
+            "segments": segs,
+            "done_s": min(duration, (start + step) / SAMPLE_RATE),
+            "duration_s": duration,
+            "language": lang,
+        }
+
+
+def transcribe_file(path: str, whisper_model: str = "base", language: Optional[str] = None,
+                    on_progress: Optional[Callable[[dict], None]] = None) -> Tuple[str, List[dict]]:
+    segments: List[dict] = []
+    for step in iter_transcribe_file(path, whisper_model=whisper_model, language=language):
+        segments.extend(step["segments"])
+        if on_progress:
+            on_progress(step)
+    text = " ".join(s["text"] for s in segments if s["text"]).strip()
+    return text, segments
+
+
+def transcribe_video_bytes(video_bytes: bytes, whisper_model: str = "base", language: Optional[str] = None,
+                           on_progress: Optional[Callable[[dict], None]] = None) -> Tuple[str, List[dict]]:
+    import tempfile, os
     with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as f:
         f.write(video_bytes)
         tmp_path = f.name
     try:
-        model = whisper.load_model(whisper_model)
-        result = model.transcribe(tmp_path, language=language) if language else model.transcribe(tmp_path)
-        text = (result.get("text") or "").strip()
-        segments = result.get("segments") or []
-        norm = [{"id": s.get("id"), "start": s.get("start"), "end": s.get("end"), "text": (s.get("text") or "").strip()} for s in segments]
-        return text, norm
+        return transcribe_file(tmp_path, whisper_model=whisper_model, language=language, on_progress=on_progress)
     finally:
         try: os.remove(tmp_path)
         except Exception: pass
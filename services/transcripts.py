@@ -0,0 +1,66 @@
+import json
+import datetime as dt
+from typing import Any, Dict, List, Optional
+
+from db import exec_many, fetchall, fetchone, insert_many
+from app.services.transcript_codec import decode_segments, decode_text, encode_segments, encode_text
+
+# Só metadados: a listagem não traz texto nem segmentos
+META_COLS = "id,workspace_id,video_id,whisper_model,language,created_at"
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def save_transcription(workspace_id: int, video_id: int, whisper_model: str, language: Optional[str], text: str,
+                       segments: List[Dict[str, Any]], created_at: Optional[str] = None) -> int:
+    tid = insert_many("transcriptions",
+                      ["workspace_id", "video_id", "whisper_model", "language", "text", "text_z", "segments_z", "created_at"],
+                      [(workspace_id, video_id, whisper_model, language, "", encode_text(text),
+                        encode_segments(text, segments), created_at or _now())])[0]
+    from services.segment_search import index_transcription
+    index_transcription(workspace_id, video_id, tid, segments)
+    return tid
+
+
+def list_transcriptions(workspace_id: int, video_id: int) -> List[Dict[str, Any]]:
+    return fetchall(f"SELECT {META_COLS} FROM transcriptions WHERE workspace_id=? AND video_id=? ORDER BY id DESC",
+                    (workspace_id, video_id))
+
+
+def get_transcription(workspace_id: int, transcription_id: int) -> Optional[Dict[str, Any]]:
+    """Transcrição com o texto decodificado; os segmentos ficam em `segments_z` até load_segments()."""
+    row = fetchone(f"SELECT {META_COLS},text,text_z,segments_z,segments_json FROM transcriptions "
+                   "WHERE workspace_id=? AND id=?", (workspace_id, transcription_id))
+    if not row:
+        return None
+    if row.get("text_z") is not None:
+        row["text"] = decode_text(row["text_z"])
+    return row
+
+
+def load_segments(tr: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if tr.get("segments_z") is not None:
+        return decode_segments(tr["segments_z"], tr.get("text") or "")
+    return json.loads(tr.get("segments_json") or "[]")
+
+
+def migrate_transcriptions(batch: int = 100) -> int:
+    """Converte linhas antigas (text + segments_json) para o formato compacto, em lotes."""
+    total = 0
+    while True:
+        rows = fetchall("SELECT id,text,segments_json FROM transcriptions WHERE text_z IS NULL ORDER BY id LIMIT ?",
+                        (int(batch),))
+        if not rows:
+            return total
+        updates = []
+        for r in rows:
+            text = r.get("text") or ""
+            try:
+                segs = json.loads(r.get("segments_json") or "[]")
+            except Exception:
+                segs = []
+            updates.append((encode_text(text), encode_segments(text, segs), r["id"]))
+        exec_many("UPDATE transcriptions SET text_z=?, segments_z=?, text='', segments_json=NULL WHERE id=?", updates)
+        total += len(rows)
@@ -0,0 +1,81 @@
+import datetime as dt
+from typing import Any, Dict, List, Optional
+
+from db import exec_sql, fetchall, fetchone
+
+GROUPS = {
+    "workspace": "workspace_id",
+    "client": "client_id",
+    "model": "model",
+    "day": "substr(created_at, 1, 10)",
+}
+
+
+class QuotaExceeded(RuntimeError):
+    pass
+
+
+def _now() -> str:
+    return dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+
+
+def month_start() -> str:
+    return dt.datetime.utcnow().strftime("%Y-%m-01")
+
+
+def record_call(usage: Dict[str, Any], workspace_id: Optional[int] = None, client_id: Optional[int] = None,
+                ok: bool = True) -> None:
+    exec_sql(
+        "INSERT INTO llm_calls (workspace_id,client_id,provider,model,prompt_tokens,completion_tokens,latency_ms,ttft_ms,ok,created_at) "
+        "VALUES (?,?,?,?,?,?,?,?,?,?)",
+        (workspace_id, client_id, usage.get("provider") or "", usage.get("model") or "",
+         int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0),
+         usage.get("latency_ms"), usage.get("ttft_ms"), 1 if ok else 0, _now()),
+    )
+
+
+def tokens_this_month(workspace_id: int) -> int:
+    r = fetchone("SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) AS t FROM llm_calls "
+                 "WHERE workspace_id=? AND created_at >= ?", (workspace_id, month_start()))
+    return int(r["t"]) if r else 0
+
+
+def check_quota(workspace_id: int) -> None:
+    ws = fetchone("SELECT monthly_token_quota FROM workspaces WHERE id=?", (workspace_id,))
+    quota = ws.get("monthly_token_quota") if ws else None
+    if not quota:
+        return
+    used = tokens_this_month(workspace_id)
+    if used >= int(quota):
+        raise QuotaExceeded(f"Cota mensal de tokens do painel esgotada ({used:,} de {int(quota):,}).")
+
+
+def usage_summary(group_by: str = "day", workspace_id: Optional[int] = None, since: Optional[str] = None,
+                  limit: int = 100) -> List[Dict[str, Any]]:
+    """Tokens, chamadas e latência agregados por workspace, cliente, modelo ou dia."""
+    key = GROUPS[group_by]
+    where, params = [], []
+    if workspace_id is not None:
+        where.append("workspace_id=?")
+        params.append(workspace_id)
+    if since:
+        where.append("created_at >= ?")
+        params.append(since)
+    sql = (f"SELECT {key} AS grp, COUNT(*) AS calls, SUM(prompt_tokens) AS prompt_tokens, "
+           "SUM(completion_tokens) AS completion_tokens, AVG(latency_ms) AS avg_latency_ms, "
+           "MAX(latency_ms) AS max_latency_ms, AVG(ttft_ms) AS avg_ttft_ms, SUM(1 - ok) AS errors "
+           "FROM llm_calls")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" GROUP BY {key} ORDER BY {'grp DESC' if group_by == 'day' else 'SUM(prompt_tokens + completion_tokens) DESC'} LIMIT ?"
+    return fetchall(sql, tuple(params) + (int(limit),))
+
+
+def usage_caption(model: str, usage: Optional[Dict[str, Any]]) -> str:
+    cap = f"Modelo: {model}"
+    if usage:
+        cap += (f" • {usage.get('prompt_tokens', 0)}+{usage.get('completion_tokens', 0)} tokens"
+                f" • {(usage.get('latency_ms') or 0) / 1000:.1f}s")
+        if usage.get("ttft_ms") is not None:
+            cap += f" (1º token {usage['ttft_ms'] / 1000:.1f}s)"
+    return cap
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# db.py lê a configuração no import: banco SQLite descartável, sem Postgres
+_tmp = tempfile.mkdtemp(prefix="content_os_tests_")
+os.environ["CONTENT_OS_DB"] = os.path.join(_tmp, "content_os.db")
+os.environ.pop("DATABASE_URL", None)
+os.environ.pop("DATABASE_REPLICA_URL", None)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session", autouse=True)
+def schema():
+    import db
+    db.init_db()
@@ -0,0 +1,116 @@
+"""Pool falso no formato do psycopg_pool: conexões autocommit, a não ser dentro de conn.transaction()."""
+from contextlib import asynccontextmanager, contextmanager
+
+
+class Boom(Exception):
+    def __init__(self, msg="", sqlstate=None):
+        super().__init__(msg)
+        self.sqlstate = sqlstate  # como psycopg.Error: None para falha de conexão no cliente
+
+
+class FakePool:
+    def __init__(self, name="primary", fail_at=None, down=False):
+        self.name = name
+        self.fail_at = fail_at  # n-ésimo comando que levanta
+        self.down = down  # True = fora do ar; uma string = erro de SQL com esse SQLSTATE
+        self.commands = 0
+        self.committed = []
+        self.reads = 0
+        self.tries = 0
+
+    @contextmanager
+    def connection(self):
+        self.tries += 1
+        if self.down:
+            raise Boom(f"{self.name} fora do ar", None if self.down is True else self.down)
+        yield FakeConn(self)
+
+
+class FakeConn:
+    def __init__(self, pool):
+        self.pool = pool
+        self.pending = None
+
+    @contextmanager
+    def transaction(self):
+        self.pending = []
+        try:
+            yield
+        except BaseException:
+            self.pending = None
+            raise
+        self.pool.committed.extend(self.pending)
+        self.pending = None
+
+    def cursor(self, **kw):
+        return FakeCursor(self)
+
+    def write(self, row):
+        self.pool.commands += 1
+        if self.pool.commands == self.pool.fail_at:
+            raise Boom(f"comando {self.pool.commands}")
+        (self.pool.committed if self.pending is None else self.pending).append(row)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.last = []
+        self.description = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=(), prepare=None):
+        if sql.lstrip().upper().startswith("SELECT"):
+            self.conn.pool.reads += 1
+            self.last = [{"n": 1}]
+            return
+        self.conn.write(tuple(params))
+        self.last = [{"id": len(self.conn.pool.committed) + len(self.conn.pending or ())}]
+
+    def executemany(self, sql, rows):
+        for r in rows:
+            self.conn.write(tuple(r))
+
+    def fetchone(self):
+        return self.last[0] if self.last else None
+
+    def fetchall(self):
+        return self.last
+
+
+class FakeAsyncPool(FakePool):
+    @asynccontextmanager
+    async def connection(self):
+        yield FakeAsyncConn(self)
+
+
+class FakeAsyncConn(FakeConn):
+    @asynccontextmanager
+    async def transaction(self):
+        with FakeConn.transaction(self):
+            yield
+
+    def cursor(self, **kw):
+        return FakeAsyncCursor(self)
+
+
+class FakeAsyncCursor(FakeCursor):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=(), prepare=None):
+        FakeCursor.execute(self, sql, params, prepare)
+
+    async def executemany(self, sql, rows):
+        FakeCursor.executemany(self, sql, rows)
+
+    async def fetchall(self):
+        return self.last
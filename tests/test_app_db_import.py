@@ -0,0 +1,110 @@
+import sqlite3
+
+import pytest
+
+import db
+from app import db as app_db
+
+
+class Crash(Exception):
+    pass
+
+
+def _make_app_db(path, tag, n_clients=5):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT NOT NULL UNIQUE, name TEXT NOT NULL DEFAULT '',
+        password_hash TEXT NOT NULL, is_admin INTEGER NOT NULL DEFAULT 0, is_active INTEGER NOT NULL DEFAULT 0,
+        approved_at TEXT, requested_workspace_name TEXT NOT NULL DEFAULT '', created_at TEXT NOT NULL DEFAULT (datetime('now')));
+    CREATE TABLE workspaces (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+        created_at TEXT NOT NULL DEFAULT (datetime('now')));
+    CREATE TABLE memberships (user_id INTEGER NOT NULL, workspace_id INTEGER NOT NULL, role TEXT NOT NULL DEFAULT 'editor',
+        created_at TEXT NOT NULL DEFAULT (datetime('now')), PRIMARY KEY (user_id, workspace_id));
+    CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, workspace_id INTEGER NOT NULL, name TEXT NOT NULL,
+        description TEXT NOT NULL DEFAULT '', profile_json TEXT NOT NULL DEFAULT '{}',
+        created_at TEXT NOT NULL DEFAULT (datetime('now')), updated_at TEXT NOT NULL DEFAULT (datetime('now')));
+    CREATE TABLE videos (id INTEGER PRIMARY KEY AUTOINCREMENT, workspace_id INTEGER NOT NULL, client_id INTEGER NOT NULL,
+        filename TEXT NOT NULL, filepath TEXT NOT NULL, created_at TEXT NOT NULL DEFAULT (datetime('now')));
+    CREATE TABLE transcriptions (id INTEGER PRIMARY KEY AUTOINCREMENT, workspace_id INTEGER NOT NULL, video_id INTEGER NOT NULL,
+        text TEXT NOT NULL, segments_json TEXT NOT NULL DEFAULT '[]', engine TEXT NOT NULL DEFAULT 'whisper',
+        created_at TEXT NOT NULL DEFAULT (datetime('now')));
+    """)
+    conn.execute("INSERT INTO users (email, password_hash, is_active) VALUES (?, 'x', 1)", (f"{tag}@ex.com",))
+    conn.execute("INSERT INTO workspaces (name) VALUES (?)", (f"ws-{tag}",))
+    conn.execute("INSERT INTO memberships (user_id, workspace_id, role) VALUES (1, 1, 'owner')")
+    for i in range(n_clients):
+        conn.execute("INSERT INTO clients (workspace_id, name) VALUES (1, ?)", (f"{tag}-c{i}",))
+        conn.execute("INSERT INTO videos (workspace_id, client_id, filename, filepath) VALUES (1, ?, 'v.mp4', '/v.mp4')",
+                     (i + 1,))
+        conn.execute("INSERT INTO transcriptions (workspace_id, video_id, text) VALUES (1, ?, ?)", (i + 1, f"texto {i}"))
+    conn.commit()
+    conn.close()
+
+
+def _counts(tag):
+    ws = db.fetchone("SELECT id FROM workspaces WHERE name=?", (f"ws-{tag}",))
+    ws_id = ws["id"] if ws else -1
+    n = lambda sql: db.fetchone(sql, (ws_id,))["n"]
+    return {
+        "workspaces": db.fetchone("SELECT COUNT(1) AS n FROM workspaces WHERE name=?", (f"ws-{tag}",))["n"],
+        "users": db.fetchone("SELECT COUNT(1) AS n FROM users WHERE email=?", (f"{tag}@ex.com",))["n"],
+        "members": n("SELECT COUNT(1) AS n FROM workspace_members WHERE workspace_id=?"),
+        "clients": n("SELECT COUNT(1) AS n FROM clients WHERE workspace_id=?"),
+        "videos": n("SELECT COUNT(1) AS n FROM videos WHERE workspace_id=?"),
+        "transcriptions": n("SELECT COUNT(1) AS n FROM transcriptions WHERE workspace_id=?"),
+    }
+
+
+EXPECTED = {"workspaces": 1, "users": 1, "members": 1, "clients": 5, "videos": 5, "transcriptions": 5}
+
+
+def test_rerun_after_crash_between_batches_does_not_duplicate(tmp_path):
+    path = tmp_path / "app.db"
+    _make_app_db(path, "between")
+
+    def crash(table, done, total):
+        if table == "videos" and done == 2:
+            raise Crash()
+
+    with pytest.raises(Crash):
+        app_db.import_app_db(path, batch=2, progress=crash)
+    assert path.exists()
+    assert _counts("between")["videos"] == 2
+
+    assert app_db.import_app_db(path, batch=2)
+    assert not path.exists() and (tmp_path / "app.db.imported").exists()
+    assert _counts("between") == EXPECTED
+    # vídeos apontam para os clientes importados, não para os ids antigos
+    orphans = db.fetchone("SELECT COUNT(1) AS n FROM videos v LEFT JOIN clients c ON c.id=v.client_id WHERE c.id IS NULL")
+    assert orphans["n"] == 0
+
+
+def test_failure_inside_a_batch_rolls_the_batch_back(tmp_path, monkeypatch):
+    path = tmp_path / "app.db"
+    _make_app_db(path, "inside")
+    real, calls = app_db.encode_text, []
+
+    def flaky(text):
+        calls.append(text)
+        if len(calls) == 4:
+            raise Crash()
+        return real(text)
+
+    monkeypatch.setattr(app_db, "encode_text", flaky)
+    with pytest.raises(Crash):
+        app_db.import_app_db(path, batch=2)
+    # o lote 2 (transcrições 3 e 4) caiu no meio: só o lote 1 ficou
+    assert _counts("inside")["transcriptions"] == 2
+
+    monkeypatch.setattr(app_db, "encode_text", real)
+    assert app_db.import_app_db(path, batch=2)
+    assert _counts("inside") == EXPECTED
+
+
+def test_pending_until_imported(tmp_path):
+    path = tmp_path / "app.db"
+    assert not app_db.app_db_import_pending(path)
+    _make_app_db(path, "pending", n_clients=1)
+    assert app_db.app_db_import_pending(path)
+    app_db.import_app_db(path)
+    assert not app_db.app_db_import_pending(path)
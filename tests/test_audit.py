@@ -0,0 +1,14 @@
+import time
+
+from db import fetchall
+from services import audit
+
+
+def test_flush_does_not_wait_for_the_batch_window(monkeypatch):
+    monkeypatch.setattr(audit, "FLUSH_S", 5.0)
+    w = audit.AuditWriter()
+    w.put((None, None, "teste.flush", "", None, "{}", audit._now()))
+    t0 = time.monotonic()
+    w.flush()
+    assert time.monotonic() - t0 < 1.0
+    assert fetchall("SELECT id FROM audit_log WHERE action='teste.flush'")
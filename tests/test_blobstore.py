@@ -0,0 +1,26 @@
+import db
+from services import blobstore
+
+PROMPT = blobstore.PROMPT_SEP.join(["contexto do cliente", "transcrição", "tarefa"])
+
+
+def _item(prompt_used, prompt_ref=None):
+    return db.insert_many("content_items", ["workspace_id", "client_id", "type", "title", "input_source", "model",
+                                            "prompt_used", "prompt_ref", "output_text", "created_at"],
+                          [(1, 1, "Ideias", "", "manual", "m", prompt_used, prompt_ref, "out", "2024-01-01T00:00:00Z")])[0]
+
+
+def test_migrate_prompts_moves_old_rows_and_readers_see_the_same_text():
+    old = [_item(PROMPT), _item("só uma seção")]
+    new = _item("", blobstore.store_prompt(PROMPT))
+    assert blobstore.migrate_prompts(batch=1) >= 2
+    rows = db.fetchall("SELECT * FROM content_items WHERE id IN (?,?,?) ORDER BY id", (*old, new))
+    assert all(r["prompt_used"] == "" and r["prompt_ref"] for r in rows)
+    assert blobstore.prompt_texts(rows) == [PROMPT, "só uma seção", PROMPT]
+    assert blobstore.migrate_prompts() == 0
+
+
+def test_nothing_to_do_check_uses_the_partial_index():
+    plan = db.fetchall("EXPLAIN QUERY PLAN SELECT 1 AS x FROM content_items "
+                       "WHERE prompt_ref IS NULL AND prompt_used <> '' LIMIT 1")
+    assert any("idx_content_items_prompt_pending" in r["detail"] for r in plan)
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.providers.stub_provider import StubProvider
+from app.services import content_service
+from services import usage
+
+
+def test_run_task_records_every_call(monkeypatch):
+    calls = []
+    monkeypatch.setattr(usage, "record_call", lambda u, ws=None, cl=None, ok=True: calls.append((u["provider"], ws, ok)))
+    provider = StubProvider("stub", reply="ok")
+    text = " ".join(f"frase número {i} sobre o cliente." for i in range(400))
+    content_service.run_task(provider, "m", {"name": "C"}, "Resuma.", input_text=text, context_window=1500,
+                             max_tokens=200, workspace_id=7, client_id=3)
+    assert provider.calls > 1
+    assert calls == [("stub", 7, True)] * provider.calls
+
+
+def test_groups_never_exceed_fan_in():
+    for n in range(1, 12):
+        for fan_in in (2, 3, 4):
+            groups = content_service._group_partials([f"parcial {i}" for i in range(n)], fan_in, budget=10_000)
+            assert all(len(g) <= fan_in for g in groups), (n, fan_in, groups)
+            assert sum(len(g) for g in groups) == n
+            if n > 1:
+                assert len(groups) < n
+
+
+def test_tree_reduce_prompts_stay_within_fan_in():
+    seen = []
+
+    def call(prompt):
+        seen.append(prompt.count("[BLOCO "))
+        return "síntese"
+
+    with ThreadPoolExecutor(2) as pool:
+        out = content_service._tree_reduce(call, pool, [f"p{i}" for i in range(7)], fan_in=2, budget=10_000)
+    assert out == "síntese"
+    assert max(seen) <= 2 and min(seen) >= 2
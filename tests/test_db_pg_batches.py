@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+import db
+import db_async
+from pg_stub import Boom, FakeAsyncPool, FakePool
+
+
+@pytest.fixture
+def pg(monkeypatch):
+    pool = FakePool(fail_at=3)
+    monkeypatch.setattr(db, "_IS_PG", True)
+    monkeypatch.setattr(db, "PG_VALUES_CHUNK", 2)
+    monkeypatch.setattr(db, "_pool", lambda url="": pool)
+    return pool
+
+
+def test_exec_many_later_row_failure_commits_nothing(pg):
+    with pytest.raises(Boom):
+        db.exec_many("UPDATE t SET a=? WHERE id=?", [(1, 1), (2, 2), (3, 3), (4, 4)])
+    assert pg.committed == []
+
+
+def test_upsert_many_later_row_failure_commits_nothing(pg):
+    with pytest.raises(Boom):
+        db.upsert_many("t", ["k", "v"], [("a", 1), ("b", 2), ("c", 3)], conflict=["k"], update=["v"])
+    assert pg.committed == []
+
+
+def test_insert_many_later_chunk_failure_commits_nothing(pg):
+    with pytest.raises(Boom):
+        db.insert_many("t", ["a"], [(i,) for i in range(6)])  # 3 blocos de 2; o 3º falha
+    assert pg.committed == []
+
+
+def test_insert_many_commits_all_chunks_together(pg):
+    pg.fail_at = None
+    db.insert_many("t", ["a"], [(i,) for i in range(5)])
+    assert pg.committed == [(0, 1), (2, 3), (4,)]
+
+
+def test_async_batches_roll_back_on_later_failure(monkeypatch):
+    pool = FakeAsyncPool(fail_at=2)
+
+    async def fake_pool(url=""):
+        return pool
+
+    monkeypatch.setattr(db_async, "_IS_PG", True)
+    monkeypatch.setattr(db, "_IS_PG", True)
+    monkeypatch.setattr(db, "PG_VALUES_CHUNK", 2)
+    monkeypatch.setattr(db_async, "_pool", fake_pool)
+    with pytest.raises(Boom):
+        asyncio.run(db_async.insert_many("t", ["a"], [(i,) for i in range(4)]))
+    with pytest.raises(Boom):
+        pool.commands, pool.fail_at = 0, 3
+        asyncio.run(db_async.exec_many("UPDATE t SET a=?", [(1,), (2,), (3,)]))
+    assert pool.committed == []
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+import db
+from pg_stub import Boom, FakePool
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    primary, replica = FakePool("primary"), FakePool("replica")
+    by_url = {"postgresql://primary": primary, "postgresql://replica": replica}
+    monkeypatch.setattr(db, "_IS_PG", True)
+    monkeypatch.setattr(db, "DATABASE_URL", "postgresql://primary")
+    monkeypatch.setattr(db, "DATABASE_REPLICA_URL", "postgresql://replica")
+    monkeypatch.setattr(db, "_pool", lambda url="": by_url[url or "postgresql://primary"])
+    monkeypatch.setattr(db, "_REPLICA_ERRORS", (Boom,))
+    monkeypatch.setattr(db, "_replica_down_until", 0.0)
+    monkeypatch.setattr(db, "_last_write", {})
+    db.bind_session("teste-replica")
+    return primary, replica
+
+
+def test_reads_go_to_replica(pools):
+    primary, replica = pools
+    db.fetchone("SELECT 1 AS n")
+    db.fetchall("SELECT 1 AS n")
+    assert (primary.reads, replica.reads) == (0, 2)
+
+
+def test_read_right_after_write_goes_to_primary(pools, monkeypatch):
+    primary, replica = pools
+    monkeypatch.setattr(db, "REPLICA_STICKY_S", 0.1)
+    db.exec_sql("UPDATE t SET a=? WHERE id=?", (1, 1))
+    assert db.fetchone("SELECT 1 AS n") == {"n": 1}
+    assert (primary.reads, replica.reads) == (1, 0)
+    # outra sessão não foi afetada pela escrita
+    db.bind_session("outra")
+    db.fetchone("SELECT 1 AS n")
+    assert replica.reads == 1
+    db.bind_session("teste-replica")
+    time.sleep(0.15)
+    db.fetchone("SELECT 1 AS n")
+    assert replica.reads == 2
+
+
+def test_replica_down_falls_back_to_primary(pools, monkeypatch):
+    primary, replica = pools
+    monkeypatch.setattr(db, "REPLICA_RETRY_S", 0.1)
+    replica.down = True
+    assert db.fetchall("SELECT 1 AS n") == [{"n": 1}]
+    db.fetchone("SELECT 1 AS n")
+    # depois da 1ª falha a réplica descansa: a 2ª leitura nem tenta
+    assert (primary.reads, replica.tries) == (2, 1)
+    replica.down = False
+    time.sleep(0.15)
+    db.fetchone("SELECT 1 AS n")
+    assert replica.reads == 1
+
+
+def test_sql_error_on_replica_is_not_a_fallback(pools):
+    primary, replica = pools
+    replica.down = "57014"  # statement_timeout: a réplica está de pé, a consulta é que demorou
+    with pytest.raises(Boom):
+        db.fetchone("SELECT 1 AS n")
+    assert primary.reads == 0 and db._replica_down_until == 0.0
@@ -0,0 +1,23 @@
+import db
+from services import pregen
+
+
+def test_failed_generation_is_recorded_and_not_left_pending(monkeypatch):
+    tr_id = db.insert_many("transcriptions", ["workspace_id", "video_id", "text", "created_at"],
+                           [(1, 1, "texto", "2024-01-01T00:00:00Z")])[0]
+
+    def boom(*a, **kw):
+        raise RuntimeError("provedor fora do ar")
+
+    monkeypatch.setattr(pregen, "transcript_excerpt", boom)
+    pregen._pending[tr_id] = 1
+    pregen._generate(1, {"id": 1}, 1, tr_id, "texto", None, "Roteiro", 3, pregen.DEFAULT_MODEL)
+
+    assert pregen.pending(tr_id) == 0
+    assert pregen.failures(tr_id) == {"Roteiro": "provedor fora do ar"}
+
+    queued = []
+    monkeypatch.setattr(pregen, "queue_pregeneration", lambda *a, **kw: queued.append(kw["types"]) or 1)
+    assert pregen.retry_failed(1, 1, tr_id, "texto") == 1
+    assert queued == [["Roteiro"]]
+    assert pregen.failures(tr_id) == {}
@@ -0,0 +1,62 @@
+import time
+
+from app.providers.router import RouterProvider
+from app.providers.stub_provider import StubProvider
+
+MSGS = [{"role": "user", "content": "oi"}]
+
+
+def _warm(router, provider, latency_s, n=20):
+    for _ in range(n):
+        router.stats(provider, "m").record(latency_s, True)
+
+
+def test_failover_to_next_provider():
+    bad, good = StubProvider("bad", fail_rate=1.0), StubProvider("good")
+    router = RouterProvider([bad, good], timeout_s=5, hedge=False)
+    out, usage = router.chat_with_usage(MSGS, "m", 0.2, 50)
+    assert out.startswith("[good/m]")
+    assert usage["attempts"] == 2 and not usage["hedged"]
+    assert (len(router.stats(bad, "m")), router.stats(bad, "m").error_rate) == (1, 1.0)
+
+
+def test_hedge_fires_after_p95_and_takes_the_fastest():
+    slow, fast = StubProvider("slow", latency_s=0.5), StubProvider("fast")
+    router = RouterProvider([slow, fast], timeout_s=5, hedge=True)
+    _warm(router, slow, 0.01)
+    _warm(router, fast, 0.05)  # slow é o primeiro candidato pelo histórico
+    out, usage = router.chat_with_usage(MSGS, "m", 0.2, 50)
+    assert out.startswith("[fast/m]")
+    assert usage["hedged"] and usage["attempts"] == 2
+    assert slow.calls == 1 and fast.calls == 1
+
+
+def test_timed_out_call_is_counted_once():
+    hung, ok = StubProvider("hung", latency_s=0.3), StubProvider("ok")
+    router = RouterProvider([hung, ok], timeout_s=0.1, hedge=False)
+    out, _ = router.chat_with_usage(MSGS, "m", 0.2, 50)
+    assert out.startswith("[ok/m]")
+    time.sleep(0.4)  # a chamada abandonada termina depois do timeout
+    s = router.stats(hung, "m")
+    assert (len(s), s.error_rate) == (1, 1.0)
+    assert len(router.stats(ok, "m")) == 1
+
+
+def test_hedge_loser_and_failures_are_reported():
+    slow, fast = StubProvider("slow", latency_s=0.3), StubProvider("fast")
+    router = RouterProvider([slow, fast], timeout_s=5, hedge=True)
+    _warm(router, slow, 0.01)
+    _warm(router, fast, 0.05)
+    others = []
+    out, usage = router.chat_with_usage(MSGS, "m", 0.2, 50, on_other=lambda u, ok: others.append((u["provider"], ok)))
+    assert usage["provider"] == "fast"
+    time.sleep(0.4)
+    assert others == [("slow", True)]
+
+    bad, worse = StubProvider("bad", fail_rate=1.0), StubProvider("worse", fail_rate=1.0)
+    router, others = RouterProvider([bad, worse], timeout_s=5, hedge=False), []
+    try:
+        router.chat_with_usage(MSGS, "m", 0.2, 50, on_other=lambda u, ok: others.append((u["provider"], ok)))
+    except RuntimeError:
+        pass
+    assert sorted(others) == [("bad", False), ("worse", False)]
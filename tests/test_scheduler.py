@@ -0,0 +1,65 @@
+import threading
+import time
+
+import db
+from services import scheduler as sched
+
+
+def _wait(pred, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end and not pred():
+        time.sleep(0.01)
+    return pred()
+
+
+def test_same_video_is_queued_once():
+    gate, runs = threading.Event(), []
+
+    def run(job):
+        runs.append(job.video_id)
+        gate.wait(2)
+
+    s = sched.TranscriptionScheduler(run)
+    a = s.submit(1, 10, "/a.mp4", "tiny")
+    b = s.submit(1, 11, "/b.mp4", "tiny")
+    assert s.submit(1, 10, "/a.mp4", "tiny") is a
+    assert s.submit(1, 11, "/b.mp4", "tiny") is b
+    gate.set()
+    assert _wait(lambda: a.status == b.status == "done")
+    assert sorted(runs) == [10, 11]
+    # terminado, o vídeo pode ser transcrito de novo
+    assert s.submit(1, 10, "/a.mp4", "tiny") is not a
+
+
+def test_queued_status_is_written_before_the_worker_starts():
+    seen, done = [], threading.Event()
+
+    def on_status(job):
+        status = job.status
+        if status == "queued":
+            time.sleep(0.05)  # escrita lenta no banco
+        seen.append(status)
+        if status == "done":
+            done.set()
+
+    s = sched.TranscriptionScheduler(lambda job: None, on_status=on_status)
+    s.submit(1, 20, "/c.mp4", "tiny")
+    assert done.wait(2)
+    assert seen == ["queued", "running", "done"]
+
+
+def test_pending_videos_are_requeued_after_restart():
+    vid = db.insert_many("videos", ["workspace_id", "client_id", "filename", "filepath", "created_at"],
+                         [(1, 1, "v.mp4", "/v.mp4", "2024-01-01T00:00:00Z")])[0]
+    crashed = sched.TranscriptionScheduler(lambda job: threading.Event().wait(), on_status=sched.save_job_status)
+    crashed.submit(1, vid, "/v.mp4", "base", language="pt")
+    assert _wait(lambda: db.fetchone("SELECT transcribe_status FROM videos WHERE id=?", (vid,))["transcribe_status"]
+                 == "running")
+
+    ran = []
+    fresh = sched.TranscriptionScheduler(ran.append, on_status=sched.save_job_status)
+    assert sched.requeue_pending(fresh) >= 1
+    assert _wait(lambda: any(j.video_id == vid for j in ran))
+    job = next(j for j in ran if j.video_id == vid)
+    assert (job.filepath, job.whisper_model, job.language) == ("/v.mp4", "base", "pt")
+    assert _wait(lambda: db.fetchone("SELECT transcribe_status FROM videos WHERE id=?", (vid,))["transcribe_status"] is None)
@@ -1,5 +1,5 @@
 import streamlit as st
-from db import fetchall, fetchone, exec_sql
+from db import fetchall, fetchone, exec_sql, read_only
 import datetime as dt
 
 def _now():
@@ -10,6 +10,28 @@ def render(actor_user: dict):
     if not actor_user.get("is_admin"):
         st.error("Acesso restrito.")
         return
+    ro = read_only()
+    if ro:
+        st.info(ro)
+
+    with st.expander("Providers LLM (latência/erros)"):
+        from providers.router import get_router
+        try:
+            st.table(get_router().snapshot())
+        except Exception as e:
+            st.caption(f"Roteador indisponível: {e}")
+
+    with st.expander("Uso por painel (mês)"):
+        from services.usage import usage_summary, month_start
+        st.dataframe(usage_summary("workspace", since=month_start()), use_container_width=True)
+        wss = fetchall("SELECT id,name,monthly_token_quota FROM workspaces ORDER BY name")
+        if wss:
+            w = st.selectbox("Painel", wss, format_func=lambda x: f"#{x['id']} — {x['name']}", key="quota_ws")
+            q = st.number_input("Cota mensal de tokens (0 = sem cota)", 0, 10_000_000_000,
+                                int(w.get("monthly_token_quota") or 0), 100_000, key="quota_val")
+            if st.button("Salvar cota", disabled=bool(ro)):
+                exec_sql("UPDATE workspaces SET monthly_token_quota=? WHERE id=?", (int(q) or None, w["id"]))
+                st.success("Cota salva.")
 
     st.subheader("Solicitações pendentes")
     reqs = fetchall("SELECT * FROM signup_requests WHERE status='pending' ORDER BY id ASC")
@@ -20,7 +42,7 @@ def render(actor_user: dict):
         with st.expander(f"#{r['id']} • {r['email']} • {r['workspace_name']}"):
             c1,c2 = st.columns(2)
             with c1:
-                if st.button("Aprovar", key=f"apr_{r['id']}", type="primary"):
+                if st.button("Aprovar", key=f"apr_{r['id']}", type="primary", disabled=bool(ro)):
                     exec_sql("INSERT INTO users (email,name,salt,password_hash,is_admin,is_active,created_at) VALUES (?,?,?,?,?,?,?)",
                              (r["email"], r.get("name"), r["salt"], r["password_hash"], 0, 1, _now()))
                     nu = fetchone("SELECT * FROM users WHERE email=?", (r["email"],))
@@ -33,7 +55,7 @@ def render(actor_user: dict):
                     st.success("Aprovado.")
                     st.rerun()
             with c2:
-                if st.button("Rejeitar", key=f"rej_{r['id']}"):
+                if st.button("Rejeitar", key=f"rej_{r['id']}", disabled=bool(ro)):
                     exec_sql("UPDATE signup_requests SET status='rejected', reviewed_at=? WHERE id=?", (_now(), r["id"]))
                     st.warning("Rejeitado.")
                     st.rerun()
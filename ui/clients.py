@@ -1,5 +1,8 @@
+import json
 import streamlit as st
 from db import fetchall, fetchone, exec_sql
+from services.generation import CONTENT_TYPES
+from services.pregen import get_policy, DEFAULT_TYPES
 
 def render(workspace_id: int):
     st.header("Clientes")
@@ -35,12 +38,17 @@ def render(workspace_id: int):
     name = st.text_input("Nome", value=c.get("name") or "", key="c_ed_name")
     desc = st.text_area("Descrição", value=c.get("description") or "", height=140, key="c_ed_desc")
     sp = st.text_area("System prompt (opcional)", value=c.get("system_prompt") or "", height=120, key="c_ed_sp")
+    policy = get_policy(c) or {}
+    autogen = st.checkbox("Pré-gerar rascunhos ao terminar uma transcrição", value=bool(policy), key="c_ed_autogen")
+    autogen_types = st.multiselect("Tipos pré-gerados", CONTENT_TYPES, default=policy.get("types", DEFAULT_TYPES),
+                                   key="c_ed_autogen_types", disabled=not autogen)
 
     col1,col2 = st.columns([1,1])
     with col1:
         if st.button("Salvar alterações", type="primary"):
-            exec_sql("UPDATE clients SET name=?, description=?, system_prompt=?, updated_at=? WHERE workspace_id=? AND id=?",
-                     (name.strip(), desc, sp, st.session_state.get("_now",""), workspace_id, client_id))
+            autogen_json = json.dumps({**policy, "enabled": True, "types": autogen_types}, ensure_ascii=False) if autogen else None
+            exec_sql("UPDATE clients SET name=?, description=?, system_prompt=?, autogen_json=?, updated_at=? WHERE workspace_id=? AND id=?",
+                     (name.strip(), desc, sp, autogen_json, st.session_state.get("_now",""), workspace_id, client_id))
             st.success("Atualizado.")
             st.rerun()
     with col2:
@@ -1,7 +1,26 @@
 import streamlit as st
-from db import fetchall
+from db import fetchall, fetchone
+from services.usage import tokens_this_month, usage_summary
 
 def render(workspace_id: int):
     st.header("Dashboard")
     clients = fetchall("SELECT id,name FROM clients WHERE workspace_id=? ORDER BY name", (workspace_id,))
-    st.metric("Clientes", len(clients))
+    ws = fetchone("SELECT monthly_token_quota FROM workspaces WHERE id=?", (workspace_id,)) or {}
+    c1, c2 = st.columns(2)
+    c1.metric("Clientes", len(clients))
+    used = tokens_this_month(workspace_id)
+    quota = ws.get("monthly_token_quota")
+    c2.metric("Tokens no mês", f"{used:,}" + (f" / {int(quota):,}" if quota else ""))
+
+    st.subheader("Uso de LLM")
+    group = st.radio("Agrupar por", ["day", "client", "model"], horizontal=True,
+                     format_func={"day": "Dia", "client": "Cliente", "model": "Modelo"}.get, key="dash_usage_group")
+    rows = usage_summary(group, workspace_id=workspace_id, limit=60)
+    if not rows:
+        st.info("Nenhuma chamada registrada ainda.")
+        return
+    if group == "client":
+        names = {int(c["id"]): c["name"] for c in clients}
+        for r in rows:
+            r["grp"] = names.get(int(r["grp"]), f"#{r['grp']}") if r["grp"] is not None else "-"
+    st.dataframe(rows, use_container_width=True)
@@ -1,7 +1,12 @@
 import streamlit as st
-from db import fetchall, exec_sql
-from providers.groq_provider import GroqProvider
+from db import fetchall
+from services.content_items import save_content_item
+from services.usage import QuotaExceeded, usage_caption
+from services.model_select import AUTO_MODEL as AUTO_LLM, MODELS as LLM_MODELS, resolve_model
+from providers.router import get_router, chat_with_usage
 from services.generation import CONTENT_TYPES, system_prompt, build_prompt
+from services.near_dup import generate_distinct
+from services.examples import style_examples
 
 def render(workspace_id: int, user_id: int):
     st.header("Gerador")
@@ -13,33 +18,38 @@ def render(workspace_id: int, user_id: int):
     client = st.selectbox("Cliente", clients, format_func=lambda c: c["name"], key="gen_client")
     ct = st.selectbox("Tipo", CONTENT_TYPES, key="gen_type")
     n = st.number_input("Quantidade", 1, 20, 3, 1, key="gen_n")
-    model = st.selectbox(
-    "Modelo (Groq)",
-    ["llama-3.3-70b-versatile", "llama-3.1-8b-instant", "openai/gpt-oss-120b", "qwen/qwen3-32b"],
-    index=0
-)
+    model = st.selectbox("Modelo (Groq)", [AUTO_LLM] + LLM_MODELS, index=0, key="gen_model")
     extra = st.text_area("Extra (opcional)", height=120, key="gen_extra")
+    dedupe = st.checkbox("Regerar se sair parecido com conteúdo anterior", value=True, key="gen_dedupe")
 
     if st.button("Gerar", type="primary"):
         try:
-            groq = GroqProvider.from_env_or_secrets()
+            get_router()
         except Exception as e:
             st.error(f"Groq indisponível: {e}")
             st.stop()
-        p = build_prompt(client, ct, int(n), extra=extra)
-        out = groq.chat(model=model, system=system_prompt(client), user=p)
-        st.session_state["gen_last"] = {"client_id": int(client["id"]), "type": ct, "model": model, "prompt": p, "out": out}
+        p = build_prompt(client, ct, int(n), extra=extra, examples=style_examples(client, ct, extra))
+        model = resolve_model(model, system_prompt(client), p, ct, int(n), workspace_id=workspace_id)
+        try:
+            out, usage, dups = generate_distinct(
+                lambda prompt: chat_with_usage(model=model, system=system_prompt(client), user=prompt,
+                                               workspace_id=workspace_id, client_id=int(client["id"])),
+                int(client["id"]), p, retries=2 if dedupe else 0)
+        except QuotaExceeded as e:
+            st.error(str(e))
+            st.stop()
+        st.session_state["gen_last"] = {"client_id": int(client["id"]), "type": ct, "model": model, "prompt": p, "out": out, "usage": usage, "dups": dups}
 
     lo = st.session_state.get("gen_last")
     if lo:
+        st.caption(usage_caption(lo["model"], lo.get("usage")))
+        if lo.get("dups"):
+            st.warning("Parecido com conteúdo anterior: " + ", ".join(f"#{i} ({s:.0%})" for i, s in lo["dups"][:5]))
         out_txt = st.text_area("Saída", value=lo["out"], height=260, key="gen_out")
         if st.button("Salvar no histórico"):
-            exec_sql(
-                "INSERT INTO content_items (workspace_id,client_id,type,title,input_source,input_ref,model,prompt_used,output_text,tags,status,created_by_user_id,created_at) "
-                "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
-                (workspace_id, lo["client_id"], lo["type"], f"{lo['type']} (manual)", "manual", None, lo["model"],
-                 lo["prompt"], out_txt, "", "draft", user_id, st.session_state.get("_now",""))
-            )
+            save_content_item(workspace_id, lo["client_id"], lo["type"], f"{lo['type']} (manual)", "manual", None,
+                              lo["model"], lo["prompt"], out_txt, usage=lo.get("usage"), created_by_user_id=user_id,
+                              created_at=st.session_state.get("_now",""))
             st.success("Salvo.")
             st.session_state["gen_last"] = None
             st.rerun()
@@ -1,15 +1,22 @@
 import streamlit as st
 from db import fetchall
+from services.content_items import STATUSES, set_status
 
-def render(workspace_id: int):
+def render(workspace_id: int, role: str = "viewer"):
     st.header("Histórico")
-    items = fetchall("SELECT id,type,title,created_at,tags,output_text FROM content_items WHERE workspace_id=? ORDER BY id DESC LIMIT 100",
+    items = fetchall("SELECT id,type,title,created_at,tags,status,output_text FROM content_items WHERE workspace_id=? ORDER BY id DESC LIMIT 100",
                      (workspace_id,))
     if not items:
         st.info("Sem histórico ainda.")
         return
     for it in items:
-        with st.expander(f"#{it['id']} • {it['type']} • {it.get('created_at','')}"):
+        with st.expander(f"#{it['id']} • {it['type']} • {it.get('status','draft')} • {it.get('created_at','')}"):
             if it.get("tags"):
                 st.caption(it["tags"])
             st.text_area("Texto", value=it["output_text"], height=200)
+            cur = it.get("status") or "draft"
+            status = st.selectbox("Status", STATUSES, index=STATUSES.index(cur) if cur in STATUSES else 0,
+                                  key=f"hist_status_{it['id']}", disabled=role not in ["owner","editor"])
+            if status != cur:
+                set_status(workspace_id, int(it["id"]), status)
+                st.rerun()
@@ -0,0 +1,27 @@
+import streamlit as st
+from db import fetchall
+from services.segment_search import search_segments
+
+def _ts(sec) -> str:
+    sec = int(sec or 0)
+    return f"{sec // 60:02d}:{sec % 60:02d}"
+
+def render(workspace_id: int):
+    st.header("Busca nas transcrições")
+    clients = fetchall("SELECT id,name FROM clients WHERE workspace_id=? ORDER BY name", (workspace_id,))
+    c1, c2 = st.columns([3, 1])
+    with c1:
+        q = st.text_input("Buscar", placeholder="ex.: promoção de inverno", key="seg_q")
+    with c2:
+        client = st.selectbox("Cliente", [None] + clients, format_func=lambda c: "Todos" if c is None else c["name"],
+                              key="seg_client")
+    if not q.strip():
+        return
+    hits = search_segments(workspace_id, q, client_id=int(client["id"]) if client else None, limit=100)
+    if not hits:
+        st.info("Nada encontrado.")
+        return
+    st.caption(f"{len(hits)} trecho(s)" + (" (mostrando os 100 primeiros)" if len(hits) == 100 else ""))
+    for h in hits:
+        st.markdown(f"**{h['filename']}** (vídeo #{h['video_id']}) • {_ts(h['start_s'])}–{_ts(h['end_s'])}")
+        st.markdown(f"> {h['snippet']}")
@@ -31,3 +31,12 @@ def render(workspace_id: int, actor_user_id: int, role: str):
                  (token, workspace_id, invite_role, (email_restr.strip() or None), actor_user_id, _now(), expires))
         st.success("Convite criado. Copie o token abaixo:")
         st.code(token)
+
+    st.subheader("Transcrição")
+    from services.scheduler import DEFAULT_TARGET_S
+    ws = fetchone("SELECT transcribe_target_s FROM workspaces WHERE id=?", (workspace_id,)) or {}
+    target_min = st.number_input("Meta de latência do Whisper automático (min)", 1, 240,
+                                 int((ws.get("transcribe_target_s") or DEFAULT_TARGET_S) // 60), 1)
+    if st.button("Salvar meta"):
+        exec_sql("UPDATE workspaces SET transcribe_target_s=? WHERE id=?", (float(target_min) * 60, workspace_id))
+        st.success("Meta salva.")
@@ -1,9 +1,46 @@
-import os, re, json
+import os, re
 import streamlit as st
-from db import fetchall, exec_sql
-from services.transcription import transcribe_video_bytes
-from providers.groq_provider import GroqProvider
-from services.generation import CONTENT_TYPES, system_prompt, build_prompt
+from streamlit_autorefresh import st_autorefresh
+from db import fetchall, fetchone, exec_sql
+from services.content_items import save_content_item
+from services.usage import QuotaExceeded, usage_caption
+from services.transcription import probe_duration
+from services.transcripts import list_transcriptions, get_transcription, load_segments
+from services.scheduler import get_scheduler, AUTO_MODEL, WHISPER_MODELS
+from services.pregen import pending as pregen_pending, failures as pregen_failures, retry_failed, AUTO_TAG
+from services.model_select import AUTO_MODEL as AUTO_LLM, MODELS as LLM_MODELS, resolve_model
+from providers.router import chat_with_usage
+from services.generation import CONTENT_TYPES, system_prompt, build_prompt, transcript_excerpt
+from services.near_dup import generate_distinct
+from services.examples import style_examples
+
+def _fmt_duration(sec) -> str:
+    if not sec:
+        return ""
+    sec = int(sec)
+    return f" ({sec // 60}:{sec % 60:02d})"
+
+def _render_queue(workspace_id: int):
+    sched = get_scheduler()
+    jobs = [j for j in sched.jobs(workspace_id) if j.status in ("queued", "running") or j.error]
+    if not jobs:
+        return
+    etas = sched.etas()
+    st.subheader("Fila de transcrição")
+    for j in jobs:
+        label = f"Vídeo #{j.video_id} • {j.whisper_model}"
+        if j.status == "error":
+            st.error(f"{label}: {j.error}")
+        elif j.status == "queued":
+            st.caption(f"{label} • na fila • ETA ~{int(etas.get(j.id, 0))}s")
+        else:
+            pct = min(1.0, j.done_s / j.audio_s) if j.audio_s else 0.0
+            st.progress(pct, text=f"{label} • {int(pct*100)}% • ETA ~{int(etas.get(j.id, 0))}s")
+            if j.segments:
+                with st.container(height=200):
+                    st.markdown(" ".join(s["text"] for s in j.segments))
+    if any(j.status in ("queued", "running") for j in jobs):
+        st_autorefresh(interval=3000, key="tr_queue_refresh")
 
 def render(workspace_id: int, user_id: int):
     st.header("Vídeos")
@@ -22,8 +59,8 @@ def render(workspace_id: int, user_id: int):
         filepath = os.path.join(storage_dir, safe)
         with open(filepath,"wb") as f:
             f.write(up.getvalue())
-        exec_sql("INSERT INTO videos (workspace_id,client_id,filename,filepath,created_at) VALUES (?,?,?,?,?)",
-                 (workspace_id, client_id, up.name, filepath, st.session_state.get("_now","")))
+        exec_sql("INSERT INTO videos (workspace_id,client_id,filename,filepath,duration_s,created_at) VALUES (?,?,?,?,?,?)",
+                 (workspace_id, client_id, up.name, filepath, probe_duration(filepath), st.session_state.get("_now","")))
         st.success("Vídeo salvo.")
         st.rerun()
 
@@ -32,61 +69,89 @@ def render(workspace_id: int, user_id: int):
         st.info("Nenhum vídeo ainda.")
         return
 
-    v = st.selectbox("Biblioteca", vids, format_func=lambda x: f"#{x['id']} - {x['filename']}", key="vid_sel")
+    v = st.selectbox("Biblioteca", vids, format_func=lambda x: f"#{x['id']} - {x['filename']}{_fmt_duration(x.get('duration_s'))}", key="vid_sel")
     video_id = int(v["id"])
     st.caption(v["filepath"])
 
     c1,c2,c3 = st.columns(3)
     with c1:
-        wmodel = st.selectbox("Whisper", ["tiny","base","small"], index=1, key="wh_model")
+        wmodel = st.selectbox("Whisper", [AUTO_MODEL] + WHISPER_MODELS, index=0, key="wh_model")
     with c2:
         lang = st.text_input("Idioma (opcional)", value="", key="wh_lang")
     with c3:
         if st.button("Transcrever", type="primary"):
-            with open(v["filepath"],"rb") as f:
-                vb = f.read()
-            with st.spinner("Transcrevendo..."):
-                txt, segs = transcribe_video_bytes(vb, whisper_model=wmodel, language=(lang.strip() or None))
-            exec_sql("INSERT INTO transcriptions (workspace_id,video_id,whisper_model,language,text,segments_json,created_at) VALUES (?,?,?,?,?,?,?)",
-                     (workspace_id, video_id, wmodel, (lang.strip() or None), txt, json.dumps(segs, ensure_ascii=False), st.session_state.get("_now","")))
-            st.success("Transcrito.")
-            st.rerun()
+            ws = fetchone("SELECT transcribe_target_s FROM workspaces WHERE id=?", (workspace_id,)) or {}
+            get_scheduler().submit(workspace_id, video_id, v["filepath"], wmodel,
+                                   language=(lang.strip() or None), duration_s=v.get("duration_s"),
+                                   target_s=ws.get("transcribe_target_s"))
+            st.success("Na fila de transcrição.")
 
-    trs = fetchall("SELECT * FROM transcriptions WHERE workspace_id=? AND video_id=? ORDER BY id DESC", (workspace_id, video_id))
+    _render_queue(workspace_id)
+
+    trs = list_transcriptions(workspace_id, video_id)
     if not trs:
         st.info("Sem transcrições ainda.")
         return
-    tr = st.selectbox("Transcrição", trs, format_func=lambda t: f"#{t['id']} • {t['created_at']}", key="tr_sel")
+    sel = st.selectbox("Transcrição", trs, format_func=lambda t: f"#{t['id']} • {t['created_at']}", key="tr_sel")
+    tr = get_transcription(workspace_id, int(sel["id"]))
     transcript_text = tr["text"]
     st.text_area("Texto", value=transcript_text, height=160)
+    if st.checkbox("Mostrar segmentos", key="tr_show_segs"):
+        st.dataframe([{"início": s["start"], "fim": s["end"], "texto": s["text"]} for s in load_segments(tr)],
+                     use_container_width=True, height=240)
+
+    drafts = fetchall("SELECT id,type,output_text FROM content_items WHERE workspace_id=? AND input_source='transcription' "
+                      "AND input_ref=? AND tags LIKE ? ORDER BY id", (workspace_id, str(tr["id"]), f"%,{AUTO_TAG}"))
+    waiting = pregen_pending(int(tr["id"]))
+    failed = pregen_failures(int(tr["id"]))
+    if drafts or waiting or failed:
+        st.subheader("Rascunhos pré-gerados")
+        for d in drafts:
+            with st.expander(f"#{d['id']} • {d['type']}"):
+                st.text_area("Texto", value=d["output_text"], height=200, key=f"draft_{d['id']}")
+        for ct, err in failed.items():
+            st.error(f"{ct}: a pré-geração falhou ({err})")
+        if failed and st.button("Tentar de novo", key="pregen_retry"):
+            retry_failed(workspace_id, video_id, int(tr["id"]), transcript_text, load_segments(tr))
+            st.rerun()
+        if waiting:
+            st.caption(f"Gerando {waiting} rascunho(s)...")
+            st_autorefresh(interval=3000, key="pregen_refresh")
 
     st.subheader("Gerar a partir da transcrição")
     ct = st.selectbox("Tipo", CONTENT_TYPES, key="tr_type")
     n = st.number_input("Quantidade", 1, 20, 3, 1, key="tr_n")
-    model = st.selectbox(
-    "Modelo (Groq)",
-    ["llama-3.3-70b-versatile", "llama-3.1-8b-instant", "openai/gpt-oss-120b", "qwen/qwen3-32b"],
-    index=0
-)
+    model = st.selectbox("Modelo (Groq)", [AUTO_LLM] + LLM_MODELS, index=0, key="tr_model")
     extra = st.text_area("Extra", height=90, key="tr_extra")
+    dedupe = st.checkbox("Regerar se sair parecido com conteúdo anterior", value=True, key="tr_dedupe")
 
     if st.button("Gerar", type="primary", key="tr_gen"):
-        groq = GroqProvider.from_env_or_secrets()
-        p = build_prompt(client, ct, int(n), extra=extra, transcript=transcript_text)
-        out = groq.chat(model=model, system=system_prompt(client), user=p)
-        st.session_state["tr_last"] = {"client_id": client_id, "type": ct, "model": model, "prompt": p, "out": out, "tr_id": int(tr["id"]), "vid_id": video_id}
+        segs = load_segments(tr)
+        excerpt, used = transcript_excerpt(client, ct, int(n), transcript_text, segs, extra=extra)
+        p = build_prompt(client, ct, int(n), extra=extra, transcript=excerpt,
+                         examples=style_examples(client, ct, f"{extra} {excerpt}"))
+        model = resolve_model(model, system_prompt(client), p, ct, int(n), workspace_id=workspace_id)
+        try:
+            out, usage, dups = generate_distinct(
+                lambda prompt: chat_with_usage(model=model, system=system_prompt(client), user=prompt,
+                                               workspace_id=workspace_id, client_id=client_id),
+                client_id, p, retries=2 if dedupe else 0)
+        except QuotaExceeded as e:
+            st.error(str(e))
+            st.stop()
+        st.session_state["tr_last"] = {"client_id": client_id, "type": ct, "model": model, "prompt": p, "out": out, "tr_id": int(tr["id"]), "vid_id": video_id, "segments": used, "usage": usage, "dups": dups}
 
     lo = st.session_state.get("tr_last")
     if lo:
+        st.caption(usage_caption(lo["model"], lo.get("usage")))
+        if lo.get("dups"):
+            st.warning("Parecido com conteúdo anterior: " + ", ".join(f"#{i} ({s:.0%})" for i, s in lo["dups"][:5]))
         out_txt = st.text_area("Saída", value=lo["out"], height=220, key="tr_out")
         if st.button("Salvar no histórico", key="tr_save"):
-            exec_sql(
-                "INSERT INTO content_items (workspace_id,client_id,type,title,input_source,input_ref,model,prompt_used,output_text,tags,status,created_by_user_id,created_at) "
-                "VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)",
-                (workspace_id, lo["client_id"], lo["type"], f"{lo['type']} (vídeo #{lo['vid_id']})",
-                 "transcription", str(lo["tr_id"]), lo["model"], lo["prompt"], out_txt,
-                 f"video:{lo['vid_id']},transcription:{lo['tr_id']}", "draft", user_id, st.session_state.get("_now",""))
-            )
+            save_content_item(workspace_id, lo["client_id"], lo["type"], f"{lo['type']} (vídeo #{lo['vid_id']})",
+                              "transcription", str(lo["tr_id"]), lo["model"], lo["prompt"], out_txt,
+                              tags=f"video:{lo['vid_id']},transcription:{lo['tr_id']}", segments_used=lo.get("segments") or [],
+                              usage=lo.get("usage"), created_by_user_id=user_id, created_at=st.session_state.get("_now",""))
             st.success("Salvo.")
             st.session_state["tr_last"] = None
             st.rerun()